@@ -0,0 +1,293 @@
+import sqlite3
+from datetime import date, timedelta
+from os.path import join, dirname, abspath, exists
+
+###################################################
+#        COMPLETED ORDERS (text file parser)      #
+###################################################
+def parse_completed_orders(lines):
+    """
+    Generator over the blocks written by save_completed_order:
+      Τραπέζι 3
+      Έναρξη: 2024-05-01 20:14:02
+      Παραγγελίες:
+       - ΦΕΤΑ ΨΗΤΗ: 2 x 4.00€ = 8.00€
+      Σύνολο: €8.00
+      Ολοκλήρωση: 2024-05-01 21:40:55
+      ----------------------------------------
+    Yields dicts: { table_id, start_time, closed_time, lines, total_cents, void }
+    where lines = [(item_name, qty, price_cents), ...]
+    An undone completion is written again with negative quantities and
+    an "Ακύρωση: <time>" line: void is that time (else None).
+    """
+    order = None
+    for line in lines:
+        line = line.rstrip("\n")
+        try:
+            if line.startswith("Τραπέζι "):
+                order = {"table_id": int(line[8:]), "start_time": None,
+                         "closed_time": None, "lines": [], "total_cents": 0, "void": None}
+            elif order is None:
+                continue;
+            elif line.startswith("Έναρξη: "):
+                order["start_time"] = line[8:]
+            elif line.startswith(" - "):
+                iname, rest = line[3:].rsplit(": ", 1)
+                qty_str, rest = rest.split(" x ", 1)
+                price_str = rest.split("€", 1)[0]
+                order["lines"].append((iname, int(qty_str), round(float(price_str) * 100)))
+            elif line.startswith("Σύνολο: €"):
+                order["total_cents"] = round(float(line[9:]) * 100)
+            elif line.startswith("Ολοκλήρωση: "):
+                order["closed_time"] = line[12:]
+            elif line.startswith("Ακύρωση: "):
+                order["void"] = line[9:]
+            elif line.startswith("-----"):
+                if order["closed_time"]:
+                    yield order
+                order = None
+        except Exception as e:
+            print(f"[!] Error parsing completed order line '{line}': {e}")
+            order = None
+
+    return;
+
+###################################################
+#               SHIFTS (audit trail)              #
+###################################################
+def parse_shifts(text):
+    """'07:00,15:00,23:00' => ['07:00', '15:00', '23:00'] (the start of every shift)."""
+    starts = sorted(part.strip().zfill(5) for part in text.split(",") if part.strip())
+    return starts or ["00:00"];
+
+def shift_of(time_text, shift_starts):
+    """
+    'YYYY-MM-DD HH:MM:SS' => the start of its shift, 'YYYY-MM-DD HH:MM'.
+    Before the first start of a day is the last shift of the day before.
+    """
+    day, hour_minute = time_text[:10], time_text[11:16]
+    started = [start for start in shift_starts if start <= hour_minute]
+    if started:
+        return f"{day} {started[-1]}";
+    previous = date.fromisoformat(day) - timedelta(days=1)
+
+    return f"{previous.isoformat()} {shift_starts[-1]}";
+
+###################################################
+#        COMPLETED ORDERS ARCHIVE (sqlite3)       #
+###################################################
+class CompletedOrdersArchive:
+    """
+    Structured, indexed store of the completed orders.
+    All amounts are integer cents, all times 'YYYY-MM-DD HH:MM:SS'.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id    INTEGER PRIMARY KEY,
+            table_id    INTEGER NOT NULL,
+            start_time  TEXT,
+            closed_time TEXT NOT NULL,
+            day         TEXT NOT NULL,
+            total_cents INTEGER NOT NULL,
+            UNIQUE (table_id, closed_time)
+        );
+        CREATE TABLE IF NOT EXISTS order_lines (
+            order_id    INTEGER NOT NULL REFERENCES orders(order_id),
+            item_name   TEXT NOT NULL,
+            qty         INTEGER NOT NULL,
+            price_cents INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_orders_closed ON orders(closed_time);
+        CREATE INDEX IF NOT EXISTS idx_orders_day ON orders(day, total_cents);
+        CREATE INDEX IF NOT EXISTS idx_orders_table ON orders(table_id, closed_time);
+        CREATE INDEX IF NOT EXISTS idx_lines_order ON order_lines(order_id);
+        CREATE INDEX IF NOT EXISTS idx_lines_item ON order_lines(item_name);
+        CREATE TABLE IF NOT EXISTS events (
+            event_id    INTEGER PRIMARY KEY,
+            time        TEXT NOT NULL,
+            shift       TEXT NOT NULL,
+            table_id    INTEGER NOT NULL,
+            kind        TEXT NOT NULL,
+            origin      TEXT NOT NULL,
+            item_name   TEXT,
+            qty         INTEGER,
+            price_cents INTEGER,
+            lines       TEXT,
+            peer        INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_shift ON events(shift, table_id);
+        CREATE INDEX IF NOT EXISTS idx_events_table ON events(table_id, time);
+    """
+
+    def __init__(self, db_file="completed_orders.sqlite3", check_same_thread=True):
+        self.db = sqlite3.connect(db_file, check_same_thread=check_same_thread)
+        self.db.executescript(self.SCHEMA)
+
+        return;
+
+    def add_order(self, table_id, start_time, closed_time, lines, total_cents, commit=True):
+        """
+        lines: [(item_name, qty, price_cents), ...]
+        Returns False if the order is already archived.
+        """
+        cur = self.db.execute(
+            "INSERT OR IGNORE INTO orders (table_id, start_time, closed_time, day, total_cents) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (table_id, start_time, closed_time, closed_time[:10], total_cents))
+        if cur.rowcount == 0:
+            return False;
+
+        order_id = cur.lastrowid
+        self.db.executemany(
+            "INSERT INTO order_lines (order_id, item_name, qty, price_cents) VALUES (?, ?, ?, ?)",
+            [(order_id, iname, qty, price) for iname, qty, price in lines])
+        if commit:
+            self.db.commit()
+
+        return True;
+
+    def remove_order(self, table_id, closed_time, commit=True):
+        """An undone completion. Returns False if it was not archived."""
+        row = self.db.execute("SELECT order_id FROM orders WHERE table_id = ? AND closed_time = ?",
+                              (table_id, closed_time)).fetchone()
+        if row is None:
+            return False;
+
+        self.db.execute("DELETE FROM order_lines WHERE order_id = ?", row)
+        self.db.execute("DELETE FROM orders WHERE order_id = ?", row)
+        if commit:
+            self.db.commit()
+
+        return True;
+
+    def add_events(self, rows):
+        """
+        Audit rows of the order engine, one transaction:
+        (time, shift, table_id, kind, origin, item_name, qty, price_cents, lines, peer)
+        """
+        self.db.executemany(
+            "INSERT INTO events (time, shift, table_id, kind, origin, item_name, qty, price_cents, lines, peer) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+
+        return;
+
+    def import_text(self, completed_orders_file):
+        """One-shot import of completed_orders.txt (re-running it is harmless)."""
+        if not exists(completed_orders_file):
+            print(f"[!] File not found: {completed_orders_file}")
+            return 0;
+
+        imported = 0
+        with open(completed_orders_file, "r", encoding="utf-8") as f:
+            for order in parse_completed_orders(f):
+                if order["void"]:
+                    if self.remove_order(order["table_id"], order["closed_time"], commit=False):
+                        imported -= 1
+                elif self.add_order(order["table_id"], order["start_time"], order["closed_time"],
+                                    order["lines"], order["total_cents"], commit=False):
+                    imported += 1
+        self.db.commit()
+
+        return imported;
+
+    ###################################################
+    #                  QUERY API                      #
+    ###################################################
+    def _day_range(self, day_from, day_to):
+        """WHERE clause on orders.day (days are 'YYYY-MM-DD', inclusive)."""
+        return ("o.day BETWEEN ? AND ?",
+                (day_from or "0000-00-00", day_to or "9999-99-99"));
+
+    def daily_revenue(self, day_from=None, day_to=None):
+        """[(day, orders, revenue_cents), ...] ordered by day."""
+        where, params = self._day_range(day_from, day_to)
+        return self.db.execute(
+            f"SELECT o.day, COUNT(*), SUM(o.total_cents) FROM orders o "
+            f"WHERE {where} GROUP BY o.day ORDER BY o.day", params).fetchall();
+
+    def item_counts(self, day_from=None, day_to=None):
+        """[(item_name, qty, revenue_cents), ...] best sellers first."""
+        where, params = self._day_range(day_from, day_to)
+        return self.db.execute(
+            f"SELECT l.item_name, SUM(l.qty), SUM(l.qty * l.price_cents) "
+            f"FROM orders o JOIN order_lines l ON l.order_id = o.order_id "
+            f"WHERE {where} GROUP BY l.item_name ORDER BY SUM(l.qty) DESC", params).fetchall();
+
+    def table_turnover(self, day_from=None, day_to=None):
+        """[(table_id, orders, revenue_cents), ...] ordered by table."""
+        where, params = self._day_range(day_from, day_to)
+        return self.db.execute(
+            f"SELECT o.table_id, COUNT(*), SUM(o.total_cents) FROM orders o "
+            f"WHERE {where} GROUP BY o.table_id ORDER BY o.table_id", params).fetchall();
+
+    def audit(self, shift=None, table_id=None):
+        """[(time, table_id, kind, origin, item_name, qty, price_cents, lines, peer), ...] in order."""
+        where, params = [], []
+        if shift is not None:
+            where.append("shift = ?")
+            params.append(shift)
+        if table_id is not None:
+            where.append("table_id = ?")
+            params.append(table_id)
+        clause = f"WHERE {' AND '.join(where)} " if where else ""
+        return self.db.execute(
+            f"SELECT time, table_id, kind, origin, item_name, qty, price_cents, lines, peer "
+            f"FROM events {clause}ORDER BY event_id", params).fetchall();
+
+    def shifts(self):
+        """[(shift, events, undone/redone), ...] ordered by shift."""
+        return self.db.execute(
+            "SELECT shift, COUNT(*), SUM(origin != 'user') FROM events "
+            "GROUP BY shift ORDER BY shift").fetchall();
+
+    def close(self):
+        self.db.close()
+        return;
+
+###################################################
+#                     main()                      #
+###################################################
+def main():
+    script_dir =     dirname(abspath(__file__))
+    ordersData_dir = "ordersData"
+
+    import argparse # Only the command line needs it (imported by the GUI too)
+    parser = argparse.ArgumentParser(description="Completed orders archive")
+    parser.add_argument("command", choices=["import", "daily", "items", "tables", "shifts", "audit"])
+    parser.add_argument("--db", default=join(script_dir, ordersData_dir, "completed_orders.sqlite3"))
+    parser.add_argument("--file", default=join(script_dir, ordersData_dir, "completed_orders.txt"),
+                        help="text file for 'import'")
+    parser.add_argument("--from", dest="day_from", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="day_to", help="last day (YYYY-MM-DD)")
+    parser.add_argument("--shift", help="'audit' of one shift ('YYYY-MM-DD HH:MM', see 'shifts')")
+    parser.add_argument("--table", type=int, help="'audit' of one table")
+    args = parser.parse_args()
+
+    archive = CompletedOrdersArchive(args.db)
+    if args.command == "import":
+        print(f"Imported {archive.import_text(args.file)} orders")
+    elif args.command == "daily":
+        for day, count, cents in archive.daily_revenue(args.day_from, args.day_to):
+            print(f"{day}  {count:5d}  €{cents / 100:.2f}")
+    elif args.command == "items":
+        for iname, qty, cents in archive.item_counts(args.day_from, args.day_to):
+            print(f"{iname:<30} {qty:6d}  €{cents / 100:.2f}")
+    elif args.command == "tables":
+        for tid, count, cents in archive.table_turnover(args.day_from, args.day_to):
+            print(f"Τραπέζι {tid:<4} {count:5d}  €{cents / 100:.2f}")
+    elif args.command == "shifts":
+        for shift, count, undone in archive.shifts():
+            print(f"{shift}  {count:6d} events  {undone:4d} undo/redo")
+    else:
+        for time, tid, kind, origin, iname, qty, price, lines, peer in archive.audit(args.shift, args.table):
+            what = f"{qty:+d} {iname}" if iname is not None else (lines or "")
+            via = f" ({origin})" if origin != "user" else ""
+            to = f" <-> {peer}" if peer is not None else ""
+            print(f"{time}  Τραπέζι {tid:<4} {kind}{via}{to}  {what}")
+    archive.close()
+
+    return;
+
+if __name__ == "__main__":
+    main()
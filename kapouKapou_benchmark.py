@@ -0,0 +1,1565 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import tracemalloc
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from hashlib import sha1
+from os import cpu_count, devnull, makedirs, remove
+from os.path import join, dirname, abspath, exists, getsize
+from shutil import copytree
+from tempfile import TemporaryDirectory
+from threading import Timer
+from time import perf_counter, sleep, time
+from types import SimpleNamespace
+
+from datetime import date, timedelta
+
+from kapouKapou_core import (Table, Item, ItemCatalog, PriceMap, OrderJournal, OrderEngine, TableHistory, apply_event,
+                             save_orders, load_orders, format_orders, snapshot_files,
+                             format_orders_binary, write_snapshot, open_engine, parse_time, OccupancyHeatmap,
+                             BackgroundWriter, format_cents)
+from kapouKapou_archive import CompletedOrdersArchive
+from kapouKapou_bulk import bulk_export, bulk_import
+from kapouKapou_search import MenuIndex
+from kapouKapou_reports import iter_orders, build_report
+from kapouKapou_metrics import Metrics
+from kapouKapou_receipts import ReceiptRenderer, ReceiptPrinter, EscPosReceipt, make_template
+
+###################################################
+#                    HELPERS                      #
+###################################################
+def make_tables(num_tables, lines_per_table):
+    """Tables with `lines_per_table` different items each."""
+    tables = [Table(i) for i in range(1, num_tables + 1)]
+    for t in tables:
+        for j in range(lines_per_table):
+            t.add_item(f"ITEM {j}", 1 + j % 3, 100 + j)
+
+    return tables;
+
+def timed(func, repeat=5):
+    """Best wall time (seconds) of `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        t0 = perf_counter()
+        func()
+        elapsed = perf_counter() - t0
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best;
+
+RESULTS = {} # Dict: { name: ms or KiB } of this run (lower is better), for the baselines
+
+def report(name, seconds, ops=None):
+    RESULTS[name] = round(seconds * 1000, 4)
+    line = f"{name:<48} {seconds * 1000:10.3f} ms"
+    if ops:
+        line += f"   {ops / seconds:12.0f} ops/sec"
+    print(line)
+
+    return;
+
+def report_memory(name, num_bytes, note=""):
+    RESULTS[name] = round(num_bytes / 1024, 1)
+    print(f"{name:<48} {num_bytes / 1024:10.1f} KiB{note}")
+
+    return;
+
+def report_latency(name, samples):
+    """p50/p99 of per-operation times (seconds) and the ops/sec they add up to."""
+    if not samples:
+        return;
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1000
+    p99 = samples[int(len(samples) * 0.99)] * 1000
+    RESULTS[f"{name} p50"] = round(p50, 4)
+    RESULTS[f"{name} p99"] = round(p99, 4)
+    print(f"{name:<32} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms   {len(samples) / sum(samples):12.0f} ops/sec")
+
+    return;
+
+def make_menu(num_items, catalog):
+    """(items, menu_dict) of ITEM 0..num_items-1, 20 per category."""
+    items = []
+    menu_dict = {}
+    for i in range(num_items):
+        item = Item(f"ITEM {i}", 100 + i, catalog.intern(f"ITEM {i}"), str(i + 1))
+        items.append(item)
+        menu_dict.setdefault(f"CATEGORY {i // 20}", []).append(item)
+
+    return items, menu_dict;
+
+###################################################
+#          JOURNAL vs FULL REWRITE (orders)       #
+###################################################
+def bench_journal(num_tables=60, lines_per_table=20, clicks=2000):
+    print(f"--- journal: {num_tables} tables x {lines_per_table} lines, {clicks} clicks ---")
+    with TemporaryDirectory() as tmp:
+        orders_file = join(tmp, "orders.txt")
+        journal_file = join(tmp, "orders.journal")
+
+        # Per-save cost of the current format (full rewrite of every open line)
+        tables = make_tables(num_tables, lines_per_table)
+        report("save_orders (full rewrite)", timed(lambda: save_orders(tables, orders_file)))
+
+        # Per-click cost of the journal (one appended record)
+        journal = OrderJournal(journal_file, fsync_interval=1.0)
+        journal.replay(tables)
+        for t in tables:
+            t.journal = journal
+        def click():
+            for k in range(clicks):
+                tables[k % num_tables].add_item("ITEM 0", 1)
+        report("journal append per click (batched fsync)", timed(click, 1) / clicks)
+        journal.close()
+
+        # Recovery: snapshot only vs snapshot + journal tail
+        restored = [Table(i) for i in range(1, num_tables + 1)]
+        report("load_orders (snapshot only)", timed(lambda: load_orders(restored, orders_file)))
+        def recover():
+            j = OrderJournal(journal_file)
+            load_orders(restored, orders_file, j)
+            j.close()
+        report(f"load_orders (snapshot + {clicks} journal records)", timed(recover))
+
+        # Both paths must restore the same floor
+        for a, b in zip(tables, restored):
+            assert a.orders == b.orders, f"Table {a.table_id} differs after recovery"
+
+    return;
+
+###################################################
+#        MEMORY (dict-backed vs slots/arrays)     #
+###################################################
+class LegacyTable:
+    """The original representation: a __dict__ object with a { name: qty } dict."""
+    def __init__(self, table_id):
+        self.table_id = table_id
+        self.start_time = None
+        self.orders = {}
+
+        return;
+
+def bench_memory(num_tables=1000, num_items=100):
+    print(f"--- memory: {num_tables} tables x {num_items} items ---")
+    names = [f"ITEM {i}" for i in range(num_items)] # Shared by both, only the containers count
+
+    def measure(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tables = build()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return after - before, tables;
+
+    def build_legacy():
+        tables = [LegacyTable(i) for i in range(1, num_tables + 1)]
+        for t in tables:
+            t.start_time = "2024-01-01 20:00:00"
+            for name in names:
+                t.orders[name] = 2
+        return tables;
+
+    catalog = ItemCatalog()
+    for name in names:
+        catalog.intern(name)
+    def build_compact():
+        tables = [Table(i, catalog) for i in range(1, num_tables + 1)]
+        for t in tables:
+            t.start_time = 1704132000 # Epoch seconds
+            for name in names:
+                t.set_quantity(name, 2)
+        return tables;
+
+    legacy_bytes, legacy = measure(build_legacy)
+    compact_bytes, compact = measure(build_compact)
+    assert dict(compact[0].orders) == legacy[0].orders
+    report_memory("dict-backed tables", legacy_bytes)
+    report_memory("__slots__ tables + array counters", compact_bytes,
+                  f"   ({legacy_bytes / compact_bytes:.1f}x smaller)")
+
+    return;
+
+###################################################
+#        RUNNING TOTALS (cached vs recompute)     #
+###################################################
+def bench_totals(num_tables=60, num_items=200, ops=200000, seed=1):
+    """
+    Random add/remove/complete/price-change stream. After every operation
+    the running total must equal a full recompute (randomized property check);
+    a price change only applies to the lines opened after it.
+    """
+    print(f"--- totals: {num_tables} tables, {num_items} items, {ops} random ops ---")
+    rng = random.Random(seed)
+    price_map = PriceMap((f"ITEM {i}", rng.randint(50, 2500)) for i in range(num_items))
+    names = list(price_map)
+    tables = [Table(i) for i in range(1, num_tables + 1)]
+
+    for _ in range(ops):
+        t = rng.choice(tables)
+        r = rng.random()
+        if r < 0.6:
+            name = rng.choice(names)
+            t.add_item(name, rng.randint(1, 3), price_map[name], price_map.version)
+        elif r < 0.9:
+            t.remove_item(rng.choice(names), rng.randint(1, 3))
+        elif r < 0.995:
+            t.complete_order()
+        else:
+            price_map[rng.choice(names)] = rng.randint(50, 2500)
+        assert t.get_total(price_map) == t.recompute_total(price_map), f"Table {t.table_id} total drifted"
+
+    for t in tables:
+        for _ in range(50):
+            name = rng.choice(names)
+            t.add_item(name, 1, price_map[name])
+    big = tables[0]
+    report("get_total (cached)", timed(lambda: big.get_total(price_map)))
+    report("recompute_total (full sum)", timed(lambda: big.recompute_total(price_map)))
+
+    return;
+
+###################################################
+#        CRASH SAFETY (fault injection)           #
+###################################################
+KILLED_WRITER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from kapouKapou_core import Table, save_orders
+tables = [Table(i) for i in range(1, 61)]
+generation = 0
+while True: # Every snapshot: all 60 tables x 20 lines with qty == generation
+    generation += 1
+    for t in tables:
+        t.clear_orders()
+        t.start_time = 1704132000 # Epoch seconds
+        for j in range(20):
+            t.set_quantity(f"ITEM {j}", generation, price_cents=100)
+    save_orders(tables, sys.argv[2])
+"""
+
+def bench_faults(offsets=200, kills=20, seed=13):
+    """
+    orders.txt must always restore a complete snapshot:
+      - torn at random byte offsets (crash while writing the temp file,
+        or orders.txt itself torn) => the previous snapshot,
+      - a writer process killed at random moments => some complete snapshot.
+    """
+    print(f"--- crash safety: {offsets} torn offsets, {kills} killed writers ---")
+    rng = random.Random(seed)
+    with TemporaryDirectory() as tmp, open(devnull, "w") as null:
+        orders_file = join(tmp, "orders.txt")
+        def floor(tables):
+            return format_orders(tables).split("\n", 1)[1]; # Without the header
+
+        old_tables = make_tables(20, 10)
+        new_tables = make_tables(20, 10)
+        for t in new_tables:
+            t.add_item("ITEM 0", 5, 100)
+        new_text = format_orders(new_tables)
+        restored = [Table(i) for i in range(1, 21)]
+
+        for _ in range(offsets):
+            for name in snapshot_files(orders_file):
+                remove(name)
+            save_orders(old_tables, orders_file)
+            offset = rng.randrange(len(new_text.encode("utf-8")))
+            torn = new_text.encode("utf-8")[:offset]
+            if rng.random() < 0.5:
+                with open(orders_file + ".tmp", "wb") as f: # Killed while writing the temp file
+                    f.write(torn)
+            else:
+                save_orders(new_tables, orders_file) # orders.txt itself torn afterwards
+                with open(orders_file, "wb") as f:
+                    f.write(torn)
+            with redirect_stdout(null):
+                load_orders(restored, orders_file)
+            assert floor(restored) == floor(old_tables), f"torn at byte {offset}: not the previous snapshot"
+        print(f"{offsets} torn snapshots: all restored the previous one")
+
+        script_dir = dirname(abspath(__file__))
+        generations = set()
+        for _ in range(kills):
+            writer = subprocess.Popen([sys.executable, "-c", KILLED_WRITER, script_dir, orders_file])
+            try:
+                writer.wait(rng.uniform(0.2, 0.6))
+            except subprocess.TimeoutExpired:
+                pass;
+            writer.kill()
+            writer.wait()
+            if not snapshot_files(orders_file):
+                continue; # Killed before its first snapshot
+
+            tables = [Table(i) for i in range(1, 61)]
+            with redirect_stdout(null):
+                bad_lines = load_orders(tables, orders_file)
+            quantities = {qty for t in tables for qty in t.line_qty}
+            lines = sum(len(t.line_ids) for t in tables)
+            assert not bad_lines and len(quantities) == 1 and lines == 60 * 20, "killed writer left a partial snapshot"
+            generations.add(quantities.pop())
+        print(f"{kills} killed writers: all restored a complete snapshot ({len(generations)} different ones)")
+
+    return;
+
+###################################################
+#          STARTUP RESTORE (load_orders)          #
+###################################################
+def bench_restore(lines_per_table=50, sizes=(50, 500, 2000)):
+    print(f"--- restore: {lines_per_table} lines per table ---")
+    with TemporaryDirectory() as tmp:
+        orders_file = join(tmp, "orders.txt")
+        for num_tables in sizes:
+            save_orders(make_tables(num_tables, lines_per_table), orders_file)
+            restored = [Table(i) for i in range(1, num_tables + 1)]
+            seconds = timed(lambda: load_orders(restored, orders_file))
+            lines = num_tables * lines_per_table
+            report(f"load_orders {num_tables} tables", seconds, lines)
+
+    return;
+
+###################################################
+#        SNAPSHOT FORMAT (text vs orders.bin)     #
+###################################################
+def bench_binary(num_tables=500, lines_per_table=50):
+    """Size, save and restore time of the text and the binary snapshot."""
+    print(f"--- binary: {num_tables} tables x {lines_per_table} lines ---")
+    tables = make_tables(num_tables, lines_per_table)
+    expected = [t.lines() for t in tables]
+    lines = num_tables * lines_per_table
+    with TemporaryDirectory() as tmp:
+        text_file = join(tmp, "orders.txt")
+        binary_file = join(tmp, "orders.bin")
+        formats = (("text", text_file, lambda: format_orders(tables).encode("utf-8")),
+                   ("binary", binary_file, lambda: format_orders_binary(tables)))
+        for name, orders_file, encode in formats:
+            data = encode()
+            save_seconds = timed(lambda: write_snapshot(encode(), orders_file, None, 0))
+            restored = [Table(i) for i in range(1, num_tables + 1)]
+            load_seconds = timed(lambda: load_orders(restored, orders_file))
+            assert [t.lines() for t in restored] == expected, name
+            report_memory(f"{name} snapshot size", len(data))
+            report(f"save {name}", save_seconds, lines)
+            report(f"load {name}", load_seconds, lines)
+
+        # A changed menu: the item ids of the file are remapped to the new catalog
+        catalog = ItemCatalog()
+        for j in reversed(range(lines_per_table)):
+            catalog.intern(f"ITEM {j}")
+        restored = [Table(i, catalog) for i in range(1, num_tables + 1)]
+        seconds = timed(lambda: load_orders(restored, binary_file))
+        assert [t.lines() for t in restored] == expected
+        report("load binary (remapped ids)", seconds, lines)
+
+    return;
+
+###################################################
+#      EVENT HISTORY (rebuild, undo/redo)         #
+###################################################
+class RecordingHistory(TableHistory):
+    """A TableHistory that also keeps every event (for the full replay)."""
+    __slots__ = ("all",)
+
+    def __init__(self, table):
+        self.all = []
+        super().__init__(table)
+
+        return;
+
+    def record(self, table, event):
+        self.all.append(event)
+        super().record(table, event)
+
+        return;
+
+def bench_history(sizes=(1000, 10000, 100000), num_items=50, seed=19):
+    """
+    One table after N events (adds, removes, undo/redo): rebuild from the
+    per-table snapshot + tail vs a full replay, and the cost of undo/redo.
+    """
+    print(f"--- history: one table after N events (snapshot every {TableHistory.SNAPSHOT_EVERY}) ---")
+    catalog = ItemCatalog()
+    items, menu_dict = make_menu(num_items, catalog)
+    names = [it.name for it in items]
+    for n in sizes:
+        table = Table(1, catalog)
+        engine = OrderEngine([table], items, menu_dict, catalog=catalog)
+        history = engine.histories[1] = RecordingHistory(table)
+        rng = random.Random(seed)
+        while history.events < n:
+            r = rng.random()
+            if r < 0.6:
+                engine.add_item(1, rng.choice(names), rng.randint(1, 3))
+            elif r < 0.85:
+                engine.remove_item(1, rng.choice(names), 1)
+            elif r < 0.95:
+                engine.undo(1)
+            else:
+                engine.redo(1)
+        expected = (table.lines(), table.get_total())
+
+        rebuilt = Table(1, catalog)
+        seconds = timed(lambda: history.rebuild(rebuilt))
+        assert (rebuilt.lines(), rebuilt.get_total()) == expected
+        report(f"rebuild after {n} events ({len(history.tail)} in the tail)", seconds)
+
+        def full_replay():
+            rebuilt.clear_orders()
+            for event in history.all:
+                apply_event(rebuilt, event)
+
+            return;
+        seconds = timed(full_replay, repeat=1 if n >= 100000 else 5)
+        assert (rebuilt.lines(), rebuilt.get_total()) == expected
+        report(f"full replay of {n} events", seconds, n)
+
+        samples = []
+        for _ in range(1000):
+            t0 = perf_counter()
+            engine.undo(1)
+            engine.redo(1)
+            samples.append(perf_counter() - t0)
+        report_latency(f"undo+redo after {n}", samples)
+
+    return;
+
+###################################################
+#       MOVE / MERGE / SPLIT (one batch each)     #
+###################################################
+class CountingJournal(OrderJournal):
+    """An OrderJournal that counts its appends (one per batch)."""
+    def __init__(self, journal_file):
+        self.appends = 0
+        super().__init__(journal_file)
+
+        return;
+
+    def append(self, data):
+        self.appends += 1
+        super().append(data)
+
+        return;
+
+def bench_transfer(sizes=(10, 100, 1000), qty=2):
+    """
+    Tables of L lines: moving/merging/splitting them with one engine call
+    vs re-clicking every item (remove here, add there), journal appends
+    per operation, and the cards a transfer redraws on the GUI.
+    """
+    print(f"--- transfer/merge/split: tables of L lines x {qty} ---")
+    with TemporaryDirectory() as tmp:
+        for n in sizes:
+            catalog = ItemCatalog()
+            items, menu_dict = make_menu(n, catalog)
+            names = [it.name for it in items]
+            tables = [Table(i, catalog) for i in (1, 2, 3)]
+            journal = CountingJournal(join(tmp, f"journal_{n}.log"))
+            journal.replay(tables) # Opens it for appending
+            engine = OrderEngine(tables, items, menu_dict, journal=journal, orders_file=join(tmp, f"orders_{n}.txt"),
+                                 completed_orders_file=join(tmp, f"completed_orders_{n}.txt"), catalog=catalog)
+            for iname in names:
+                engine.add_item(1, iname, qty)
+            expected = tables[0].get_total()
+
+            def reclick():
+                for source, target in ((1, 2), (2, 1)):
+                    for iname in names:
+                        for _ in range(qty):
+                            engine.remove_item(source, iname, 1)
+                            engine.add_item(target, iname, 1)
+
+                return;
+            seconds = timed(reclick, repeat=1) / 2
+            report(f"L={n}: re-click every item over", seconds)
+
+            def there_and_back():
+                engine.transfer_table(1, 2)
+                engine.transfer_table(2, 1)
+
+                return;
+            seconds = timed(there_and_back) / 2
+            assert tables[0].get_total() == expected and not tables[1].line_ids
+            report(f"L={n}: transfer_table", seconds)
+
+            half = {iname: 1 for iname in names[::2]} # Split by quantity: one of every other item
+            def split_and_undo():
+                engine.transfer_table(1, 3, half)
+                engine.undo(3)
+
+                return;
+            seconds = timed(split_and_undo) / 2
+            assert tables[0].get_total() == expected
+            report(f"L={n}: split {len(half)} lines (+ undo)", seconds)
+
+            engine.transfer_table(1, 2, half)
+            def merge_and_undo():
+                engine.merge_tables([1, 2], 3)
+                engine.undo(3)
+
+                return;
+            seconds = timed(merge_and_undo) / 2
+            assert tables[0].get_total() + tables[1].get_total() == expected
+            report(f"L={n}: merge 2 tables (+ undo)", seconds)
+
+            appends = journal.appends
+            engine.merge_tables([1, 2], 3)
+            assert tables[2].get_total() == tables[2].recompute_total() == expected
+            print(f"{'':<8}journal appends for a merge of {n + len(half)} lines: {journal.appends - appends}")
+            engine.close()
+
+        # Repriced menu: the moved lines keep the prices they were ordered at, the bill does not change
+        catalog = ItemCatalog()
+        items, menu_dict = make_menu(20, catalog)
+        tables = [Table(i, catalog) for i in (1, 2, 3)]
+        engine = OrderEngine(tables, items, menu_dict, orders_file=join(tmp, "repriced.txt"),
+                             completed_orders_file=join(tmp, "repriced_completed.txt"), catalog=catalog)
+        for k in range(20):
+            engine.add_item(1, f"ITEM {k}", 2)
+        for item in items:
+            engine.price_map[item.name] += 50
+        engine.menu_version += 1
+        for k in range(0, 20, 2):
+            engine.add_item(2, f"ITEM {k}", 1)
+        expected = sum(t.get_total() for t in tables)
+        engine.transfer_table(1, 2, {f"ITEM {k}": 1 for k in range(10)})
+        engine.merge_tables([1, 2], 3)
+        engine.transfer_table(3, 1, {f"ITEM {k}": 2 for k in range(0, 20, 4)})
+        engine.undo(1)
+        engine.redo(1)
+        assert all(t.get_total() == t.recompute_total() for t in tables)
+        assert sum(t.get_total() for t in tables) == expected, (sum(t.get_total() for t in tables), expected)
+        print(f"{'':<8}repriced menu: total {expected} cents before and after transfer/merge/split "
+              f"({len(tables[2].line_ids)} lines on the merged table)")
+        engine.close()
+
+    # The GUI: a transfer redraws the two cards, not the floor
+    stubbed = not has_display()
+    with stub_widgets() if stubbed else nullcontext(), open(devnull, "w") as null, redirect_stdout(null):
+        root, app = make_gui(60, 100, {"VIRTUAL_UI": "0"}, stub=stubbed)
+        for k in range(100):
+            app.engine.add_item(1, f"ITEM {k}", 2)
+        app.select_table(app.engine.get_table(1))
+        root.update()
+        redrawn = []
+        refresh_table_ui = app.refresh_table_ui
+        def counting_refresh(table):
+            redrawn.append(table.table_id)
+            return refresh_table_ui(table);
+        app.refresh_table_ui = counting_refresh
+        app.move_lines(7, {f"ITEM {k}": 1 for k in range(50)})
+        root.update()
+        root.destroy()
+    print(f"cards redrawn by a transfer of 50 lines: {len(redrawn)} (tables {sorted(set(redrawn))}) of 60")
+
+    return;
+
+
+###################################################
+#           COMPLETED ORDERS ARCHIVE QUERIES      #
+###################################################
+def bench_archive(years=3, orders_per_day=200, num_tables=60):
+    print(f"--- archive: {years} years x {orders_per_day} orders/day ---")
+    with TemporaryDirectory() as tmp:
+        archive = CompletedOrdersArchive(join(tmp, "completed_orders.sqlite3"))
+        first_day = date(2020, 1, 1)
+        days = years * 365
+        def fill():
+            for d in range(days):
+                day = (first_day + timedelta(days=d)).isoformat()
+                for k in range(orders_per_day):
+                    closed = f"{day} {12 + k % 12:02d}:{k % 60:02d}:{k // 60:02d}"
+                    lines = [(f"ITEM {(k + j) % 40}", 1 + j, 250 + 50 * j) for j in range(4)]
+                    total = sum(q * p for _, q, p in lines)
+                    archive.add_order(1 + k % num_tables, closed, closed, lines, total, commit=False)
+            archive.db.commit()
+        report(f"fill ({days * orders_per_day} orders)", timed(fill, 1))
+
+        last_day = (first_day + timedelta(days=days - 1)).isoformat()
+        report("daily_revenue (one day)", timed(lambda: archive.daily_revenue(last_day, last_day)))
+        report("item_counts (one day)", timed(lambda: archive.item_counts(last_day, last_day)))
+        report("table_turnover (one day)", timed(lambda: archive.table_turnover(last_day, last_day)))
+        report("daily_revenue (all history)", timed(lambda: archive.daily_revenue()))
+        archive.close()
+
+    return;
+
+###################################################
+#        END-OF-DAY REPORTS (streaming pass)      #
+###################################################
+def write_history(history_file, num_orders, num_tables=60, num_items=80, seed=5):
+    """Synthetic completed_orders.txt (the save_completed_order format), ~11 lines per order."""
+    rng = random.Random(seed)
+    first_day = date(2020, 1, 1)
+    orders_per_day = 300
+    with open(history_file, "w", encoding="utf-8") as f:
+        for k in range(num_orders):
+            day = (first_day + timedelta(days=k // orders_per_day)).isoformat()
+            start_min = 12 * 60 + rng.randrange(10 * 60)
+            end_min = start_min + rng.randrange(20, 120)
+            lines = [(f"ITEM {rng.randrange(num_items)}", rng.randint(1, 4), 150 + 50 * rng.randrange(20))
+                     for _ in range(5)]
+            block = [f"Τραπέζι {1 + k % num_tables}\n",
+                     f"Έναρξη: {day} {start_min // 60:02d}:{start_min % 60:02d}:00\n",
+                     "Παραγγελίες:\n"]
+            for iname, qty, price in lines:
+                block.append(f" - {iname}: {qty} x {price // 100}.{price % 100:02d}€ = "
+                             f"{qty * price // 100}.{qty * price % 100:02d}€\n")
+            total = sum(q * p for _, q, p in lines)
+            block.append(f"Σύνολο: €{total // 100}.{total % 100:02d}\n")
+            block.append(f"Ολοκλήρωση: {day} {min(end_min, 1439) // 60:02d}:{min(end_min, 1439) % 60:02d}:00\n")
+            block.append("-" * 40 + "\n")
+            f.write("".join(block))
+
+    return;
+
+def bench_reports(sizes=(20000, 200000), memory_sizes=(2000, 20000)):
+    """
+    One streaming pass: time grows with the history, peak memory only
+    with the number of days/items/tables (tracemalloc is slow, hence
+    the smaller memory_sizes).
+    """
+    print("--- reports: synthetic completed_orders.txt ---")
+    categories = {f"ITEM {i}": f"CATEGORY {i % 8}" for i in range(80)}
+    with TemporaryDirectory() as tmp:
+        history_file = join(tmp, "completed_orders.txt")
+        for num_orders in sizes:
+            write_history(history_file, num_orders)
+            with open(history_file, "rb") as f:
+                num_lines = sum(1 for _ in f)
+            report(f"report {num_orders} orders ({num_lines} lines)",
+                   timed(lambda: build_report(iter_orders(history_file), categories), 1), num_lines)
+
+        for num_orders in memory_sizes:
+            write_history(history_file, num_orders)
+            tracemalloc.start()
+            build_report(iter_orders(history_file), categories)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report_memory(f"peak memory, {num_orders} orders", peak)
+
+    return;
+
+###################################################
+#      BULK IMPORT/EXPORT (process pool)          #
+###################################################
+def bench_bulk(num_orders=200000, max_workers=None):
+    """
+    rows/sec of the parallel export/import of completed_orders.txt for 1..N
+    processes (N = the cores). The export must be byte-identical and the
+    archive the same for every N. A multi-GB history: num_orders=6000000.
+    """
+    max_workers = max_workers or cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, max_workers} & set(range(1, max_workers + 1)))
+    with TemporaryDirectory() as tmp:
+        history_file = join(tmp, "completed_orders.txt")
+        write_history(history_file, num_orders)
+        print(f"--- bulk export/import: {num_orders} orders, {getsize(history_file) / (1 << 20):.0f} MiB, "
+              f"{cpu_count()} cores ---")
+
+        archive = CompletedOrdersArchive(join(tmp, "serial.sqlite3"))
+        t0 = perf_counter()
+        archive.import_text(history_file)
+        report("import_text (one process)", perf_counter() - t0, num_orders)
+        expected = archive.db.execute("SELECT COUNT(*), SUM(total_cents) FROM orders").fetchone()
+        archive.close()
+
+        digest = None
+        single = {} # Dict: { "export"/"import": seconds with one process }
+        def scaling(kind, seconds):
+            single.setdefault(kind, seconds)
+            print(f"{'':<8}speedup over 1 process: {single[kind] / seconds:.2f}x")
+
+            return;
+        for workers in counts:
+            out_file = join(tmp, "orders.jsonl")
+            t0 = perf_counter()
+            orders, _ = bulk_export([history_file], out_file, "jsonl", workers)
+            seconds = perf_counter() - t0
+            report(f"export jsonl, {workers} process(es)", seconds, orders)
+            scaling("export", seconds)
+            with open(out_file, "rb") as f:
+                this_digest = sha1(f.read()).hexdigest()
+            assert digest in (None, this_digest), "the export depends on the number of processes"
+            digest = this_digest
+            remove(out_file)
+
+            db_file = join(tmp, f"bulk_{workers}.sqlite3")
+            archive = CompletedOrdersArchive(db_file)
+            t0 = perf_counter()
+            _, parsed = bulk_import(archive, history_file, workers)
+            seconds = perf_counter() - t0
+            report(f"import, {workers} process(es)", seconds, parsed)
+            scaling("import", seconds)
+            assert archive.db.execute("SELECT COUNT(*), SUM(total_cents) FROM orders").fetchone() == expected
+            archive.close()
+            remove(db_file)
+        print(f"{'':<8}the same export (sha1 {digest[:12]}) and archive for every process count")
+
+        # A history written on Windows (CRLF): the same archive rows as import_text's
+        crlf_file = join(tmp, "completed_orders_crlf.txt")
+        with open(history_file, "rb") as f, open(crlf_file, "wb") as out:
+            out.write(f.read(1 << 20).rsplit(b"-----", 1)[0].replace(b"\n", b"\r\n"))
+        rows = []
+        for k, db_file in enumerate((join(tmp, "crlf_text.sqlite3"), join(tmp, "crlf_bulk.sqlite3"))):
+            archive = CompletedOrdersArchive(db_file)
+            archive.import_text(crlf_file) if k == 0 else bulk_import(archive, crlf_file, max_workers)
+            rows.append(archive.db.execute("SELECT table_id, start_time, closed_time, day, total_cents "
+                                           "FROM orders ORDER BY order_id").fetchall())
+            archive.close()
+        assert rows[0] == rows[1] and rows[0] and "\r" not in rows[1][0][2], "CRLF history imported differently"
+        print(f"{'':<8}CRLF history: the same {len(rows[0])} orders as import_text")
+
+    return;
+
+###################################################
+#           MENU SEARCH (index build/query)       #
+###################################################
+def bench_search(num_items=5000, seed=3):
+    print(f"--- menu search: {num_items} items ---")
+    rng = random.Random(seed)
+    words = ["ΣΟΥΒΛΑΚΙ", "ΚΟΤΟΠΟΥΛΟ", "ΧΟΙΡΙΝΟ", "Φέτα", "ψητή", "ΣΑΛΑΤΑ", "ΜΠΥΡΑ",
+             "PEPSI", "Café", "ZERO", "ΠΑΤΑΤΕΣ", "ΤΗΓΑΝΗΤΕΣ", "ΣΑΓΑΝΑΚΙ", "ΝΤΑΚΟΣ"]
+    items = [Item(f"{' '.join(rng.sample(words, 3))} {i}", 100 + i, i, str(i + 1)) for i in range(num_items)]
+
+    report("MenuIndex build", timed(lambda: MenuIndex(items), 3))
+    index = MenuIndex(items)
+    queries = ["σουβ", "κοτοπ", "feta", "φετα ψη", "cafe zero", "ΓΑΝΗ", "1234", "xyz"]
+    for q in queries:
+        seconds = timed(lambda: index.search(q), 20)
+        report(f"search '{q}' ({len(index.search(q))} results)", seconds)
+
+    return;
+
+###################################################
+#         STUB WIDGETS (no display needed)        #
+###################################################
+def _no_op(*args, **kwargs):
+    return None;
+
+class StubWidget:
+    """
+    Stands in for every Tk widget: remembers its options and children,
+    draws nothing. Measures the Python side of the GUI code only.
+    """
+    _next_id = 0
+
+    def __init__(self, parent=None, **options):
+        self.parent = parent
+        self.options = options
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+
+        return;
+
+    def config(self, **options):
+        self.options.update(options)
+        return;
+
+    configure = config
+    itemconfigure = _no_op
+
+    def __getitem__(self, key):
+        return self.options.get(key, "white");
+
+    def winfo_children(self):
+        return list(self.children);
+
+    def winfo_height(self):
+        return 800;
+
+    def destroy(self):
+        if self.parent is not None and self in self.parent.children:
+            self.parent.children.remove(self)
+        return;
+
+    def canvasy(self, y):
+        return float(y);
+
+    def create_window(self, *args, **kwargs):
+        StubWidget._next_id += 1
+        return StubWidget._next_id;
+
+    def bbox(self, *args):
+        return (0, 0, 0, 0);
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _no_op; # pack, grid, bind, coords, yview, focus_set, ...
+
+class StubTk(StubWidget):
+    """The root: after_idle callbacks run on update(), timers never fire."""
+    def __init__(self):
+        super().__init__()
+        self.idle = []
+
+        return;
+
+    def after_idle(self, func, *args):
+        self.idle.append((func, args))
+        return;
+
+    def update(self):
+        while self.idle:
+            func, args = self.idle.pop(0)
+            func(*args)
+
+        return;
+
+class StubStringVar:
+    def __init__(self, value=""):
+        self.value = value
+        self.callbacks = []
+
+        return;
+
+    def get(self):
+        return self.value;
+
+    def set(self, value):
+        self.value = value
+        for callback in self.callbacks:
+            callback()
+
+        return;
+
+    def trace_add(self, mode, callback):
+        self.callbacks.append(callback)
+        return;
+
+STUB_TK = SimpleNamespace(Tk=StubTk, Toplevel=StubWidget, Frame=StubWidget, Label=StubWidget,
+                          Button=StubWidget, Canvas=StubWidget, Scrollbar=StubWidget, Entry=StubWidget,
+                          StringVar=StubStringVar, TclError=Exception)
+
+@contextmanager
+def stub_widgets():
+    """Run the GUI module on STUB_TK (and answer "yes" to every askyesno)."""
+    import kapouKapou_tableManager as ui
+    saved = ui.tk, ui.askyesno
+    ui.tk, ui.askyesno = STUB_TK, lambda *args: True
+    try:
+        yield
+    finally:
+        ui.tk, ui.askyesno = saved
+
+###################################################
+#            GUI STARTUP (needs a display)        #
+###################################################
+def bench_gui_class():
+    from kapouKapou_tableManager import TableManagerGUI
+
+    class BenchGUI(TableManagerGUI):
+        """TableManagerGUI that never touches ordersData/."""
+        def start_auto_save(self):
+            return;
+
+    return BenchGUI;
+
+def has_display():
+    import tkinter as tk
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        return False;
+
+    return True;
+
+def make_gui(num_tables, num_items, settings=None, stub=False):
+    """
+    (root, app) on a fresh Tk, or None without a display.
+    stub=True: on StubTk instead (call it inside stub_widgets()).
+    """
+    if stub:
+        root = StubTk()
+    else:
+        import tkinter as tk
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            return None;
+    root.state = lambda *args: None # "zoomed" is Windows only
+
+    catalog = ItemCatalog()
+    items, menu_dict = make_menu(num_items, catalog)
+    tables = [Table(i, catalog) for i in range(1, num_tables + 1)]
+
+    engine = OrderEngine(tables, items, menu_dict, settings)
+
+    return root, bench_gui_class()(root, engine);
+
+def bench_startup(sizes=((12, 22), (100, 300), (1000, 2000))):
+    print("--- GUI startup (every card and menu row built, in process) ---")
+    for num_tables, num_items in sizes:
+        for mode in ("0", "1"):
+            if mode == "0" and num_tables > 100:
+                continue; # The eager grid takes far too long here
+            t0 = perf_counter()
+            gui = make_gui(num_tables, num_items, {"VIRTUAL_UI": mode})
+            if gui is None:
+                print("(no display, skipped)")
+                return;
+            root, app = gui
+            root.update()
+            elapsed = perf_counter() - t0
+            label = "virtual" if mode == "1" else "eager"
+            report(f"{label} {num_tables} tables, {num_items} items", elapsed)
+            root.destroy()
+
+    return;
+
+STARTUP_CHILD = """
+import sys
+from time import sleep
+sys.path.insert(0, sys.argv[1])
+import kapouKapou_tableManager as ui
+from kapouKapou_core import open_engine
+if sys.argv[3] == "1": # No display
+    from kapouKapou_benchmark import STUB_TK
+    ui.tk = STUB_TK
+engine = open_engine(sys.argv[2], background_restore=sys.argv[4] == "1")
+root = ui.tk.Tk()
+root.state = lambda *args: None # "zoomed" is Windows only
+app = ui.TableManagerGUI(root, engine)
+root.after_idle(lambda: print("frame", flush=True)) # Runs after the first redraw
+root.update()
+while not (app.started and not app.pending_cards and app.pending_menu is None):
+    app.wait_restored() # (the stub root has no timers)
+    root.update()
+    sleep(0.001) # Idle, as mainloop() would be
+print("loaded", flush=True)
+engine.close()
+"""
+
+def make_site(site_dir, num_tables, num_items, lines_per_table=20, journal_tail=200, seed=23, floors=None):
+    """
+    appData/ordersData of an installation: a snapshot of every table plus a journal tail.
+    floors: the FLOORS setting (e.g. "A:250,B:250"), else one floor of num_tables.
+    """
+    makedirs(join(site_dir, "appData"))
+    with open(join(site_dir, "appData", "menu.txt"), "w", encoding="utf-8") as f:
+        for i in range(num_items):
+            if i % 20 == 0:
+                f.write(f"\nCATEGORY {i // 20}\n")
+            f.write(f"ITEM {i}-{1 + i % 20}.50\n")
+    with open(join(site_dir, "appData", "settings.txt"), "w", encoding="utf-8") as f:
+        f.write(f"ARITHMOS_TRAPEZION={num_tables}\n")
+        if floors:
+            f.write(f"FLOORS={floors}\n")
+
+    rng = random.Random(seed)
+    engine = open_engine(site_dir)
+    for t in engine.tables:
+        for _ in range(lines_per_table):
+            engine.add_item(t.table_id, f"ITEM {rng.randrange(num_items)}")
+    engine.save()
+    for _ in range(journal_tail):
+        engine.add_item(rng.randint(1, num_tables), f"ITEM {rng.randrange(num_items)}")
+    engine.close()
+
+    return;
+
+def bench_firstframe(sizes=((100, 300), (500, 2000), (2000, 2000)), target_ms=300):
+    """
+    Fresh process to the first frame of the window (imports included) and
+    to everything built and restored: the orders restored on the startup
+    thread vs in the background, the eager vs the virtual grid/menu.
+    """
+    stubbed = not has_display()
+    print(f"--- startup to first frame (new process){' (stub widgets, no display)' if stubbed else ''} ---")
+    script_dir = dirname(abspath(__file__))
+    t0 = perf_counter()
+    subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {script_dir!r}); "
+                                          "import kapouKapou_tableManager"], check=True)
+    report("interpreter + imports only", perf_counter() - t0)
+    for num_tables, num_items in sizes:
+        print(f"{num_tables} tables x 20 lines, {num_items} menu items:")
+        with TemporaryDirectory() as tmp:
+            make_site(join(tmp, "site"), num_tables, num_items)
+            for mode in ("0", "auto"):
+                for background in ("0", "1"):
+                    site_dir = join(tmp, f"run_{mode}_{background}") # The same journal tail every run
+                    copytree(join(tmp, "site"), site_dir)
+                    with open(join(site_dir, "appData", "settings.txt"), "a", encoding="utf-8") as f:
+                        f.write(f"VIRTUAL_UI={mode}\n")
+                    t0 = perf_counter()
+                    child = subprocess.Popen([sys.executable, "-c", STARTUP_CHILD, script_dir, site_dir,
+                                              "1" if stubbed else "0", background],
+                                             stdout=subprocess.PIPE, text=True)
+                    marks = {}
+                    for line in child.stdout:
+                        marks[line.strip()] = perf_counter() - t0
+                    child.wait()
+                    label = (f"{num_tables} tables {'eager' if mode == '0' else 'auto'}, "
+                             f"{'bg' if background == '1' else 'sync'} restore")
+                    report(f"{label}: first frame", marks["frame"])
+                    report(f"{label}: all loaded", marks["loaded"])
+                    if num_tables == 500 and mode == "auto" and background == "1":
+                        verdict = "ok" if marks["frame"] * 1000 < target_ms else "MISSED"
+                        print(f"{'':<8}target: first frame < {target_ms} ms at 500 tables: {verdict}")
+
+    return;
+
+###################################################
+#          SERVICE SIMULATION (core + GUI)        #
+###################################################
+def random_stream(rng, num_tables, names, ops):
+    """[(op, table_id, item_name), ...]: 60% add, 30% remove, 10% complete (+ get_total every op)."""
+    stream = []
+    for _ in range(ops):
+        r = rng.random()
+        op = "add" if r < 0.6 else "remove" if r < 0.9 else "complete"
+        stream.append((op, rng.randint(1, num_tables), rng.choice(names)))
+
+    return stream;
+
+def bench_service(num_tables=60, num_items=200, ops=20000, seed=7):
+    """
+    A service on the headless engine: journal, archive and
+    completed_orders.txt in a throwaway folder, no background writer
+    (every write is part of the measured operation).
+    """
+    print(f"--- service: {num_tables} tables, {num_items} items, {ops} random ops ---")
+    rng = random.Random(seed)
+    with TemporaryDirectory() as tmp, open(devnull, "w") as null:
+        def open_bench_engine():
+            catalog = ItemCatalog()
+            items, menu_dict = make_menu(num_items, catalog)
+            tables = [Table(i, catalog) for i in range(1, num_tables + 1)]
+            journal = OrderJournal(join(tmp, "orders.journal"))
+            load_orders(tables, join(tmp, "orders.txt"), journal)
+            for t in tables:
+                t.journal = journal
+            archive = CompletedOrdersArchive(join(tmp, "completed_orders.sqlite3"))
+            return OrderEngine(tables, items, menu_dict, {}, journal, archive, join(tmp, "orders.txt"),
+                               join(tmp, "completed_orders.txt"), catalog=catalog);
+
+        def run(engine, stream, samples):
+            for op, table_id, iname in stream:
+                t0 = perf_counter()
+                if op == "add":
+                    engine.add_item(table_id, iname, 1)
+                elif op == "remove":
+                    engine.remove_item(table_id, iname, 1)
+                else:
+                    engine.complete_order(table_id) # save_completed_order: text file + archive
+                t1 = perf_counter()
+                engine.tables_by_id[table_id].get_total()
+                samples[op].append(t1 - t0)
+                samples["get_total"].append(perf_counter() - t1)
+
+        names = [f"ITEM {i}" for i in range(num_items)]
+        stream = random_stream(rng, num_tables, names, ops)
+        engine = open_bench_engine()
+        samples = {"add": [], "remove": [], "complete": [], "get_total": []}
+        with redirect_stdout(null): # save_completed_order prints every receipt
+            run(engine, stream, samples)
+        for op, op_samples in samples.items():
+            report_latency(op, op_samples)
+
+        def save_changed():
+            for floor in engine.floors:
+                floor.dirty = True # As after a change: a clean floor is not written at all
+            engine.save()
+
+            return;
+        report("save_orders (snapshot + journal compact)", timed(save_changed))
+        restored = [Table(i, engine.catalog) for i in range(1, num_tables + 1)]
+        report("load_orders (snapshot)", timed(lambda: load_orders(restored, engine.orders_file)))
+        engine.close()
+
+        # Memory: a shorter stream under tracemalloc (slow), fresh files
+        for name in snapshot_files(engine.orders_file) + [join(tmp, "orders.journal")]:
+            remove(name)
+        tracemalloc.start()
+        engine = open_bench_engine()
+        with redirect_stdout(null):
+            run(engine, stream[:ops // 10], {"add": [], "remove": [], "complete": [], "get_total": []})
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report_memory(f"engine after {ops // 10} ops", current)
+        report_memory("peak during them", peak)
+        engine.close()
+
+    return;
+
+def bench_gui(num_tables=60, num_items=200, ops=3000, seed=11):
+    """
+    Clicks on the GUI: select_table, +/- (until the coalesced redraw ran)
+    and refresh_table_ui, on a real Tk or, without a display, on stub widgets.
+    """
+    rng = random.Random(seed)
+    gui = make_gui(num_tables, num_items, {"VIRTUAL_UI": "0"})
+    stubbed = gui is None
+    print(f"--- GUI: {num_tables} tables, {num_items} items, {ops} clicks"
+          f"{' (stub widgets, no display)' if stubbed else ''} ---")
+    samples = {"select_table": [], "click (+/-, redraw)": [], "refresh_table_ui": []}
+    with stub_widgets() if stubbed else nullcontext(), open(devnull, "w") as null:
+        if stubbed:
+            gui = make_gui(num_tables, num_items, {"VIRTUAL_UI": "0"}, stub=True)
+        root, app = gui
+        root.update()
+        names = [f"ITEM {i}" for i in range(num_items)]
+        with redirect_stdout(null): # Every click is logged to the terminal
+            for op, table_id, iname in random_stream(rng, num_tables, names, ops):
+                table = app.engine.tables_by_id[table_id]
+                t0 = perf_counter()
+                app.select_table(table)
+                root.update()
+                t1 = perf_counter()
+                if op == "remove":
+                    app.menu_remove_item(iname)
+                else:
+                    app.menu_add_item(iname)
+                root.update()
+                t2 = perf_counter()
+                app.refresh_table_ui(table)
+                samples["select_table"].append(t1 - t0)
+                samples["click (+/-, redraw)"].append(t2 - t1)
+                samples["refresh_table_ui"].append(perf_counter() - t2)
+        root.destroy()
+    for name, op_samples in samples.items():
+        report_latency(name, op_samples)
+
+    return;
+
+def bench_select(sizes=(20, 2000), num_tables=12, clicks=500):
+    """
+    select_table (highlight + menu color) with a short and a long eager
+    menu: the cost must not grow with the number of menu items.
+    """
+    stubbed = not has_display()
+    print(f"--- select_table: menu of {' vs '.join(map(str, sizes))} items"
+          f"{' (stub widgets, no display)' if stubbed else ''} ---")
+    per_click = []
+    with stub_widgets() if stubbed else nullcontext():
+        for num_items in sizes:
+            root, app = make_gui(num_tables, num_items, {"VIRTUAL_UI": "0"}, stub=stubbed)
+            root.update()
+            tables = app.engine.tables
+            def click():
+                for k in range(clicks):
+                    app.select_table(tables[k % num_tables])
+                    root.update()
+            seconds = timed(click, 3) / clicks
+            per_click.append(seconds)
+            report(f"select_table, {num_items} menu items", seconds)
+            root.destroy()
+    print(f"{'ratio (long/short menu)':<48} {per_click[-1] / per_click[0]:10.2f} x")
+
+    return;
+
+###################################################
+#            FLOORS (one shard per floor)         #
+###################################################
+def bench_floors(num_tables=1000, counts=(1, 4, 10), repeat=5):
+    """
+    An order on one table, then the snapshot: one floor rewrites all the
+    tables, with F floors only the floor of that table is rewritten.
+    """
+    print(f"--- snapshot after one change, {num_tables} tables x 20 lines ---")
+    for count in counts:
+        with TemporaryDirectory() as tmp:
+            floors = ",".join(f"F{k}:{num_tables // count}" for k in range(count)) if count > 1 else None
+            make_site(tmp, num_tables, 200, journal_tail=0, floors=floors)
+            engine = open_engine(tmp)
+            engine.save() # Every floor is dirty after the restore
+            engine.writer.flush()
+
+            def change_and_save():
+                engine.add_item(1, "ITEM 1")
+                engine.save()
+                engine.writer.flush()
+
+                return;
+            seconds = timed(change_and_save, repeat=repeat)
+            engine.close()
+            written = getsize(join(tmp, "ordersData", "orders.txt" if count == 1 else "orders_F0.txt"))
+            report(f"{count} floor(s): change + save", seconds)
+            print(f"{'':<8}bytes rewritten per save: {written}")
+
+    return;
+
+###################################################
+#      LIVE ANALYTICS (badges, idle, heatmap)     #
+###################################################
+def bench_ticker(num_tables=500, num_orders=20000):
+    """
+    The elapsed/idle badges: one tick of the single `after` loop over every
+    card, when no minute changed vs when every table turned a minute older.
+    The heatmap: kept up to date per completion vs rebuilt from the history.
+    """
+    stubbed = not has_display()
+    print(f"--- elapsed badges: {num_tables} occupied tables{' (stub widgets, no display)' if stubbed else ''} ---")
+    with stub_widgets() if stubbed else nullcontext(), open(devnull, "w") as null, redirect_stdout(null):
+        root, app = make_gui(num_tables, 100, {"VIRTUAL_UI": "0"}, stub=stubbed)
+        root.update()
+        for table_id in range(1, num_tables + 1):
+            app.engine.add_item(table_id, "ITEM 1")
+        root.update()
+
+        def changed_badges():
+            now = int(time())
+            return sum(1 for card in app.table_cards.values()
+                       if card.shown_badge != app.elapsed_badge(card.table, now));
+        app.elapsed_timer()
+        idle_changes = changed_badges()
+        idle_tick = timed(app.elapsed_timer)
+        for table in app.tables:
+            table.start_time -= 60
+        minute_changes = changed_badges()
+        minute_tick = timed(app.elapsed_timer, repeat=1)
+        root.destroy()
+    report(f"tick, no minute changed ({idle_changes} labels)", idle_tick)
+    report(f"tick, every table a minute older ({minute_changes} labels)", minute_tick)
+
+    print(f"--- occupancy heatmap: {num_orders} completed orders ---")
+    with TemporaryDirectory() as tmp:
+        history_file = join(tmp, "completed_orders.txt")
+        write_history(history_file, num_orders)
+        spans = [(parse_time(order["start_time"]), parse_time(order["closed_time"]))
+                 for order in iter_orders(history_file)]
+
+        def rescan():
+            heatmap = OccupancyHeatmap()
+            for order in iter_orders(history_file):
+                heatmap.add(parse_time(order["start_time"]), parse_time(order["closed_time"]))
+
+            return;
+        report(f"rebuild from the history ({num_orders} orders)", timed(rescan, 1))
+
+        heatmap = OccupancyHeatmap()
+        def incremental():
+            for start, closed in spans:
+                heatmap.add(start, closed)
+
+            return;
+        report("heatmap.add per completion", timed(incremental, 1) / len(spans))
+
+    return;
+
+###################################################
+#      KITCHEN/BAR DISPATCH (worker processes)    #
+###################################################
+DISPATCH_ROUTES = {"CATEGORY 0": "grill", "CATEGORY 1": "bar"} # CATEGORY 2 is not routed
+
+def printed_seqs(ticket_file):
+    """{ seq: times printed } of a station's ticket file."""
+    seqs = {}
+    if exists(ticket_file):
+        with open(ticket_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("==== "):
+                    seq = int(line.rsplit("#", 1)[1])
+                    seqs[seq] = seqs.get(seq, 0) + 1
+
+    return seqs;
+
+def item_events(num_tables, names, count, seed):
+    rng = random.Random(seed)
+    return [(SimpleNamespace(table_id=rng.randint(1, num_tables)), rng.choice(names),
+             -1 if rng.random() < 0.2 else 1) for _ in range(count)];
+
+def bench_dispatch(num_tables=60, events=20000, window=0.05, seed=17):
+    """
+    Item changes through the dispatcher to file printers in worker processes:
+      - throughput and create-to-printed latency,
+      - backpressure: the printer is down for a second (bounded queues),
+      - at-least-once: the workers are killed mid-stream and restarted.
+    """
+    from kapouKapou_dispatch import Dispatcher
+
+    print(f"--- dispatch: {events} item changes, {num_tables} tables, {window * 1000:.0f} ms window ---")
+    _, menu_dict = make_menu(60, ItemCatalog())
+    names = [it.name for it in menu_dict["CATEGORY 0"] + menu_dict["CATEGORY 1"] + menu_dict["CATEGORY 2"]]
+
+    with TemporaryDirectory() as tmp:
+        # Throughput: every change its own ticket (a table each, no window), then
+        # a service-like stream (num_tables tables, coalesced within the window)
+        runs = (("1 change/ticket", 0.0, events), (f"{window * 1000:.0f} ms window", window, num_tables))
+        for name, seconds, tables in runs:
+            metrics = Metrics()
+            dispatcher = Dispatcher(join(tmp, name), menu_dict, DISPATCH_ROUTES, seconds, metrics=metrics)
+            dispatcher.start()
+            dispatcher.on_item(SimpleNamespace(table_id=1), names[0], 1) # Wait for the worker processes
+            dispatcher.drain()
+            metrics = dispatcher.metrics = Metrics()
+            first = sum(dispatcher.seq.values())
+
+            stream = item_events(tables, names, events, seed)
+            t0 = perf_counter()
+            for table, iname, qty in stream:
+                dispatcher.on_item(table, iname, qty)
+            enqueued = perf_counter() - t0
+            dispatcher.drain()
+            elapsed = perf_counter() - t0
+            dispatcher.close()
+            tickets = sum(dispatcher.seq.values()) - first
+            latency = metrics.snapshot()["histograms"]["dispatch_ms"]
+            report(f"on_item, {name} (caller side)", enqueued, events)
+            report(f"all printed, {name} ({tickets} tickets)", elapsed, events)
+            RESULTS[f"dispatch {name} p50"] = latency["p50"]
+            RESULTS[f"dispatch {name} p99"] = latency["p99"]
+            print(f"{'':<8}{tickets / elapsed:10.0f} tickets/sec   {events / tickets:6.1f} changes/ticket   "
+                  f"latency p50 <= {latency['p50']} ms  p99 <= {latency['p99']} ms")
+
+        # Backpressure: no printer for a second, tiny queues => on_item blocks, nothing is lost
+        socket_path = join(tmp, "printer.sock")
+        dispatcher = Dispatcher(join(tmp, "backpressure"), menu_dict, {"CATEGORY 0": "grill"}, 0.001,
+                                queue_size=4, max_pending=50, printers={"grill": f"unix:{socket_path}"})
+        dispatcher.start()
+        received = []
+        def printer():
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+                server.bind(socket_path)
+                server.listen()
+                conn, _ = server.accept()
+                with conn:
+                    while (data := conn.recv(65536)):
+                        received.append(data)
+
+            return;
+        Timer(1.0, printer).start()
+        grill = [name for name in names if name in dispatcher.item_station]
+        blocked = 0.0
+        for k in range(2000):
+            t1 = perf_counter()
+            dispatcher.on_item(SimpleNamespace(table_id=1 + k % num_tables), grill[k % len(grill)], 1)
+            blocked = max(blocked, perf_counter() - t1)
+        assert dispatcher.drain(30), "tickets left after the printer came back"
+        dispatcher.close()
+        printed = sum(1 for line in b"".join(received).decode("utf-8").splitlines() if line.startswith("==== "))
+        assert printed == dispatcher.seq["grill"], (printed, dispatcher.seq)
+        print(f"printer down 1 s: longest on_item wait {blocked * 1000:.0f} ms, "
+              f"{printed} tickets printed after it came back")
+
+        # At-least-once: kill the workers while they print, then start again
+        dispatch_dir = join(tmp, "restart")
+        dispatcher = Dispatcher(dispatch_dir, menu_dict, DISPATCH_ROUTES, 0.0, queue_size=100000)
+        dispatcher.start()
+        for table, iname, qty in item_events(events, names, events, seed + 1):
+            dispatcher.on_item(table, iname, qty)
+        while dispatcher.pending or not any(dispatcher.acked.values()):
+            sleep(0.001)
+        for station, worker in dispatcher.workers.items():
+            worker.kill()
+            worker.join()
+            dispatcher.queues[station].cancel_join_thread()
+        sleep(0.2) # Let the ack collector of the killed run settle
+        spooled = dict(dispatcher.seq)
+
+        restarted = Dispatcher(dispatch_dir, menu_dict, DISPATCH_ROUTES, 0.005)
+        restarted.start()
+        assert restarted.drain(60), "redelivery did not finish"
+        restarted.close()
+        duplicates = 0
+        for station, last_seq in spooled.items():
+            seqs = printed_seqs(join(dispatch_dir, f"{station}_tickets.txt"))
+            missing = [seq for seq in range(1, last_seq + 1) if seq not in seqs]
+            assert not missing, f"{station}: tickets {missing[:5]}... never printed"
+            duplicates += sum(n - 1 for n in seqs.values())
+        print(f"workers killed: {len(restarted.backlog)} of {sum(spooled.values())} tickets sent again, "
+              f"all printed, {duplicates} printed twice")
+
+    return;
+
+###################################################
+#      RECEIPTS (cached lines, printer stand-in)  #
+###################################################
+def legacy_receipt(order):
+    """A receipt the way save_completed_order used to build it: an f-string per line, then a join."""
+    order_details = [f"Τραπέζι {order['table_id']}\n", f"Έναρξη: {order['start_time']}\n", "Παραγγελίες:\n"]
+    for iname, qty, price in order["lines"]:
+        order_details.append(f" - {iname}: {qty} x {format_cents(price)}€ = {format_cents(qty * price)}€\n")
+    order_details.append(f"Σύνολο: €{format_cents(order['total_cents'])}\n")
+    order_details.append(f"Ολοκλήρωση: {order['closed_time']}\n")
+    order_details.append("-" * 40 + "\n")
+
+    return ''.join(order_details);
+
+def bench_receipts(num_orders=5000, num_tables=600, lines_per_table=8, num_items=200):
+    """
+    Rendering: f-strings per line vs the cached fragments of every template.
+    Closing: num_tables tables of lines_per_table lines each, completed one
+    after the other through the background writer (completed_orders.txt,
+    archive) and an ESC/POS receipt printer on a local socket stand-in.
+    """
+    print(f"--- receipts: rendering {num_orders} orders ---")
+    with TemporaryDirectory() as tmp:
+        history_file = join(tmp, "completed_orders.txt")
+        write_history(history_file, num_orders)
+        orders = list(iter_orders(history_file))
+        for order in orders:
+            order["shares"] = None
+
+        legacy = [legacy_receipt(order) for order in orders]
+        seconds = timed(lambda: [legacy_receipt(order) for order in orders])
+        report("f-strings per line (old save_completed_order)", seconds / len(orders), 1)
+        for name in ("greek", "plain", "escpos"):
+            renderer = ReceiptRenderer(make_template(name))
+            seconds = timed(lambda: [renderer.render(order) for order in orders])
+            report(f"ReceiptRenderer '{name}' ({len(renderer.fragments)} cached lines)", seconds / len(orders), 1)
+            if name == "greek":
+                assert [renderer.render(order) for order in orders] == legacy, "the Greek layout changed"
+
+    print(f"--- receipts: closing {num_tables} tables of {lines_per_table} lines (ESC/POS to a socket) ---")
+    with TemporaryDirectory() as tmp, open(devnull, "w") as null, redirect_stdout(null):
+        socket_path = join(tmp, "printer.sock")
+        received = []
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen()
+        def printer():
+            conn, _ = server.accept()
+            with conn:
+                while (data := conn.recv(65536)):
+                    received.append(data)
+
+            return;
+        Timer(0, printer).start()
+
+        catalog = ItemCatalog()
+        items, menu_dict = make_menu(num_items, catalog)
+        tables = [Table(i, catalog) for i in range(1, num_tables + 1)]
+        journal = OrderJournal(join(tmp, "orders.journal"))
+        for t in tables:
+            t.journal = journal
+        archive = CompletedOrdersArchive(join(tmp, "completed_orders.sqlite3"))
+        writer = BackgroundWriter()
+        receipt_printer = ReceiptPrinter(f"unix:{socket_path}", ReceiptRenderer(EscPosReceipt()), None)
+        engine = OrderEngine(tables, items, menu_dict, {}, journal, archive, join(tmp, "orders.txt"),
+                             join(tmp, "completed_orders.txt"), writer, catalog=catalog,
+                             receipt_printer=receipt_printer)
+        for t in tables:
+            for j in range(lines_per_table):
+                engine.add_item(t.table_id, f"ITEM {(t.table_id * 7 + j) % num_items}", 1 + j % 3)
+        writer.flush()
+
+        t0 = perf_counter()
+        for t in tables:
+            engine.complete_order(t.table_id)
+        closed = perf_counter() - t0
+        writer.flush()
+        receipt_printer.flush()
+        elapsed = perf_counter() - t0
+        engine.close()
+        server.close()
+        history = list(iter_orders(join(tmp, "completed_orders.txt")))
+    cuts = b"".join(received).count(EscPosReceipt.FEED_CUT)
+    assert len(history) == num_tables and cuts == num_tables, (len(history), cuts)
+    report(f"complete_order x {num_tables} (caller side)", closed, num_tables)
+    report(f"{num_tables} receipts written and printed", elapsed, num_tables)
+    print(f"{'':<8}{num_tables / elapsed * 60:12.0f} tables/minute   "
+          f"{sum(map(len, received)) / num_tables:.0f} bytes/receipt on the socket")
+
+    return;
+
+###################################################
+#        ORDER SERVER (localhost load test)       #
+###################################################
+def bench_server(client_counts=(1, 8, 32), orders_per_client=300):
+    from kapouKapou_server import run_self_test
+
+    print(f"--- order server: {orders_per_client} orders per client ---")
+    for clients in client_counts:
+        orders_per_sec, p50, p99 = asyncio.run(run_self_test(clients, orders_per_client))
+        RESULTS[f"server {clients} clients p50"] = round(p50, 4)
+        RESULTS[f"server {clients} clients p99"] = round(p99, 4)
+        print(f"{clients:3d} clients {orders_per_sec:12.0f} orders/sec   p50 {p50:.3f} ms   p99 {p99:.3f} ms")
+
+    return;
+
+BENCHMARKS = {
+    "memory": bench_memory,
+    "totals": bench_totals,
+    "journal": bench_journal,
+    "restore": bench_restore,
+    "faults": bench_faults,
+    "binary": bench_binary,
+    "history": bench_history,
+    "transfer": bench_transfer,
+    "archive": bench_archive,
+    "search": bench_search,
+    "reports": bench_reports,
+    "bulk": bench_bulk,
+    "service": bench_service,
+    "gui": bench_gui,
+    "select": bench_select,
+    "startup": bench_startup,
+    "firstframe": bench_firstframe,
+    "floors": bench_floors,
+    "ticker": bench_ticker,
+    "dispatch": bench_dispatch,
+    "receipts": bench_receipts,
+    "server": bench_server,
+}
+
+###################################################
+#                     main()                      #
+###################################################
+def compare_baseline(baseline, tolerance):
+    """Print every result that got worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, value in RESULTS.items():
+        old = baseline.get(name)
+        if old is None:
+            continue;
+        if value > max(old, 0.05) * (1 + tolerance): # Sub-0.05 values are noise
+            regressions.append(name)
+            print(f"[!] REGRESSION {name}: {old} => {value} ({value / max(old, 0.05):.2f}x)")
+    print(f"--- baseline: {len(regressions)} regression(s) in {len(RESULTS)} results ---")
+
+    return regressions;
+
+def main():
+    default_baseline = join(dirname(abspath(__file__)), "benchmark_baseline.json")
+
+    parser = argparse.ArgumentParser(
+        description="TableManager benchmarks",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="baselines:\n"
+               "  The times depend on the machine, so a baseline is local to it (benchmark_baseline.json\n"
+               "  is not in git): run with --save-baseline before a change, then with --compare after\n"
+               "  it, on the same machine. Without FILE both use benchmark_baseline.json.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--save-baseline", nargs="?", const=default_baseline, metavar="FILE",
+                        help="store the results as the baseline (merged into FILE)")
+    parser.add_argument("--compare", nargs="?", const=default_baseline, metavar="FILE",
+                        help="compare with a stored baseline, exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before --compare reports it (default 0.25 = 25%%)")
+    args = parser.parse_args()
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+
+    if args.compare and not exists(args.compare):
+        print(f"[!] Baseline not found: {args.compare} (make one on this machine with --save-baseline)")
+        sys.exit(1)
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare_baseline(json.load(f), args.tolerance):
+                sys.exit(1)
+
+    if args.save_baseline:
+        baseline = {}
+        if exists(args.save_baseline):
+            with open(args.save_baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(RESULTS)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"Baseline saved: {args.save_baseline} ({len(RESULTS)} results)")
+
+    return;
+
+if __name__ == "__main__":
+    main()
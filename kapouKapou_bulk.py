@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, remove
+from os.path import join, dirname, abspath, exists, getsize
+from shutil import copyfileobj
+from time import perf_counter
+
+from kapouKapou_archive import parse_completed_orders, CompletedOrdersArchive
+
+SEPARATOR = b"-----" # The line that ends every block of save_completed_order
+CHUNKS_PER_WORKER = 4 # More chunks than workers: a slow chunk does not hold the others up
+CHUNK_BYTES = 16 << 20 # ...and never larger than this (a multi-GB history is not read at once)
+FORMATS = ("jsonl", "csv")
+
+###################################################
+#        CHUNKS (split at record boundaries)      #
+###################################################
+def split_chunks(history_file, num_chunks):
+    """
+    [(start, end), ...] byte ranges of completed_orders.txt, each starting
+    right after a '-----' line, so no order is cut in two. Evenly sized
+    (roughly), in file order; fewer when the file is small.
+    """
+    size = getsize(history_file)
+    bounds = [0]
+    with open(history_file, "rb") as f:
+        for k in range(1, num_chunks):
+            target = size * k // num_chunks
+            if target <= bounds[-1]:
+                continue;
+            f.seek(target)
+            f.readline() # Most likely the middle of a line
+            while True:
+                line = f.readline()
+                if not line or line.startswith(SEPARATOR):
+                    break;
+            position = f.tell()
+            if position >= size:
+                break;
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start];
+
+def read_chunk(history_file, start, end):
+    """The orders of one chunk (parse_completed_orders dicts)."""
+    with open(history_file, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    # newline=None: "\r\n" read as "\n", as import_text reads the file (Windows writes CRLF in text mode)
+    return list(parse_completed_orders(io.StringIO(text, newline=None)));
+
+###################################################
+#          WORKERS (one chunk per task)           #
+###################################################
+def archive_rows(task):
+    """
+    Worker: a chunk as compact tuples for the archive, in file order:
+    (table_id, start_time, closed_time, lines, total_cents, void)
+    """
+    history_file, start, end = task
+    return [(o["table_id"], o["start_time"], o["closed_time"], o["lines"], o["total_cents"], o["void"])
+            for o in read_chunk(history_file, start, end)];
+
+def export_part(task):
+    """
+    Worker: a chunk converted to `fmt` in its own part file. Returns
+    (orders, lines) written; the parts are joined in chunk order.
+    """
+    history_file, start, end, fmt, part_file = task
+    orders = read_chunk(history_file, start, end)
+    num_lines = 0
+    with open(part_file, "w", encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            for o in orders:
+                f.write(json.dumps(o, ensure_ascii=False) + "\n")
+                num_lines += len(o["lines"])
+        else:
+            writer = csv.writer(f)
+            for o in orders:
+                for iname, qty, price in o["lines"]:
+                    writer.writerow((o["closed_time"], o["table_id"], o["start_time"], iname, qty, price,
+                                     o["void"] or ""))
+                num_lines += len(o["lines"])
+
+    return len(orders), num_lines;
+
+def make_tasks(history_files, workers):
+    """(history_file, start, end) of every chunk of every file, in order."""
+    tasks = []
+    for history_file in history_files:
+        num_chunks = max(workers * CHUNKS_PER_WORKER, getsize(history_file) // CHUNK_BYTES)
+        tasks += [(history_file, start, end) for start, end in split_chunks(history_file, num_chunks)]
+
+    return tasks;
+
+def run_tasks(func, tasks, workers):
+    """
+    func over the tasks, results in task order (workers=1: in this process).
+    At most 2 x workers results wait to be consumed, so the memory stays
+    bounded however large the history is.
+    """
+    if workers <= 1:
+        yield from map(func, tasks)
+        return;
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(func, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    return;
+
+###################################################
+#        BULK IMPORT/EXPORT (deterministic)       #
+###################################################
+def bulk_import(archive, history_file, workers=None):
+    """
+    The completed_orders.txt of one shop into its archive (an order is
+    (table_id, closed_time) there: two shops would collide): the chunks
+    are parsed in parallel and inserted here, in file order, in one
+    transaction. The archive ends up the same for any number of workers
+    (voids included) and the same as import_text's.
+    Returns (orders imported, orders parsed).
+    """
+    workers = workers or cpu_count() or 1
+    imported = parsed = 0
+    for rows in run_tasks(archive_rows, make_tasks([history_file], workers), workers):
+        parsed += len(rows)
+        for table_id, start_time, closed_time, lines, total, void in rows:
+            if void:
+                if archive.remove_order(table_id, closed_time, commit=False):
+                    imported -= 1
+            elif archive.add_order(table_id, start_time, closed_time, lines, total, commit=False):
+                imported += 1
+    archive.db.commit()
+
+    return imported, parsed;
+
+def bulk_export(history_files, out_file, fmt="jsonl", workers=None):
+    """
+    completed_orders.txt file(s) to out_file: one JSON object per order
+    ("jsonl") or one CSV row per order line ("csv"). Every chunk is
+    converted by a worker into out_file.part<k>; the parts are then joined
+    in chunk order, so the output is byte-identical for any worker count.
+    Returns (orders, lines).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format '{fmt}' ({', '.join(FORMATS)})")
+    workers = workers or cpu_count() or 1
+    tasks = [task + (fmt, f"{out_file}.part{k}") for k, task in enumerate(make_tasks(history_files, workers))]
+
+    orders = lines = 0
+    for part_orders, part_lines in run_tasks(export_part, tasks, workers):
+        orders += part_orders
+        lines += part_lines
+
+    with open(out_file, "wb") as out:
+        if fmt == "csv":
+            out.write("closed_time,table_id,start_time,item_name,qty,price_cents,void\r\n".encode("utf-8"))
+        for task in tasks:
+            part_file = task[-1]
+            with open(part_file, "rb") as part:
+                copyfileobj(part, out, 1 << 20)
+            remove(part_file)
+
+    return orders, lines;
+
+###################################################
+#                     main()                      #
+###################################################
+def main():
+    script_dir = dirname(abspath(__file__))
+
+    import argparse # Only the command line needs it
+    parser = argparse.ArgumentParser(description="Parallel import/export of completed_orders.txt")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("--file", action="append", dest="files",
+                        help="completed_orders.txt to read (default: this installation's); "
+                             "'export' takes several (repeat), 'import' one: every shop has its own archive")
+    parser.add_argument("--db", default=join(script_dir, "ordersData", "completed_orders.sqlite3"),
+                        help="archive for 'import'")
+    parser.add_argument("--out", help="output file for 'export'")
+    parser.add_argument("--format", default="jsonl", choices=FORMATS, help="'export' format")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: every core)")
+    args = parser.parse_args()
+
+    files = args.files or [join(script_dir, "ordersData", "completed_orders.txt")]
+    for history_file in files:
+        if not exists(history_file):
+            print(f"[!] File not found: {history_file}")
+            return;
+
+    t0 = perf_counter()
+    if args.command == "import":
+        if len(files) > 1:
+            print("[!] 'import' takes one --file: every shop has its own archive (--db)")
+            return;
+        archive = CompletedOrdersArchive(args.db)
+        imported, parsed = bulk_import(archive, files[0], args.workers)
+        archive.close()
+        print(f"Imported {imported} orders ({parsed} parsed)")
+    else:
+        if not args.out:
+            print("[!] 'export' needs --out")
+            return;
+        orders, lines = bulk_export(files, args.out, args.format, args.workers)
+        print(f"Exported {orders} orders ({lines} lines) to {args.out}")
+    print(f"{perf_counter() - t0:.1f} s")
+
+    return;
+
+if __name__ == "__main__":
+    main()
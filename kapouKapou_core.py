@@ -0,0 +1,2148 @@
+import json
+from os.path import join, exists, dirname, abspath, getsize, getmtime
+from os import makedirs, fsync, stat, replace, open as os_open, close, O_RDONLY
+from hashlib import sha1
+from mmap import mmap, ACCESS_READ
+import struct
+import sys
+from shutil import copyfile
+from datetime import datetime
+from time import monotonic, perf_counter, time
+from array import array
+from collections import deque
+from collections.abc import Mapping
+from functools import lru_cache
+from queue import Queue
+from threading import Thread, Event
+
+from kapouKapou_archive import CompletedOrdersArchive, parse_shifts, shift_of
+from kapouKapou_search import MenuIndex
+from kapouKapou_metrics import Metrics
+
+###################################################
+#              MONEY (integer cents)              #
+###################################################
+def parse_cents(text):
+    """'4.50' / '4,5' / '4' => 450 (exact, no float)."""
+    text = text.strip().replace(",", ".")
+    euros, _, cents = text.partition(".")
+    if not cents.isdigit() and cents != "":
+        raise ValueError(f"invalid price '{text}'")
+    sign = -1 if euros.startswith("-") else 1
+    return sign * (abs(int(euros or "0")) * 100 + int((cents + "00")[:2]));
+
+def format_cents(cents):
+    """450 => '4.50'"""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}";
+
+def split_cents(cents, n):
+    """1000 in 3 => [334, 333, 333]: n shares that add up exactly (the first ones take the odd cents)."""
+    if n < 1:
+        raise ValueError(f"cannot split in {n}")
+    share, rest = divmod(cents, n)
+    return [share + 1] * rest + [share] * (n - rest);
+
+class PriceMap(dict):
+    """
+    { item_name: price_cents } that counts its changes (every menu
+    reload bumps it), so the views know when the prices are stale.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+        return;
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+        return;
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+        return;
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+        return;
+
+###################################################
+#             TIME (epoch seconds)                #
+###################################################
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S" # How the files and the receipts show a time
+
+@lru_cache(maxsize=4096) # Every record of a table repeats its start_time
+def format_time(epoch):
+    """1700000000 => '2023-11-14 23:13:20' (local time); None => ''."""
+    return datetime.fromtimestamp(epoch).strftime(TIME_FORMAT) if epoch is not None else "";
+
+@lru_cache(maxsize=4096)
+def parse_time(text):
+    """'2023-11-14 23:13:20' => 1700000000 (int seconds); '', 'None' or garbage => None."""
+    try:
+        return int(datetime.strptime(text, TIME_FORMAT).timestamp());
+    except (TypeError, ValueError):
+        return None;
+
+###################################################
+#            ITEM CATALOG (name <=> id)           #
+###################################################
+class ItemCatalog:
+    """
+    Interns item names to small integer ids, so the tables store
+    ids in compact arrays instead of one string key per order line.
+    Names that are not in the menu (e.g. from an old orders.txt) get
+    an id on first use.
+    """
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids = {}   # Dict: { item_name: item_id }
+        self.names = [] # List: item_id => item_name
+
+        return;
+
+    def intern(self, name):
+        item_id = self.ids.get(name)
+        if item_id is None:
+            item_id = len(self.names)
+            self.ids[name] = item_id
+            self.names.append(name)
+
+        return item_id;
+
+    def __len__(self):
+        return len(self.names);
+
+DEFAULT_CATALOG = ItemCatalog() # Used by tables created without a catalog
+
+###################################################
+#                   CLASS ITEM                    #
+###################################################
+class Item:
+    __slots__ = ("name", "price_cents", "item_id", "code")
+
+    def __init__(self, name, price_cents, item_id=None, code=None):
+        self.name = name
+        self.price_cents = price_cents
+        self.item_id = item_id
+        self.code = code # Short code for the quick entry
+
+        return;
+
+    def __str__(self):
+        return f"{self.name} - €{format_cents(self.price_cents)}";
+
+###################################################
+#                   CLASS TABLE                   #
+###################################################
+class OrderLines(Mapping):
+    """
+    Read-only { item_name: quantity } view of a table's order lines (an
+    item moved in at another price has a line of its own: summed here).
+    """
+    __slots__ = ("table",)
+
+    def __init__(self, table):
+        self.table = table
+
+        return;
+
+    def __getitem__(self, item_name):
+        table = self.table
+        item_id = table.catalog.ids.get(item_name)
+        if item_id is not None and item_id in table.line_ids:
+            return sum(q for i, q in zip(table.line_ids, table.line_qty) if i == item_id);
+        raise KeyError(item_name)
+
+    def __contains__(self, item_name):
+        item_id = self.table.catalog.ids.get(item_name)
+        return item_id is not None and item_id in self.table.line_ids;
+
+    def __iter__(self):
+        names = self.table.catalog.names
+        return (names[i] for i in dict.fromkeys(self.table.line_ids));
+
+    def __len__(self):
+        return len(set(self.table.line_ids));
+
+    def items(self):
+        names = self.table.catalog.names
+        totals = {} # Dict: { item_id: qty }, in line order
+        for i, q in zip(self.table.line_ids, self.table.line_qty):
+            totals[i] = totals.get(i, 0) + q
+        return [(names[i], q) for i, q in totals.items()];
+
+class Table:
+    __slots__ = ("table_id", "start_time", "catalog", "line_ids", "line_qty", "line_price",
+                 "line_menu", "journal", "_total_cents")
+
+    def __init__(self, table_id, catalog=None):
+        self.table_id = table_id
+        self.start_time = None
+        self.catalog = catalog if catalog is not None else DEFAULT_CATALOG
+        # Order lines in insertion order: line_ids[k] (item id) x line_qty[k], priced at
+        # line_price[k] cents by the menu version line_menu[k] that was live when the line opened.
+        # An item has one line per (price, menu version): lines moved in at another price stay apart
+        self.line_ids = array("i")
+        self.line_qty = array("i")
+        self.line_price = array("i")
+        self.line_menu = array("i")
+        self.journal = None # OrderJournal that records every change (optional)
+
+        self._total_cents = 0 # Running total of the lines
+
+        return;
+
+    @property
+    def orders(self):
+        """{ item_name: quantity } view (use add_item/set_quantity to change it)."""
+        return OrderLines(self);
+
+    def lines(self):
+        """[(item_name, qty, price_cents, menu_version), ...]"""
+        names = self.catalog.names
+        return [(names[i], q, p, v) for i, q, p, v
+                in zip(self.line_ids, self.line_qty, self.line_price, self.line_menu)];
+
+    def add_item(self, item_name, qty=1, price_cents=0, menu_version=0):
+        """
+        Adds (or subtracts if qty < 0) an item. A new line is priced at
+        price_cents (from menu_version); an open line keeps its own price.
+        """
+        if self.start_time is None and qty > 0:
+            self.start_time = int(time()) # Epoch seconds: elapsed time is a subtraction
+
+        self.set_quantity(item_name, None, qty, price_cents, menu_version)
+
+        # If no items left, reset start_time
+        if not self.line_ids:
+            self.start_time = None
+
+        if self.journal is not None:
+            self.journal.record_item(self, item_name, qty, price_cents, menu_version)
+
+        return;
+
+    def find_line(self, item_id, price_cents, menu_version):
+        """Index of the item's line at price_cents/menu_version, or -1."""
+        k = -1
+        try:
+            while True:
+                k = self.line_ids.index(item_id, k + 1)
+                if self.line_price[k] == price_cents and self.line_menu[k] == menu_version:
+                    return k;
+        except ValueError:
+            return -1;
+
+    def set_quantity(self, item_name, qty, delta=0, price_cents=0, menu_version=0):
+        """
+        Set the quantity of the item's line at price_cents/menu_version (or
+        change it by delta when qty is None), dropping the line when it
+        goes <= 0, and keep the running total. A removal with no line at
+        that price takes from the item's first line.
+        Does not touch start_time or the journal (see add_item).
+        Returns the old quantity.
+        """
+        item_id = self.catalog.intern(item_name)
+        line_ids = self.line_ids
+        k = self.find_line(item_id, price_cents, menu_version)
+        if k < 0 and qty is None and delta < 0 and item_id in line_ids:
+            k = line_ids.index(item_id)
+        old_qty = self.line_qty[k] if k >= 0 else 0
+        new_qty = old_qty + delta if qty is None else qty
+
+        if new_qty > 0:
+            if k >= 0:
+                self.line_qty[k] = new_qty
+                self._total_cents += self.line_price[k] * (new_qty - old_qty)
+            else:
+                line_ids.append(item_id)
+                self.line_qty.append(new_qty)
+                self.line_price.append(price_cents)
+                self.line_menu.append(menu_version)
+                self._total_cents += price_cents * new_qty
+        elif k >= 0:
+            self._total_cents -= self.line_price[k] * old_qty
+            for arr in (line_ids, self.line_qty, self.line_price, self.line_menu):
+                del arr[k]
+
+        return old_qty;
+
+    def remove_item(self, item_name, qty=1):
+        self.add_item(item_name, -qty)
+        return;
+
+    def take_lines(self, lines):
+        """
+        Remove [(item_name, qty, price_cents, menu_version), ...] from the
+        lines (a transfer/split): one pass over the table, O(lines).
+        """
+        taken = {} # Dict: { (item_id, price_cents, menu_version): qty }
+        for iname, qty, price, version in lines:
+            key = (self.catalog.intern(iname), price, version)
+            taken[key] = taken.get(key, 0) + qty
+        kept = [array("i"), array("i"), array("i"), array("i")]
+        total = 0
+        for item_id, qty, price, version in zip(self.line_ids, self.line_qty, self.line_price, self.line_menu):
+            key = (item_id, price, version)
+            if key in taken:
+                take = min(qty, taken[key])
+                taken[key] -= take
+                qty -= take
+            if qty > 0:
+                for arr, value in zip(kept, (item_id, qty, price, version)):
+                    arr.append(value)
+                total += qty * price
+        self.line_ids, self.line_qty, self.line_price, self.line_menu = kept
+        self._total_cents = total
+
+        return;
+
+    def put_lines(self, lines):
+        """
+        Add [(item_name, qty, price_cents, menu_version), ...] to the lines
+        (a transfer/merge): every line keeps its price, merged into a line
+        of this table only at the same price and menu version. One pass,
+        O(lines).
+        """
+        position = {key: k for k, key in enumerate(zip(self.line_ids, self.line_price, self.line_menu))}
+        for iname, qty, price, version in lines:
+            item_id = self.catalog.intern(iname)
+            k = position.get((item_id, price, version))
+            if k is None:
+                position[item_id, price, version] = len(self.line_ids)
+                self.line_ids.append(item_id)
+                self.line_qty.append(qty)
+                self.line_price.append(price)
+                self.line_menu.append(version)
+                self._total_cents += qty * price
+            else:
+                self.line_qty[k] += qty
+                self._total_cents += qty * price
+
+        return;
+
+    def pick_lines(self, items):
+        """
+        The lines for { item_name: qty } (a split by item or by quantity),
+        as [(item_name, qty, price_cents, menu_version), ...] at the prices
+        of this table's lines (an item with several lines is taken from
+        the first ones first); quantities are capped at what the table has.
+        """
+        position = {} # Dict: { item_id: [line index, ...] }
+        for k, item_id in enumerate(self.line_ids):
+            position.setdefault(item_id, []).append(k)
+        picked = []
+        for iname, qty in items.items():
+            for k in position.get(self.catalog.ids.get(iname), ()):
+                if qty <= 0:
+                    break;
+                take = min(qty, self.line_qty[k])
+                picked.append((iname, take, self.line_price[k], self.line_menu[k]))
+                qty -= take
+
+        return picked;
+
+    def line(self, item_name):
+        """(qty, price_cents, menu_version) of the item's (first) line, or None."""
+        item_id = self.catalog.ids.get(item_name)
+        if item_id is None or item_id not in self.line_ids:
+            return None;
+        k = self.line_ids.index(item_id)
+
+        return self.line_qty[k], self.line_price[k], self.line_menu[k];
+
+    def restore_lines(self, ids, qtys, prices, versions, total_cents):
+        """
+        Bulk-load the lines from int32 buffers (a binary snapshot), without
+        any per-line work. ids must already be ids of self.catalog.
+        """
+        self.line_ids.frombytes(ids)
+        self.line_qty.frombytes(qtys)
+        self.line_price.frombytes(prices)
+        self.line_menu.frombytes(versions)
+        self._total_cents = total_cents
+
+        return;
+
+    def get_total(self, price_map=None):
+        """Total in cents: the running total, O(1) and exact."""
+        return self._total_cents;
+
+    def recompute_total(self, price_map=None):
+        total = 0
+        for quantity, price in zip(self.line_qty, self.line_price):
+            total += price * quantity
+
+        return total;
+
+    def clear_orders(self):
+        """Drop every line without recording anything (restore/replay)."""
+        for arr in (self.line_ids, self.line_qty, self.line_price, self.line_menu):
+            del arr[:]
+        self.start_time = None
+        self._total_cents = 0
+
+        return;
+
+    def complete_order(self):
+        self.clear_orders()
+
+        if self.journal is not None:
+            self.journal.record_complete(self)
+
+        return;
+
+###################################################
+#     TABLE HISTORY (event stream, undo/redo)     #
+###################################################
+class TableEvent:
+    """
+    One change of a table. kind:
+      "add"/"remove": item_name x qty (qty < 0 removes) at price_cents/menu_version
+      "complete": every line leaves the table (lines = what left)
+      "reopen": the lines of a completed order come back
+      "transfer_out"/"transfer_in": the lines move to/from the peer table
+    start_time is the table's start_time after the event, prev_start the
+    one before: enough to apply the event and to invert it.
+    """
+    __slots__ = ("kind", "time", "item_name", "qty", "price_cents", "menu_version",
+                 "start_time", "prev_start", "lines", "peer")
+
+    INVERSE = {"add": "remove", "remove": "add", "complete": "reopen", "reopen": "complete",
+               "transfer_out": "transfer_in", "transfer_in": "transfer_out"}
+
+    def __init__(self, kind, time, item_name=None, qty=0, price_cents=0, menu_version=0,
+                 start_time=None, prev_start=None, lines=None, peer=None):
+        self.kind = kind
+        self.time = time
+        self.item_name = item_name
+        self.qty = qty
+        self.price_cents = price_cents
+        self.menu_version = menu_version
+        self.start_time = start_time
+        self.prev_start = prev_start
+        self.lines = lines # [(item_name, qty, price_cents, menu_version), ...]
+        self.peer = peer   # The other table of a transfer
+
+        return;
+
+    def inverse(self, time):
+        return TableEvent(self.INVERSE[self.kind], time, self.item_name, -self.qty, self.price_cents,
+                          self.menu_version, self.prev_start, self.start_time, self.lines, self.peer);
+
+def apply_event(table, event):
+    """Apply an event to the table's lines (no journal, no listeners)."""
+    if event.item_name is not None:
+        table.set_quantity(event.item_name, None, event.qty, event.price_cents, event.menu_version)
+    elif event.kind == "complete":
+        table.clear_orders()
+    elif event.kind == "transfer_out":
+        table.take_lines(event.lines) # Only the transferred lines leave
+    else:
+        table.put_lines(event.lines)
+    table.start_time = event.start_time if table.line_ids else None
+
+    return;
+
+def entry_tables(entry):
+    """The tables of an undo entry [(table, event), ...], each once, in order."""
+    return list({id(table): table for table, _ in entry}.values());
+
+class TableHistory:
+    """
+    The events of one table since its last snapshot, plus the undo/redo
+    stacks. Every SNAPSHOT_EVERY events the lines are copied (four array
+    copies), so rebuilding the table is a snapshot and at most that many
+    events, however long the service runs. The full history is the
+    audit trail in the archive, not in memory.
+    """
+    SNAPSHOT_EVERY = 64
+
+    __slots__ = ("snapshot", "tail", "events", "undo", "redo")
+
+    def __init__(self, table, undo_depth=100):
+        self.snapshot = None # (ids, qty, price, menu, total_cents, start_time)
+        self.tail = []       # Events after the snapshot
+        self.events = 0      # Events recorded so far
+        self.undo = deque(maxlen=undo_depth) # Entries: [(table, event), ...] (a transfer has two)
+        self.redo = []
+        self.take_snapshot(table)
+
+        return;
+
+    def take_snapshot(self, table):
+        self.snapshot = (array("i", table.line_ids), array("i", table.line_qty), array("i", table.line_price),
+                         array("i", table.line_menu), table.get_total(), table.start_time)
+        self.tail.clear()
+
+        return;
+
+    def record(self, table, event):
+        """The event was just applied to the table."""
+        self.tail.append(event)
+        self.events += 1
+        if len(self.tail) >= self.SNAPSHOT_EVERY:
+            self.take_snapshot(table)
+
+        return;
+
+    def rebuild(self, table):
+        """Restore the table from the snapshot and replay the tail."""
+        ids, qtys, prices, versions, total, start_time = self.snapshot
+        table.clear_orders()
+        table.restore_lines(ids.tobytes(), qtys.tobytes(), prices.tobytes(), versions.tobytes(), total)
+        table.start_time = start_time
+        for event in self.tail:
+            apply_event(table, event)
+
+        return;
+
+###################################################
+#                LOAD MENU/TXT                    #
+###################################################
+def load_menu(menu_file="menu.txt", catalog=None):
+    """
+    Returns (flat_items, menu_dict).
+      flat_items: [Item, Item, ...]
+      menu_dict: { "ΟΡΕΚΤΙΚΑ": [...], "ΣΑΛΑΤΕΣ": [...], ... }
+    The item ids are interned in `catalog` (default: DEFAULT_CATALOG).
+    A line may carry a quick-entry code as a third field (NAME-PRICE-CODE),
+    otherwise the code is the item's position in the menu (1, 2, ...).
+    """
+    if catalog is None:
+        catalog = DEFAULT_CATALOG
+
+    if not exists(menu_file):
+        print(f"[!] Menu file not found: {menu_file}")
+        return [], {};
+
+    with open(menu_file, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+
+    flat_items = []
+    menu_dict = {}
+    current_category = None
+
+    for line in lines:
+        if not line:
+            continue;
+        if "-" not in line:
+            current_category = line
+            menu_dict[current_category] = []
+        else:
+            try:
+                parts = line.split("-")
+                iname = parts[0].strip()
+                iprice = parse_cents(parts[1])
+                icode = parts[2].strip() if len(parts) > 2 and parts[2].strip() else str(len(flat_items) + 1)
+                item_obj = Item(iname, iprice, catalog.intern(iname), icode)
+                flat_items.append(item_obj)
+                if current_category:
+                    menu_dict[current_category].append(item_obj)
+            except Exception as e:
+                print(f"Error parsing '{line}': {e}")
+
+    return flat_items, menu_dict;
+
+###################################################
+#            LOAD SETTINGS (tables)               #
+###################################################
+def load_settings(settings_file="settings.txt"):
+    settings = {}
+    if not exists(settings_file):
+        settings["ARITHMOS_TRAPEZION"] = "12"
+        return settings;
+
+    with open(settings_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line=line.strip()
+            if "=" in line:
+                key, val = line.split("=", 1)
+                settings[key.strip()] = val.strip()
+
+    return settings;
+
+def parse_floors(text):
+    """
+    'Βεράντα:20,Σάλα:30' => [("Βεράντα", 20), ("Σάλα", 30)]
+    The tables are numbered on across the floors: Βεράντα 1-20, Σάλα 21-50.
+    """
+    floors = []
+    for part in text.split(","):
+        name, _, count = part.rpartition(":")
+        if name.strip() and count.strip().isdigit():
+            floors.append((name.strip(), int(count)))
+
+    return floors;
+
+def floor_of_tables(floors):
+    """{ table_id: floor name } of parse_floors() output."""
+    names = {}
+    for name, count in floors:
+        first = len(names) + 1
+        names.update((table_id, name) for table_id in range(first, first + count))
+
+    return names;
+
+def parse_venues(specs):
+    """["Κέντρο=/srv/kentro", ...] => [(name, base_dir)], the --venue arguments."""
+    venues = []
+    for spec in specs:
+        name, sep, base_dir = spec.partition("=")
+        if not sep or not name.strip() or not base_dir.strip():
+            raise ValueError(f"--venue expects NAME=DIR, got '{spec}'")
+        venues.append((name.strip(), abspath(base_dir.strip())))
+
+    return venues;
+
+###################################################
+#         FILE WATCHER (hot reload)               #
+###################################################
+class FileWatcher:
+    """
+    Cheap change detection for a small text file: stat() on every poll,
+    the content hash only when mtime/size moved (editors that rewrite
+    the same bytes do not count as a change).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None  # (mtime_ns, size) of the last poll
+        self.digest = None # sha1 of the content last reported
+
+        return;
+
+    def changed(self):
+        """True if the content differs from the last call (the first call is always True)."""
+        try:
+            st = stat(self.path)
+        except OSError:
+            return False; # Missing (or being replaced): keep what we have
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self.stamp:
+            return False;
+        self.stamp = stamp
+
+        with open(self.path, "rb") as f:
+            digest = sha1(f.read()).hexdigest()
+        if digest == self.digest:
+            return False;
+        self.digest = digest
+
+        return True;
+
+    @property
+    def version(self):
+        """Short id of the content (fits the order lines' int arrays)."""
+        return int(self.digest[:7], 16) if self.digest else 0;
+
+###################################################
+#         SAVE/LOAD ORDERS (simple text)          #
+###################################################
+SNAPSHOT_VERSION = 2
+SNAPSHOT_KEEP = 3 # orders.txt.1 .. orders.txt.3: the previous snapshots
+
+def save_orders(tables_list, orders_file="orders.txt", journal=None, keep=SNAPSHOT_KEEP):
+    """
+    Write lines: table_id|item_name|quantity|start_time|price_cents|menu_version
+    after a header line: '#orders v2 time=... seq=N sha1=...'. seq is the
+    last journal record the snapshot contains (0 without a journal), sha1
+    the checksum of the lines. The journal is compacted afterwards.
+    """
+    write_orders(format_orders(tables_list, journal), orders_file, journal, keep)
+    return;
+
+def format_orders(tables_list, journal=None):
+    """The snapshot text of the tables, as they are right now."""
+    lines = []
+    for table in tables_list:
+        if table.start_time and len(table.orders)>0:
+            start = format_time(table.start_time)
+            for iname, qty, price, version in table.lines():
+                lines.append(f"{table.table_id}|{iname}|{qty}|{start}|{price}|{version}\n")
+    body = "".join(lines)
+
+    seq = journal.seq if journal is not None else 0
+    checksum = sha1(body.encode("utf-8")).hexdigest()
+    stamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    return f"#orders v{SNAPSHOT_VERSION} time={stamp} seq={seq} sha1={checksum}\n" + body;
+
+def write_orders(text, orders_file="orders.txt", journal=None, keep=SNAPSHOT_KEEP):
+    """
+    Write a format_orders() snapshot (safe to run on the background writer):
+    temp file + fsync, rotate the previous ones to orders_file.1 .. .keep,
+    then an atomic rename. A crash at any point leaves a complete snapshot.
+    """
+    write_snapshot(text.encode("utf-8"), orders_file, journal, keep) # Bytes: "\n" on every OS, as the checksum expects
+    return;
+
+def write_snapshot(data, orders_file, journal=None, keep=SNAPSHOT_KEEP):
+    """The crash-safe write of write_orders, for a text or binary snapshot."""
+    tmp_file = orders_file + ".tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            fsync(f.fileno())
+
+        for k in range(keep, 1, -1):
+            if exists(f"{orders_file}.{k - 1}"):
+                replace(f"{orders_file}.{k - 1}", f"{orders_file}.{k}")
+        if keep > 0 and exists(orders_file):
+            replace(orders_file, f"{orders_file}.1")
+        replace(tmp_file, orders_file)
+        fsync_dir(dirname(abspath(orders_file)))
+    except Exception as e:
+        print(f"[!] Error saving orders: {e}")
+        return;
+
+    if journal is not None:
+        journal.compact() # Only once the snapshot is durable
+
+    return;
+
+def fsync_dir(directory):
+    """Make the renames in `directory` durable (POSIX; a no-op elsewhere)."""
+    try:
+        fd = os_open(directory, O_RDONLY)
+    except OSError:
+        return;
+    try:
+        fsync(fd)
+    except OSError:
+        pass; # Windows cannot fsync a directory
+    finally:
+        close(fd)
+
+    return;
+
+def is_binary_snapshot(orders_file):
+    with open(orders_file, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC;
+
+def snapshot_files(orders_file):
+    """orders_file and its rotated copies, newest first (only the existing ones)."""
+    files = [orders_file] if exists(orders_file) else []
+    k = 1
+    while exists(f"{orders_file}.{k}"):
+        files.append(f"{orders_file}.{k}")
+        k += 1
+
+    return files;
+
+def read_snapshot(tables_by_id, orders_file, price_map, verify=True):
+    """
+    Load one snapshot into the (cleared) tables in one streaming pass.
+    Returns (snapshot_seq, bad_lines), or None when verify is on and the
+    file is torn or corrupt (missing header, checksum mismatch).
+    Files of the older formats (no header, '#seq=N') are not verified.
+    """
+    bad_lines = []
+    snapshot_seq = 0
+    expected_sha1 = None
+    hasher = sha1()
+    try:
+        with open(orders_file, "rb") as f:
+            for line_no, raw in enumerate(f, 1):
+                if line_no == 1 and raw.startswith(b"#orders "):
+                    if not raw.endswith(b"\n"):
+                        expected_sha1 = "" # Torn header: never matches
+                        break;
+                    fields = dict(token.split("=", 1) for token in raw.decode("utf-8").split()[2:] if "=" in token)
+                    snapshot_seq = int(fields.get("seq", 0))
+                    expected_sha1 = fields.get("sha1", "")
+                    continue;
+                hasher.update(raw)
+
+                line = raw.decode("utf-8").strip()
+                if not line:
+                    continue;
+                if line.startswith("#seq="):
+                    try:
+                        snapshot_seq = int(line[5:])
+                    except ValueError:
+                        bad_lines.append((line_no, line, "invalid journal sequence"))
+                    continue;
+
+                parts = line.split("|")
+                if len(parts) not in (4, 6):
+                    bad_lines.append((line_no, line, f"expected 6 fields, got {len(parts)}"))
+                    continue;
+                tid_str, iname, qty_str, stime = parts[:4]
+                try:
+                    tid = int(tid_str)
+                    qty = int(qty_str)
+                    if len(parts) == 6:
+                        price, version = int(parts[4]), int(parts[5])
+                    else:
+                        price, version = price_map.get(iname, 0), 0
+                except ValueError:
+                    bad_lines.append((line_no, line, "table id/quantity/price is not an integer"))
+                    continue;
+                the_table = tables_by_id.get(tid)
+                if the_table is None:
+                    bad_lines.append((line_no, line, f"unknown table {tid}"))
+                    continue;
+                if qty <= 0 or not iname:
+                    bad_lines.append((line_no, line, "empty item or quantity <= 0"))
+                    continue;
+
+                the_table.set_quantity(iname, qty, price_cents=price, menu_version=version)
+                if not the_table.start_time:
+                    the_table.start_time = parse_time(stime)
+    except Exception as e:
+        print(f"[!] Error loading orders from {orders_file}: {e}")
+        if verify:
+            return None;
+
+    if verify and expected_sha1 is None:
+        # Older format, no checksum: only an empty file or a torn line give it away
+        if getsize(orders_file) == 0 or bad_lines:
+            return None;
+    elif verify and expected_sha1 != hasher.hexdigest():
+        return None;
+
+    return snapshot_seq, bad_lines;
+
+###################################################
+#         BINARY SNAPSHOT (orders.bin)            #
+###################################################
+# Little-endian. Header, then (covered by the sha1):
+#   item names:  n_names x (u16 length, utf-8)      ids are indexes in this list
+#   tables:      n_tables x BINARY_TABLE            lines [first, first + count)
+#   lines:       4 int32 columns of n_lines each    item id, qty, price_cents, menu_version
+BINARY_MAGIC = b"KPOB"
+BINARY_HEADER = struct.Struct("<4sHHQI20sIII") # magic, version, 0, seq, epoch, sha1, names, tables, lines
+BINARY_TABLE = struct.Struct("<iIIq19s")        # table_id, first line, lines, total_cents, start_time
+
+def format_orders_binary(tables_list, journal=None):
+    """The snapshot of the tables as bytes (item ids of the tables' catalog)."""
+    catalog = tables_list[0].catalog if tables_list else DEFAULT_CATALOG
+    names = b"".join(struct.pack("<H", len(raw)) + raw
+                     for raw in (name.encode("utf-8") for name in catalog.names))
+    table_records = []
+    columns = [array("i"), array("i"), array("i"), array("i")]
+    for table in tables_list:
+        if table.start_time and len(table.line_ids) > 0:
+            table_records.append(BINARY_TABLE.pack(table.table_id, len(columns[0]), len(table.line_ids),
+                                                   table.get_total(), format_time(table.start_time).encode("ascii")))
+            for column, arr in zip(columns, (table.line_ids, table.line_qty, table.line_price, table.line_menu)):
+                column.extend(arr)
+    if sys.byteorder != "little":
+        for column in columns:
+            column.byteswap()
+    body = names + b"".join(table_records) + b"".join(column.tobytes() for column in columns)
+
+    seq = journal.seq if journal is not None else 0
+    header = BINARY_HEADER.pack(BINARY_MAGIC, SNAPSHOT_VERSION, 0, seq, int(datetime.now().timestamp()),
+                                sha1(body).digest(), len(catalog.names), len(table_records), len(columns[0]))
+    return header + body;
+
+def read_snapshot_binary(tables_by_id, orders_file, catalog):
+    """
+    Load a binary snapshot through mmap: per table a slice of the four
+    int32 columns, no per-line parsing. Returns (snapshot_seq, bad_lines),
+    or None if the file is torn or corrupt.
+    """
+    try:
+        with open(orders_file, "rb") as f, mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return _read_binary(view, tables_by_id, catalog);
+            finally:
+                view.release()
+    except (OSError, ValueError, BufferError, struct.error) as e:
+        print(f"[!] Error loading orders from {orders_file}: {e}")
+        return None;
+
+def _read_binary(view, tables_by_id, catalog):
+    magic, version, _, seq, _, checksum, n_names, n_tables, n_lines = BINARY_HEADER.unpack_from(view)
+    if magic != BINARY_MAGIC or sha1(view[BINARY_HEADER.size:]).digest() != checksum:
+        return None;
+
+    # Item names => ids of our catalog (identical when the menu did not change)
+    pos = BINARY_HEADER.size
+    remap = array("i")
+    for _ in range(n_names):
+        (length,) = struct.unpack_from("<H", view, pos)
+        remap.append(catalog.intern(str(view[pos + 2:pos + 2 + length], "utf-8")))
+        pos += 2 + length
+    identity = all(file_id == item_id for file_id, item_id in enumerate(remap))
+
+    tables_pos = pos
+    columns_pos = tables_pos + n_tables * BINARY_TABLE.size
+    column_bytes = 4 * n_lines
+    columns = [view[columns_pos + k * column_bytes:columns_pos + (k + 1) * column_bytes] for k in range(4)]
+    if sys.byteorder != "little":
+        swapped = []
+        for column in columns:
+            arr = array("i", column.tobytes())
+            arr.byteswap()
+            swapped.append(memoryview(arr.tobytes()))
+        columns = swapped
+
+    bad_lines = []
+    for k, (tid, first, count, total, start) in enumerate(BINARY_TABLE.iter_unpack(view[tables_pos:columns_pos])):
+        table = tables_by_id.get(tid)
+        if table is None:
+            bad_lines.append((k + 1, f"table {tid}", f"unknown table {tid}"))
+            continue;
+        a, b = 4 * first, 4 * (first + count)
+        ids = columns[0][a:b]
+        if not identity:
+            ids = array("i", [remap[i] for i in ids.cast("i")]).tobytes()
+        table.restore_lines(ids, columns[1][a:b], columns[2][a:b], columns[3][a:b], total)
+        table.start_time = parse_time(start.rstrip(b"\0").decode("ascii"))
+
+    return seq, bad_lines;
+
+def load_orders(tables_list, orders_file="orders.txt", journal=None, price_map=None):
+    """
+    Restore the newest valid snapshot (orders_file, then orders_file.1, ...),
+    text or binary, then replay the journal tail (if any). Returns the
+    rejected lines of the snapshot used: [(line_no, line, reason), ...]
+    Lines of the older 4-field format have no price of their own and
+    are priced from price_map (menu version 0).
+    """
+    price_map = price_map if price_map is not None else {}
+    tables_by_id = {t.table_id: t for t in tables_list}
+    catalog = tables_list[0].catalog if tables_list else DEFAULT_CATALOG
+    candidates = snapshot_files(orders_file)
+
+    result = None
+    for snapshot_file in candidates:
+        for t in tables_list:
+            t.clear_orders()
+        if is_binary_snapshot(snapshot_file):
+            result = read_snapshot_binary(tables_by_id, snapshot_file, catalog)
+        else:
+            result = read_snapshot(tables_by_id, snapshot_file, price_map)
+        if result is not None:
+            if snapshot_file != orders_file:
+                print(f"[!] Restored the orders from the older snapshot {snapshot_file}")
+            break;
+        print(f"[!] {snapshot_file} is torn or corrupt (checksum/header), trying the previous snapshot")
+
+    if result is None:
+        for t in tables_list:
+            t.clear_orders()
+        if candidates:
+            # Nothing valid at all: better a partial floor than an empty one, but say so
+            print(f"[!] No valid snapshot, restoring what can be read from {candidates[0]}")
+            if is_binary_snapshot(candidates[0]):
+                result = (0, []) # A torn binary file has nothing readable
+            else:
+                result = read_snapshot(tables_by_id, candidates[0], price_map, verify=False)
+        else:
+            result = (0, [])
+    snapshot_seq, bad_lines = result
+
+    for line_no, line, reason in bad_lines:
+        print(f"[!] {orders_file}:{line_no}: {reason}: '{line}'")
+
+    if journal is not None:
+        journal.replay(tables_list, snapshot_seq, price_map)
+
+    return bad_lines;
+
+###################################################
+#         BACKGROUND WRITER (disk I/O thread)     #
+###################################################
+class BackgroundWriter:
+    """
+    One thread that runs the submitted disk writes in submission order,
+    so the caller (the Tk main loop) never waits for the disk. The queue
+    is bounded: if the disk falls that far behind, submit() blocks.
+    """
+    def __init__(self, max_pending=10000):
+        self.queue = Queue(max_pending)
+        self.thread = Thread(target=self.run, name="kapouKapou-writer", daemon=True)
+        self.thread.start()
+
+        return;
+
+    def submit(self, func, *args):
+        self.queue.put((func, args))
+        return;
+
+    def run(self):
+        while True:
+            func, args = self.queue.get()
+            try:
+                if func is None:
+                    return;
+                func(*args)
+            except Exception as e:
+                print(f"[!] Error in background write: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Wait until everything submitted so far is on disk."""
+        self.queue.join()
+        return;
+
+    def close(self):
+        if self.thread.is_alive():
+            self.submit(None)
+            self.thread.join()
+
+        return;
+
+###################################################
+#        ORDER JOURNAL (append-only log)          #
+###################################################
+class OrderJournal:
+    """
+    Append-only log of every order change, kept next to orders.txt.
+    Records (one per line):
+      seq|+|table_id|item_name|qty|start_time|price_cents|menu_version   (qty < 0 => removal)
+      seq|C|table_id                            (order completed)
+    Every record is flushed to the OS immediately; fsync is batched to
+    at most one every `fsync_interval` seconds.
+    """
+    def __init__(self, journal_file, fsync_interval=1.0):
+        self.journal_file = journal_file
+        self.fsync_interval = fsync_interval
+        self.seq = 0 # Last written (or replayed) record
+        self.dirty = False # Written but not fsync'ed yet
+        self.last_sync = monotonic()
+        self.f = None
+        self.writer = None # BackgroundWriter doing the appends (optional)
+        self.metrics = None # Metrics (optional): bytes appended, fsync time
+
+        return;
+
+    def replay(self, tables_list, after_seq=0, price_map=None):
+        """
+        Apply the records newer than the snapshot, then open for appending.
+        Records of the older format (no price) are priced from price_map.
+        """
+        price_map = price_map if price_map is not None else {}
+        self.seq = after_seq
+        good_size = 0 # Byte offset after the last valid record
+        if exists(self.journal_file):
+            tables_by_id = {t.table_id: t for t in tables_list}
+            with open(self.journal_file, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break; # Torn write at the end (crash), dropped below
+                    try:
+                        parts = raw.decode("utf-8").rstrip("\n").split("|")
+                        seq = int(parts[0])
+                        if parts[1] == "C":
+                            tid = int(parts[2])
+                        else:
+                            tid, iname, qty, stime = int(parts[2]), parts[3], int(parts[4]), parts[5]
+                            if len(parts) > 6:
+                                price, version = int(parts[6]), int(parts[7])
+                            else:
+                                price, version = price_map.get(iname, 0), 0
+                    except Exception as e:
+                        print(f"[!] Error in journal record {raw!r}: {e}")
+                        break;
+                    good_size += len(raw)
+
+                    if seq <= after_seq:
+                        continue; # Already in the snapshot
+                    if seq != self.seq + 1:
+                        # Restored from an older snapshot: the records in between were compacted
+                        print(f"[!] Journal records {self.seq + 1}..{seq - 1} are missing")
+                    self.seq = seq
+                    table = tables_by_id.get(tid)
+                    if table is None:
+                        continue;
+                    if parts[1] == "C":
+                        table.complete_order()
+                    else:
+                        table.add_item(iname, qty, price, version)
+                        table.start_time = parse_time(stime) if table.orders else None
+
+        self.f = open(self.journal_file, "ab")
+        self.f.truncate(good_size)
+
+        return;
+
+    def record_item(self, table, item_name, qty, price_cents=0, menu_version=0):
+        self.write(self.item_record(table, item_name, qty, price_cents, menu_version))
+        return;
+
+    def record_complete(self, table):
+        self.write(f"C|{table.table_id}")
+        return;
+
+    def item_record(self, table, item_name, qty, price_cents=0, menu_version=0):
+        return f"+|{table.table_id}|{item_name}|{qty}|{format_time(table.start_time)}|{price_cents}|{menu_version}";
+
+    def write(self, *records):
+        """Append the records with consecutive seqs, as one write (a transfer is many lines)."""
+        if self.f is None or not records:
+            return;
+
+        # The sequence is taken here, in order; the disk write may be deferred
+        parts = []
+        for record in records:
+            self.seq += 1
+            parts.append(f"{self.seq}|{record}\n")
+        data = "".join(parts).encode("utf-8")
+        if self.writer is not None:
+            self.writer.submit(self.append, data)
+        else:
+            self.append(data)
+
+        return;
+
+    def append(self, data):
+        try:
+            self.f.write(data)
+            self.f.flush()
+            self.dirty = True
+            if self.metrics is not None:
+                self.metrics.count("journal_bytes", len(data))
+            if monotonic() - self.last_sync >= self.fsync_interval:
+                self.sync()
+        except Exception as e:
+            print(f"[!] Error writing journal: {e}")
+
+        return;
+
+    def sync(self):
+        """fsync whatever has been written since the last sync."""
+        if self.f is not None and self.dirty:
+            t0 = perf_counter()
+            fsync(self.f.fileno())
+            self.dirty = False
+            if self.metrics is not None:
+                self.metrics.observe("journal_fsync_ms", (perf_counter() - t0) * 1000)
+        self.last_sync = monotonic()
+
+        return;
+
+    def compact(self):
+        """Drop every record: they are all contained in the new snapshot."""
+        if self.f is not None:
+            self.f.truncate(0)
+            self.f.flush()
+            self.dirty = True
+            self.sync()
+
+        return;
+
+    def close(self):
+        if self.f is not None:
+            self.sync()
+            self.f.close()
+            self.f = None
+
+        return;
+
+###################################################
+#      OCCUPANCY HEATMAP (weekday x hour)         #
+###################################################
+WEEKDAYS = ("Δευ", "Τρι", "Τετ", "Πεμ", "Παρ", "Σαβ", "Κυρ")
+
+class OccupancyHeatmap:
+    """
+    Occupancy and turnover by weekday x hour, kept up to date one
+    completed order at a time (a void takes it back out), so it never
+    rescans the history:
+      occupied[weekday][hour]: seconds tables were seated in that hour
+      turnover[weekday][hour]: orders completed in that hour
+      days: the dates seen, to average over (Dict: { 'YYYY-MM-DD': weekday })
+    """
+    def __init__(self):
+        self.occupied = [[0] * 24 for _ in range(7)]
+        self.turnover = [[0] * 24 for _ in range(7)]
+        self.days = {}
+
+        return;
+
+    def add(self, start, closed, n=1):
+        """An order seated from `start` to `closed` (epoch seconds); n=-1 for a void."""
+        if closed is None:
+            return;
+        closed_dt = datetime.fromtimestamp(closed)
+        self.turnover[closed_dt.weekday()][closed_dt.hour] += n
+        self.days.setdefault(closed_dt.strftime("%Y-%m-%d"), closed_dt.weekday())
+
+        t = start if start is not None and start <= closed else closed
+        while t < closed: # One step per hour the order spans
+            dt = datetime.fromtimestamp(t)
+            hour_end = min(t - dt.minute * 60 - dt.second + 3600, closed)
+            self.occupied[dt.weekday()][dt.hour] += n * (hour_end - t)
+            self.days.setdefault(dt.strftime("%Y-%m-%d"), dt.weekday())
+            t = hour_end
+
+        return;
+
+    def merge(self, other):
+        """Add another heatmap (e.g. of another venue)."""
+        for mine, theirs in ((self.occupied, other.occupied), (self.turnover, other.turnover)):
+            for row, other_row in zip(mine, theirs):
+                for h in range(24):
+                    row[h] += other_row[h]
+        for day, weekday in other.days.items():
+            self.days.setdefault(day, weekday)
+
+        return;
+
+    def day_counts(self):
+        """How many dates of every weekday were seen."""
+        counts = [0] * 7
+        for weekday in self.days.values():
+            counts[weekday] += 1
+
+        return counts;
+
+    def state(self):
+        return {"occupied": self.occupied, "turnover": self.turnover, "days": self.days};
+
+    def load(self, heatmap_file):
+        """Start from the heatmap.json written by the last run (if any)."""
+        if not exists(heatmap_file):
+            return;
+        try:
+            with open(heatmap_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.occupied = data["occupied"]
+            self.turnover = data["turnover"]
+            self.days = data["days"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[!] Error loading {heatmap_file}: {e}")
+
+        return;
+
+    def format_text(self, num_tables):
+        """Average occupancy % (of num_tables) and completed orders per hour, one row per weekday."""
+        counts = self.day_counts()
+        hours = [h for h in range(24) if any(self.occupied[d][h] or self.turnover[d][h] for d in range(7))]
+        header = "     " + "".join(f"{h:>4}" for h in hours)
+        lines = ["Πληρότητα % (μέσος όρος)", header]
+        for d, name in enumerate(WEEKDAYS):
+            if counts[d]:
+                lines.append(f"{name}  " + "".join(f"{self.occupied[d][h] / 36 / counts[d] / max(num_tables, 1):4.0f}"
+                                                  for h in hours))
+        lines += ["Ολοκληρώσεις / ώρα (μέσος όρος)", header]
+        for d, name in enumerate(WEEKDAYS):
+            if counts[d]:
+                lines.append(f"{name}  " + "".join(f"{self.turnover[d][h] / counts[d]:4.1f}" for h in hours))
+
+        return "\n".join(lines);
+
+def write_json_file(data, json_file):
+    """Small JSON state file, replaced atomically (runs on the background writer)."""
+    tmp_file = json_file + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(data)
+        replace(tmp_file, json_file)
+    except OSError as e:
+        print(f"[!] Error saving {json_file}: {e}")
+
+    return;
+
+###################################################
+#           FLOORS (shards of the tables)         #
+###################################################
+class Floor:
+    """
+    One room/terrace: its tables, its snapshot file and its journal.
+    A change journals and dirties only its own floor, a save rewrites
+    only the dirty floors. Without FLOORS there is one floor ("") on
+    orders.txt/orders.journal.
+    """
+    __slots__ = ("name", "tables", "orders_file", "journal", "dirty")
+
+    def __init__(self, name, tables, orders_file, journal=None):
+        self.name = name
+        self.tables = tables
+        self.orders_file = orders_file
+        self.journal = journal
+        self.dirty = True # Changed since the last snapshot (the first save always writes)
+
+        return;
+
+###################################################
+#          ORDER ENGINE (headless core)           #
+###################################################
+class OrderEngine:
+    """
+    Tables, menu and persistence without any UI. The Tk GUI and the
+    order server both drive the orders through it.
+    listeners: callables(table) called after every change of a table.
+    item_listeners: callables(table, item_name, qty) called after an item
+    was added (qty > 0) or removed (qty < 0); not for the lines a
+    transfer/merge moves nor for a completion or its undo.
+    menu_listeners: callables(diff) called after a menu reload.
+    tables_listeners: callables(added, removed) called after the number
+    of tables changed in the settings.
+    floors: the tables split into Floor shards (default: one floor of
+    all the tables on journal/orders_file).
+    heatmap_file: where the occupancy heatmap is kept between runs (optional).
+    receipt_printer: ReceiptPrinter that also gets every receipt (optional).
+    """
+    AUDIT_BATCH = 256 # Audit rows kept before they go to the archive anyway
+
+    def __init__(self, tables, items, menu_dict, settings=None, journal=None, archive=None,
+                 orders_file="orders.txt", completed_orders_file="completed_orders.txt", writer=None,
+                 catalog=None, menu_file=None, settings_file=None, menus_dir=None, metrics=None,
+                 dispatcher=None, floors=None, heatmap_file=None, receipt_printer=None):
+        self.tables = tables
+        self.tables_by_id = {t.table_id: t for t in tables}
+        self.catalog = catalog if catalog is not None else (tables[0].catalog if tables else DEFAULT_CATALOG)
+        self.items = items
+        self.menu_dict = menu_dict
+        self.settings = settings if settings is not None else {}
+        self.floors = floors if floors is not None else [Floor("", tables, orders_file, journal)]
+        self.floor_of = {t.table_id: floor for floor in self.floors for t in floor.tables} # Dict: { table_id: Floor }
+        self.journal = self.floors[0].journal # Every floor has one when any has (JOURNAL=1)
+        self.archive = archive # CompletedOrdersArchive (queryable copy of completed_orders.txt)
+        self.orders_file = self.floors[0].orders_file
+        self.completed_orders_file = completed_orders_file
+        self.completed_f = None # completed_orders.txt, kept open by the writer
+        self.writer = writer # BackgroundWriter for every disk write (optional)
+        self.metrics = metrics # Metrics (METRICS=1 in settings.txt) or None
+        for floor in self.floors:
+            if floor.journal is not None:
+                floor.journal.writer = writer
+                floor.journal.metrics = metrics
+        self.listeners = []
+        self.item_listeners = []
+        self.menu_listeners = []
+        self.tables_listeners = []
+
+        # Receipts: completed_orders.txt/terminal in the Greek layout, the printer in RECEIPT_TEMPLATE
+        from kapouKapou_receipts import ReceiptRenderer, GreekReceipt # Here: the receipts module imports this one
+        self.receipts = ReceiptRenderer(GreekReceipt())
+        self.receipt_printer = receipt_printer
+
+        # Kitchen/bar tickets (DISPATCH=1 in settings.txt)
+        self.dispatcher = dispatcher
+        if dispatcher is not None:
+            self.item_listeners.append(dispatcher.on_item)
+            self.menu_listeners.append(lambda diff: dispatcher.set_menu(self.menu_dict))
+
+        # Hot reload of menu.txt/settings.txt (check_reload)
+        self.menu_file = menu_file
+        self.settings_file = settings_file
+        self.menus_dir = menus_dir # Copy of every menu version the order lines refer to
+        self.menu_watcher = FileWatcher(menu_file) if menu_file else None
+        self.settings_watcher = FileWatcher(settings_file) if settings_file else None
+        if self.settings_watcher is not None:
+            self.settings_watcher.changed() # The settings we were given are the current ones
+        self.menu_version = 0
+        if self.menu_watcher is not None and self.menu_watcher.changed():
+            self.menu_version = self.menu_watcher.version
+            self.keep_menu_version()
+
+        # Event history of every table: per-table snapshots, undo/redo; audit rows for the archive
+        self.undo_depth = int(self.settings.get("UNDO_DEPTH", 100))
+        self.histories = {t.table_id: TableHistory(t, self.undo_depth) for t in tables} # Dict: { table_id: TableHistory }
+        self.last_changed = None # table_id of the last change (undo without a selected table)
+        self.audit_rows = []     # Written to the archive on sync()/save() (or every AUDIT_BATCH rows)
+        self.shift_starts = parse_shifts(self.settings.get("SHIFTS", "06:00"))
+        self.shift_cache = (None, None) # (minute, shift of that minute)
+        self.clock = (None, None)       # (second, its text) for now_text()
+
+        # Live analytics: last change of every table (idle alerts), occupancy by weekday x hour
+        self.activity = {} # Dict: { table_id: epoch of its last change }
+        self.idle_after = int(self.settings.get("IDLE_ALERT_MIN", 30)) * 60
+        self.heatmap = OccupancyHeatmap()
+        self.heatmap_file = heatmap_file
+        if heatmap_file:
+            self.heatmap.load(heatmap_file)
+
+        # Price map for quick lookups
+        self.price_map = PriceMap()
+        for it in items:
+            self.price_map[it.name] = it.price_cents
+
+        # Search-as-you-type / item codes: built on first use (or by the background restore)
+        self._menu_index = None
+
+        # Set once the open orders are in the tables (see restore_in_background)
+        self.ready = Event()
+        self.ready.set()
+
+        return;
+
+    @property
+    def menu_index(self):
+        if self._menu_index is None:
+            self._menu_index = MenuIndex(self.items)
+
+        return self._menu_index;
+
+    def restore_in_background(self, restore_files, price_map=None):
+        """
+        Load the open orders on a thread, so a window can show up meanwhile.
+        Until `ready` is set every change is refused and save() is a no-op.
+        """
+        self.ready.clear()
+        Thread(target=self.restore, args=(restore_files, price_map), daemon=True).start()
+
+        return;
+
+    def restore(self, restore_files, price_map=None):
+        """
+        Snapshot + journal of every floor (restore_files: one per floor)
+        into the (empty) tables, then the histories and the search index.
+        """
+        try:
+            for floor, restore_file in zip(self.floors, restore_files):
+                load_orders(floor.tables, restore_file, floor.journal, price_map)
+                for t in floor.tables:
+                    t.journal = floor.journal
+                    self.histories[t.table_id].take_snapshot(t)
+            self.menu_index # The first search should not pay for it
+        except Exception as e:
+            print(f"[!] Error restoring the open orders: {e}")
+        finally:
+            self.ready.set()
+
+        return;
+
+    def get_table(self, table_id):
+        table = self.tables_by_id.get(table_id)
+        if table is None:
+            raise KeyError(f"unknown table {table_id}")
+
+        return table;
+
+    def notify(self, table):
+        for listener in self.listeners:
+            listener(table)
+
+        return;
+
+    def run_io(self, func, *args):
+        """Run a disk write on the background writer (or right away without one)."""
+        if self.writer is not None:
+            self.writer.submit(func, *args)
+        else:
+            func(*args)
+
+        return;
+
+    def log(self, message):
+        """Print to the terminal, in order with the writes and off the caller's thread."""
+        self.run_io(print, message)
+        return;
+
+    ###################################################
+    #                  OPERATIONS                     #
+    ###################################################
+    def add_item(self, table_id, item_name, qty=1):
+        if qty <= 0:
+            raise ValueError(f"quantity must be > 0, not {qty}") # A removal is remove_item (clamped, undoable)
+        table = self.get_table(table_id)
+        if item_name not in self.price_map:
+            raise KeyError(f"unknown item '{item_name}'")
+
+        # An open line keeps its own price (and menu version)
+        line = table.line(item_name)
+        price, version = (line[1], line[2]) if line else (self.price_map[item_name], self.menu_version)
+        now = self.now_text()
+        self.change([(table, TableEvent("add", now, item_name, qty, price, version,
+                                        table.start_time or self.clock[0], table.start_time))])
+
+        return table;
+
+    def remove_item(self, table_id, item_name, qty=1):
+        if qty <= 0:
+            raise ValueError(f"quantity must be > 0, not {qty}")
+        table = self.get_table(table_id)
+        line = table.line(item_name)
+        if line is None:
+            return table;
+
+        now = self.now_text()
+        self.change([(table, TableEvent("remove", now, item_name, -min(qty, line[0]), line[1], line[2],
+                                        table.start_time, table.start_time))])
+
+        return table;
+
+    def complete_order(self, table_id, payers=1):
+        """Close the order; with payers > 1 the receipt also shows the share of each."""
+        table = self.get_table(table_id)
+        if not table.orders:
+            self.notify(table)
+            return table;
+
+        closed_time = self.save_completed_order(table, payers)
+        self.change([(table, TableEvent("complete", closed_time, lines=table.lines(),
+                                        prev_start=table.start_time))])
+
+        return table;
+
+    def transfer_table(self, from_id, to_id, items=None):
+        """
+        Move the lines of table from_id to table to_id (merged with its own
+        lines, each keeping its price): all of them, or { item_name: qty }
+        to split a bill by item or by quantity. One undo step, one journal
+        append and one refresh of each of the two tables.
+        """
+        source, target = self.get_table(from_id), self.get_table(to_id)
+        if source is target:
+            raise ValueError("transfer to the same table")
+        lines = source.lines() if items is None else source.pick_lines(items)
+        if not lines:
+            return target;
+
+        self.change(self.transfer_events(source, target, lines, self.now_text(), target.start_time))
+
+        return target;
+
+    def merge_tables(self, table_ids, into_id):
+        """Move every line of the tables table_ids to table into_id, as one undo step."""
+        target = self.get_table(into_id)
+        now = self.now_text()
+        start = target.start_time
+        entry = []
+        for table_id in dict.fromkeys(table_ids):
+            source = self.get_table(table_id)
+            if source is target or not source.line_ids:
+                continue;
+            entry += self.transfer_events(source, target, source.lines(), now, start)
+            start = entry[-1][1].start_time
+        if entry:
+            self.change(entry)
+
+        return target;
+
+    def transfer_events(self, source, target, lines, now, target_start):
+        """The two events of a transfer; target_start is the target's start_time before it."""
+        # Neither has a start (lines restored without one): the transfer starts the target, as an add would
+        start = min(filter(None, (source.start_time, target_start)), default=None) or self.clock[0]
+        moved = {} # Dict: { item_name: qty } (an item can move from several lines)
+        for iname, qty, _, _ in lines:
+            moved[iname] = moved.get(iname, 0) + qty
+        left = any(qty > moved.get(iname, 0) for iname, qty in source.orders.items())
+
+        return [(source, TableEvent("transfer_out", now, lines=lines, start_time=source.start_time if left else None,
+                                    prev_start=source.start_time, peer=target.table_id)),
+                (target, TableEvent("transfer_in", now, lines=lines, start_time=start,
+                                    prev_start=target_start, peer=source.table_id))];
+
+    def split_bill(self, table_id, payers):
+        """The even shares (cents) of the table's total for `payers` people."""
+        return split_cents(self.get_table(table_id).get_total(), payers);
+
+    ###################################################
+    #          EVENTS (history, undo/redo, audit)     #
+    ###################################################
+    def change(self, entry, origin="user"):
+        """
+        Apply an entry [(table, event), ...] (one undo step) and push it
+        on the undo stack of every table in it; a new change drops the
+        redo stacks.
+        """
+        if not self.ready.is_set():
+            raise ValueError("the open orders are still being restored")
+        records = {} # Dict: { Floor: [journal record, ...] }
+        for table, event in entry:
+            self.apply(table, event, origin, records)
+        self.write_records(records)
+        for table in entry_tables(entry):
+            history = self.histories[table.table_id]
+            history.undo.append(entry)
+            history.redo.clear()
+            self.notify(table)
+
+        return;
+
+    def apply(self, table, event, origin, records):
+        """
+        Apply one event: lines, per-table history, audit row, item
+        listeners; its journal records are added to records[its floor].
+        """
+        apply_event(table, event)
+        self.histories[table.table_id].record(table, event)
+        self.last_changed = table.table_id
+        self.activity[table.table_id] = int(time())
+
+        floor = self.floor_of[table.table_id]
+        floor_records = records.get(floor)
+        if floor_records is None:
+            floor_records = records[floor] = []
+        journal = floor.journal
+        if journal is not None:
+            if event.item_name is not None:
+                floor_records.append(journal.item_record(table, event.item_name, event.qty,
+                                                         event.price_cents, event.menu_version))
+            elif event.kind == "complete":
+                floor_records.append(f"C|{table.table_id}")
+            else:
+                sign = -1 if event.kind == "transfer_out" else 1
+                floor_records.extend(journal.item_record(table, iname, sign * qty, price, version)
+                                     for iname, qty, price, version in event.lines)
+
+        if self.archive is not None:
+            if event.time[:16] != self.shift_cache[0]:
+                self.shift_cache = (event.time[:16], shift_of(event.time, self.shift_starts))
+            self.audit_rows.append((event.time, self.shift_cache[1], table.table_id,
+                                    event.kind, origin, event.item_name, event.qty or None,
+                                    event.price_cents if event.item_name is not None else None,
+                                    json.dumps(event.lines, ensure_ascii=False) if event.lines else None,
+                                    event.peer))
+            if len(self.audit_rows) >= self.AUDIT_BATCH:
+                self.flush_audit()
+
+        # Only items ordered or cancelled: the kitchen does not re-cook a reopened order,
+        # nor the food of a table that moved (transfer/merge/split)
+        if event.item_name is not None:
+            for listener in self.item_listeners:
+                listener(table, event.item_name, event.qty)
+
+        return;
+
+    def write_records(self, records):
+        """One journal append per floor an entry touched; those floors need a new snapshot."""
+        for floor, floor_records in records.items():
+            floor.dirty = True
+            if floor.journal is not None:
+                floor.journal.write(*floor_records)
+
+        return;
+
+    def now_text(self):
+        """'YYYY-MM-DD HH:MM:SS' of now, formatted once per second."""
+        second = int(time())
+        if second != self.clock[0]:
+            self.clock = (second, format_time(second))
+
+        return self.clock[1];
+
+    def undo(self, table_id):
+        """Undo the last change of the table (O(1)). Returns the tables it changed."""
+        return self.step(table_id, "undo");
+
+    def redo(self, table_id):
+        return self.step(table_id, "redo");
+
+    def step(self, table_id, origin):
+        history = self.histories[self.get_table(table_id).table_id]
+        stack = history.undo if origin == "undo" else history.redo
+        if not stack:
+            return [];
+        entry = stack[-1]
+        tables = entry_tables(entry)
+        # A transfer is one step of both tables: it must be the last one of each
+        for table in tables:
+            other = self.histories[table.table_id]
+            other_stack = other.undo if origin == "undo" else other.redo
+            if not other_stack or other_stack[-1] is not entry:
+                raise ValueError(f"undo the later changes of table {table.table_id} first")
+        for table in tables:
+            other = self.histories[table.table_id]
+            (other.undo if origin == "undo" else other.redo).pop()
+
+        now = self.now_text()
+        done = []
+        records = {}
+        if origin == "undo":
+            for table, event in reversed(entry):
+                self.apply(table, event.inverse(now), origin, records)
+                if event.kind == "complete":
+                    self.void_completed_order(table.table_id, event)
+            done = entry
+        else:
+            for table, event in entry:
+                if event.kind == "complete":
+                    now = self.save_completed_order(table) # A new receipt
+                again = event.inverse(now).inverse(now)
+                self.apply(table, again, origin, records)
+                done.append((table, again))
+        self.write_records(records)
+        for table in tables:
+            other = self.histories[table.table_id]
+            (other.redo if origin == "undo" else other.undo).append(done)
+            self.notify(table)
+
+        return tables;
+
+    def rebuild_table(self, table_id):
+        """Rebuild the table from its last snapshot and the events after it."""
+        table = self.get_table(table_id)
+        self.histories[table_id].rebuild(table)
+        self.notify(table)
+
+        return table;
+
+    def flush_audit(self):
+        """Hand the audit rows collected so far to the archive (on the writer)."""
+        if self.audit_rows:
+            rows, self.audit_rows = self.audit_rows, []
+            self.run_io(self.archive.add_events, rows)
+
+        return;
+
+    def save_completed_order(self, table, payers=1):
+        """
+        Save the completed order to 'completed_orders.txt' with all details,
+        add it to the archive, print the receipt to the terminal (and to
+        the receipt printer, if any).
+        """
+        lines = [(iname, qty, price) for iname, qty, price, _ in table.lines()] # The prices the lines were opened with
+        total = table.get_total()
+        closed = int(time())
+        order = {"table_id": table.table_id, "start_time": format_time(table.start_time),
+                 "closed_time": format_time(closed), "lines": lines, "total_cents": total, "void": None,
+                 "shares": split_cents(total, payers) if payers > 1 else None}
+
+        self.run_io(self.write_completed_order, self.receipts.render(order, self.menu_version),
+                    (table.table_id, order["start_time"], order["closed_time"], lines, total))
+        if self.receipt_printer is not None:
+            self.receipt_printer.print_receipt(order, self.menu_version)
+        self.update_heatmap(table.start_time, closed)
+
+        return order["closed_time"];
+
+    def void_completed_order(self, table_id, event):
+        """
+        Undo of a completion: a cancelling block (negative quantities,
+        "Ακύρωση:" line) in completed_orders.txt and the order out of
+        the archive.
+        """
+        lines = [(iname, -qty, price) for iname, qty, price, _ in event.lines]
+        order = {"table_id": table_id, "start_time": format_time(event.prev_start), "closed_time": event.time,
+                 "lines": lines, "total_cents": sum(qty * price for _, qty, price in lines),
+                 "void": format_time(int(time())), "shares": None}
+
+        self.run_io(self.write_completed_order, self.receipts.render(order, self.menu_version),
+                    (table_id, event.time), True)
+        if self.receipt_printer is not None:
+            self.receipt_printer.print_receipt(order, self.menu_version)
+        self.update_heatmap(event.prev_start, parse_time(event.time), -1)
+
+        return;
+
+    def update_heatmap(self, start, closed, n=1):
+        """One completion (n=-1: a void) into the heatmap, and heatmap.json rewritten on the writer."""
+        self.heatmap.add(start, closed, n)
+        if self.heatmap_file:
+            self.run_io(write_json_file, json.dumps(self.heatmap.state()), self.heatmap_file)
+
+        return;
+
+    def idle_seconds(self, table, now):
+        """Seconds since the last change of an occupied table (0 for a free one)."""
+        if not table.start_time:
+            return 0;
+        return now - self.activity.get(table.table_id, table.start_time);
+
+    def idle_tables(self, now=None):
+        """[(table, idle seconds), ...] of the tables idle past IDLE_ALERT_MIN."""
+        now = now if now is not None else int(time())
+        return [(t, self.idle_seconds(t, now)) for t in self.tables
+                if t.start_time and self.idle_seconds(t, now) >= self.idle_after];
+
+    def write_completed_order(self, receipt, archive_record, void=False):
+        """
+        The I/O half of save_completed_order/void_completed_order (runs on
+        the background writer): the receipt is one write to the terminal
+        and one to completed_orders.txt, which stays open.
+        """
+        t0 = perf_counter()
+        print(self.receipts.template.SEPARATOR + receipt, end='') # Print to the terminal
+
+        try:
+            if self.completed_f is None:
+                self.completed_f = open(self.completed_orders_file, "a", encoding="utf-8")
+            self.completed_f.write(receipt)
+            self.completed_f.flush() # Readers (reports, bulk import) see whole receipts only
+        except Exception as e:
+            print(f"[!] Error saving completed order: {e}")
+            self.completed_f = None
+
+        if self.archive is not None:
+            try:
+                if void:
+                    self.archive.remove_order(*archive_record)
+                else:
+                    self.archive.add_order(*archive_record)
+            except Exception as e:
+                print(f"[!] Error archiving completed order: {e}")
+
+        if self.metrics is not None:
+            self.metrics.observe("completed_order_ms", (perf_counter() - t0) * 1000)
+
+        return;
+
+    def table_state(self, table):
+        """JSON-friendly view of a table."""
+        return {"table_id": table.table_id,
+                "start_time": format_time(table.start_time) or None,
+                "orders": [[iname, qty, price] for iname, qty, price, _ in table.lines()],
+                "total_cents": table.get_total()};
+
+    ###################################################
+    #          HOT RELOAD (menu.txt/settings.txt)     #
+    ###################################################
+    def check_reload(self):
+        """Poll menu.txt/settings.txt; re-parse and apply only what changed."""
+        if self.menu_watcher is not None and self.menu_watcher.changed():
+            self.reload_menu()
+        if self.settings_watcher is not None and self.settings_watcher.changed():
+            self.reload_settings()
+
+        return;
+
+    def reload_menu(self):
+        """
+        Apply the new menu.txt as a diff: { "added", "removed", "prices",
+        "codes": [item_name, ...] }. Open lines keep the price (and menu
+        version) they were ordered at; only new lines use the new prices.
+        """
+        items, menu_dict = load_menu(self.menu_file, self.catalog)
+        if not items:
+            print(f"[!] Ignoring empty menu: {self.menu_file}")
+            return None;
+
+        old = {it.name: it for it in self.items}
+        new = {it.name: it for it in items}
+        diff = {"added": [name for name in new if name not in old],
+                "removed": [name for name in old if name not in new],
+                "prices": [name for name in new if name in old
+                           and new[name].price_cents != old[name].price_cents],
+                "codes": [name for name in new if name in old and new[name].code != old[name].code]}
+
+        self.items = items
+        self.menu_dict = menu_dict
+        self.menu_version = self.menu_watcher.version if self.menu_watcher is not None else self.menu_version + 1
+        for name in diff["removed"]:
+            del self.price_map[name]
+        for name in diff["added"] + diff["prices"]:
+            self.price_map[name] = new[name].price_cents
+        self._menu_index = None # Rebuilt on the next search
+        self.keep_menu_version()
+
+        self.log(f"Menu v{self.menu_version}: +{len(diff['added'])} -{len(diff['removed'])} "
+                 f"{len(diff['prices'])} price change(s)")
+        for listener in self.menu_listeners:
+            listener(diff)
+
+        return diff;
+
+    def keep_menu_version(self):
+        """Copy menu.txt to menus_dir/menu_<version>.txt (once per version)."""
+        if not self.menus_dir or not self.menu_file:
+            return;
+        target = join(self.menus_dir, f"menu_{self.menu_version}.txt")
+        if not exists(target):
+            self.run_io(copyfile, self.menu_file, target)
+
+        return;
+
+    def reload_settings(self):
+        """Update the settings in place (the timers read them on every run)."""
+        settings = load_settings(self.settings_file)
+        changed = sorted(k for k in set(settings) | set(self.settings)
+                         if settings.get(k) != self.settings.get(k))
+        if not changed:
+            return changed;
+
+        self.settings.clear()
+        self.settings.update(settings)
+        self.shift_starts = parse_shifts(settings.get("SHIFTS", "06:00"))
+        self.shift_cache = (None, None)
+        self.log(f"Settings changed: {', '.join(changed)}")
+        if "FLOORS" in changed:
+            print("[!] FLOORS changed: restart the application to apply it")
+        elif "ARITHMOS_TRAPEZION" in changed and "FLOORS" not in settings:
+            self.resize_tables(int(settings.get("ARITHMOS_TRAPEZION", 12)))
+
+        return changed;
+
+    def resize_tables(self, num_tables):
+        """
+        Add tables up to num_tables, or drop the last ones down to it.
+        Tables with open orders are never dropped.
+        """
+        added, removed = [], []
+        while len(self.tables) < num_tables:
+            next_id = self.tables[-1].table_id + 1 if self.tables else 1
+            table = Table(next_id, self.catalog)
+            table.journal = self.journal
+            self.tables.append(table) # The one floor's list too
+            added.append(table)
+        while len(self.tables) > num_tables and not self.tables[-1].orders:
+            removed.append(self.tables.pop())
+        if len(self.tables) > num_tables:
+            print(f"[!] Keeping {len(self.tables) - num_tables} table(s) with open orders")
+
+        for table in added:
+            self.tables_by_id[table.table_id] = table
+            self.floor_of[table.table_id] = self.floors[0]
+            self.histories[table.table_id] = TableHistory(table, self.undo_depth)
+        for table in removed:
+            del self.tables_by_id[table.table_id]
+            del self.floor_of[table.table_id]
+            del self.histories[table.table_id]
+        if added or removed:
+            for listener in self.tables_listeners:
+                listener(added, removed)
+
+        return added, removed;
+
+    ###################################################
+    #                 PERSISTENCE                     #
+    ###################################################
+    def save(self):
+        """
+        Snapshot orders.txt/orders.bin (and compact the journal) of every
+        floor changed since its last snapshot; the others are not touched.
+        """
+        if not self.ready.is_set():
+            return; # Half-restored tables must not replace the snapshot
+        self.flush_audit()
+        binary = self.settings.get("SNAPSHOT_FORMAT", "text") == "binary"
+        for floor in self.floors:
+            if not floor.dirty:
+                continue;
+            floor.dirty = False
+            # The state is captured now, the file is written by the writer
+            if binary:
+                data = format_orders_binary(floor.tables, floor.journal)
+            else:
+                data = format_orders(floor.tables, floor.journal).encode("utf-8")
+            if self.metrics is None:
+                self.run_io(write_snapshot, data, floor.orders_file, floor.journal, self.snapshot_keep())
+            else:
+                self.run_io(self.write_snapshot_timed, data, floor)
+
+        return;
+
+    def write_snapshot_timed(self, data, floor):
+        """write_snapshot plus the save duration/bytes metrics."""
+        t0 = perf_counter()
+        write_snapshot(data, floor.orders_file, floor.journal, self.snapshot_keep())
+        self.metrics.observe("save_ms", (perf_counter() - t0) * 1000)
+        self.metrics.count("saves")
+        self.metrics.count("save_bytes", len(data))
+
+        return;
+
+    def export_text(self, text_file):
+        """The open orders as a text snapshot (whatever SNAPSHOT_FORMAT is)."""
+        journal = self.journal if len(self.floors) == 1 else None # One seq only makes sense for one floor
+        self.run_io(write_orders, format_orders(self.tables, journal), text_file, None, 0)
+        return;
+
+    def snapshot_keep(self):
+        return int(self.settings.get("SNAPSHOT_KEEP", SNAPSHOT_KEEP));
+
+    def dump_metrics(self):
+        """Append the current metrics to the metrics file (written by the writer)."""
+        if self.metrics is not None:
+            self.run_io(self.metrics.dump, self.metrics.snapshot())
+
+        return;
+
+    def sync(self):
+        """fsync the journal records of the last few changes (and write the audit rows)."""
+        self.flush_audit()
+        for floor in self.floors:
+            if floor.journal is not None:
+                self.run_io(floor.journal.sync)
+
+        return;
+
+    def flush(self):
+        """Wait until every pending write is on disk."""
+        if self.writer is not None:
+            self.writer.flush()
+
+        return;
+
+    def close(self):
+        self.ready.wait() # A restore still running finishes first
+        if self.dispatcher is not None:
+            self.dispatcher.close() # The tickets still in their window are sent first
+        self.save()
+        self.dump_metrics()
+        if self.writer is not None:
+            self.writer.close() # Runs everything still queued
+        if self.completed_f is not None:
+            self.completed_f.close()
+            self.completed_f = None
+        if self.receipt_printer is not None:
+            self.receipt_printer.close() # The receipts still queued are printed first
+        for floor in self.floors:
+            if floor.journal is not None:
+                floor.journal.close()
+        if self.archive is not None:
+            self.archive.close()
+
+        return;
+
+def migrate_to_floors(legacy_stem, floors, tables, price_map, binary=False):
+    """
+    First start with FLOORS on an installation of one floor: the open
+    orders of orders.txt/orders.bin + orders.journal (legacy_stem) go to
+    the snapshot of every floor (a table keeps its number, so its floor).
+    The old files are renamed *.migrated, so they are not restored again.
+    """
+    existing = [f for f in (legacy_stem + ".txt", legacy_stem + ".bin") if exists(f)]
+    journal_file = legacy_stem + ".journal"
+    if not existing and not exists(journal_file):
+        return;
+
+    journal = OrderJournal(journal_file)
+    load_orders(tables, max(existing, key=getmtime) if existing else legacy_stem + ".txt", journal, price_map)
+    journal.close()
+    for floor in floors:
+        data = format_orders_binary(floor.tables) if binary else format_orders(floor.tables).encode("utf-8")
+        write_snapshot(data, floor.orders_file)
+    old_files = [f for stem_file in existing for f in snapshot_files(stem_file)] + [journal_file]
+    for old_file in old_files:
+        if exists(old_file):
+            replace(old_file, old_file + ".migrated")
+    print(f"Open orders of {sum(1 for t in tables if t.line_ids)} tables moved to the files of "
+          f"{len(floors)} floors ({', '.join(floor.name for floor in floors)})")
+
+    return;
+
+def open_engine(base_dir, background_restore=False):
+    """
+    Load settings, menu and open orders from base_dir/appData and
+    base_dir/ordersData and return a ready OrderEngine.
+    background_restore=True: the open orders are loaded on a thread
+    (engine.ready is set once they are in).
+    """
+    appData_dir =   join(base_dir, "appData")
+    settings_file = join(appData_dir, "settings.txt")
+    menu_file =     join(appData_dir, "menu.txt")
+
+    ordersData_dir = join(base_dir, "ordersData")
+    archive_file =   join(ordersData_dir, "completed_orders.sqlite3")
+    completed_orders_file = join(ordersData_dir, "completed_orders.txt")
+    metrics_file =   join(ordersData_dir, "metrics.jsonl")
+    heatmap_file =   join(ordersData_dir, "heatmap.json") # Occupancy by weekday x hour
+    menus_dir =      join(ordersData_dir, "menus") # Every menu version the order lines refer to
+    dispatch_dir =   join(ordersData_dir, "dispatch") # Station outboxes and ticket files
+
+    # Ensure directories exist
+    for directory in [appData_dir, ordersData_dir, menus_dir]:
+        if not exists(directory):
+            makedirs(directory)
+
+    settings = load_settings(settings_file)
+
+    catalog = ItemCatalog() # Item name <=> id, shared by the menu and the tables
+    flat_items, menu_dict = load_menu(menu_file, catalog) # Load menu
+
+    # Floors (FLOORS=Βεράντα:20,Σάλα:30): each its own tables, orders_<floor>.txt and
+    # orders_<floor>.journal; without it one floor of ARITHMOS_TRAPEZION tables on orders.txt
+    floor_sizes = parse_floors(settings.get("FLOORS", ""))
+    if not floor_sizes:
+        floor_sizes = [("", int(settings.get("ARITHMOS_TRAPEZION", 12)))]
+
+    floors = []
+    restore_files = []
+    tables = [] # Every table, in id order
+    for name, count in floor_sizes:
+        floor_tables = [Table(i, catalog) for i in range(len(tables) + 1, len(tables) + count + 1)] # Create tables
+        tables += floor_tables
+        stem = join(ordersData_dir, "orders" + ("_" + "".join(c if c.isalnum() else "_" for c in name) if name else ""))
+
+        # Journal mode (default): every click is appended to orders.journal
+        journal = None
+        if settings.get("JOURNAL", "1") == "1":
+            fsync_interval = int(settings.get("JOURNAL_FSYNC_MS", 1000)) / 1000
+            journal = OrderJournal(stem + ".journal", fsync_interval)
+
+        # Snapshots go to orders.bin with SNAPSHOT_FORMAT=binary; restore from the
+        # newer of the two, so switching the format keeps the open orders
+        orders_file = stem + (".bin" if settings.get("SNAPSHOT_FORMAT", "text") == "binary" else ".txt")
+        existing = [f for f in (stem + ".txt", stem + ".bin") if exists(f)]
+        restore_files.append(max(existing, key=getmtime) if existing else orders_file)
+        floors.append(Floor(name, floor_tables, orders_file, journal))
+    if len(floors) == 1:
+        tables = floors[0].tables # One list, so resize_tables grows the floor too
+
+    price_map = {it.name: it.price_cents for it in flat_items} # For orders saved without prices
+
+    # FLOORS just configured: no floor has files yet, the open orders are still in orders.txt/orders.journal
+    floor_files = [f for floor in floors for f in (floor.orders_file[:-4] + ".txt", floor.orders_file[:-4] + ".bin",
+                                                   floor.orders_file[:-4] + ".journal")]
+    if floor_sizes[0][0] and not any(exists(f) for f in floor_files):
+        migrate_to_floors(join(ordersData_dir, "orders"), floors, tables, price_map,
+                          settings.get("SNAPSHOT_FORMAT", "text") == "binary")
+    if not background_restore:
+        for floor, restore_file in zip(floors, restore_files):
+            load_orders(floor.tables, restore_file, floor.journal, price_map) # Load existing orders (snapshot + journal)
+            for t in floor.tables:
+                t.journal = floor.journal
+
+    # The archive is written by the background writer thread
+    archive = CompletedOrdersArchive(archive_file, check_same_thread=False)
+
+    # Background writer (default): no disk I/O on the caller's thread
+    writer = None
+    if settings.get("BACKGROUND_WRITER", "1") == "1":
+        writer = BackgroundWriter(int(settings.get("WRITER_QUEUE", 10000)))
+
+    # Instrumentation (off by default): latency histograms, save/journal I/O
+    metrics = Metrics(metrics_file) if settings.get("METRICS", "0") == "1" else None
+
+    # Kitchen/bar tickets (off by default): one worker process per station
+    dispatcher = None
+    if settings.get("DISPATCH", "0") == "1":
+        # Imported here: multiprocessing is a noticeable part of the startup otherwise
+        from kapouKapou_dispatch import Dispatcher, parse_routes, DEFAULT_ROUTES
+        routes = parse_routes(settings["DISPATCH_ROUTES"]) if "DISPATCH_ROUTES" in settings else dict(DEFAULT_ROUTES)
+        printers = {station: settings[f"DISPATCH_PRINTER_{station.upper()}"] for station in set(routes.values())
+                    if f"DISPATCH_PRINTER_{station.upper()}" in settings} # file:path, tcp:host:port, unix:path
+        dispatcher = Dispatcher(dispatch_dir, menu_dict, routes,
+                                int(settings.get("DISPATCH_WINDOW_MS", 300)) / 1000,
+                                int(settings.get("DISPATCH_QUEUE", 64)), printers=printers, metrics=metrics)
+        dispatcher.start()
+
+    # Receipt printer (off by default): RECEIPT_PRINTER=file:path, tcp:host:port or unix:path
+    receipt_printer = None
+    if settings.get("RECEIPT_PRINTER"):
+        from kapouKapou_receipts import ReceiptPrinter, ReceiptRenderer, make_template
+        try:
+            template = make_template(settings.get("RECEIPT_TEMPLATE", "plain"), int(settings.get("RECEIPT_WIDTH", 42)))
+            receipt_printer = ReceiptPrinter(settings["RECEIPT_PRINTER"], ReceiptRenderer(template),
+                                             join(ordersData_dir, "receipts.txt"))
+        except ValueError as e:
+            print(f"[!] {e}")
+
+    engine = OrderEngine(tables, flat_items, menu_dict, settings, None, archive,
+                         None, completed_orders_file, writer,
+                         catalog, menu_file, settings_file, menus_dir, metrics, dispatcher, floors, heatmap_file,
+                         receipt_printer)
+    if background_restore:
+        engine.restore_in_background(restore_files, price_map)
+
+    return engine;
+
+###################################################
+#                     main()                      #
+###################################################
+def main():
+    import argparse # Only the command line needs it (the GUI starts without)
+
+    parser = argparse.ArgumentParser(description="Open orders of this installation")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("file", help="text snapshot to write (also from orders.bin)")
+    args = parser.parse_args()
+
+    engine = open_engine(dirname(abspath(__file__)))
+    engine.export_text(args.file)
+    engine.close()
+
+    return;
+
+if __name__ == "__main__":
+    main()
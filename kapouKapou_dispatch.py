@@ -0,0 +1,460 @@
+import json
+import multiprocessing
+import signal
+import socket
+from datetime import datetime
+from os import makedirs, fsync, pwrite, open as os_open, close, O_RDWR, O_CREAT
+from os.path import join, exists, getsize
+from queue import Empty
+from threading import Thread, Condition, Lock
+from time import time, monotonic, sleep, perf_counter
+
+DEFAULT_ROUTES = {"ΣΧΑΡΑΣ": "grill", "ΠΟΤΑ": "bar", "ΑΝΑΨΥΚΤΙΚΑ": "bar"} # Category => station
+STATION_TITLES = {"grill": "ΣΧΑΡΑ", "bar": "ΜΠΑΡ"} # Ticket headings (other stations: upper-case name)
+
+###################################################
+#            ROUTING (menu category)              #
+###################################################
+def parse_routes(text):
+    """'ΣΧΑΡΑΣ:grill,ΠΟΤΑ:bar' => { "ΣΧΑΡΑΣ": "grill", "ΠΟΤΑ": "bar" }"""
+    routes = {}
+    for part in text.split(","):
+        category, _, station = part.rpartition(":")
+        if category.strip() and station.strip():
+            routes[category.strip()] = station.strip()
+
+    return routes;
+
+def item_routes(menu_dict, routes):
+    """{ item_name: station } for the items of the routed categories."""
+    return {it.name: routes[category] for category, items in menu_dict.items()
+            if category in routes for it in items};
+
+def format_ticket(ticket):
+    """
+    ==== ΣΧΑΡΑ ====  #17
+    Τραπέζι 4 - 21:40:55
+     +2 ΣΟΥΒΛΑΚΙ ΧΟΙΡΙΝΟ
+     -1 ΦΙΛΕΤΟ ΚΟΤΟΠΟΥΛΟ
+    """
+    station = ticket["station"]
+    lines = [f"==== {STATION_TITLES.get(station, station.upper())} ====  #{ticket['seq']}",
+             f"Τραπέζι {ticket['table_id']} - {ticket['time']}"]
+    for iname, qty in ticket["lines"]:
+        lines.append(f" {qty:+d} {iname}")
+
+    return "\n".join(lines) + "\n\n";
+
+###################################################
+#         PRINTERS (file / local socket)          #
+###################################################
+class FilePrinter:
+    """Appends the tickets (or receipts) to a file, fsync'ed before the ack."""
+    def __init__(self, path):
+        self.path = path
+
+        return;
+
+    def write(self, text):
+        """text: str (written as utf-8) or bytes already in the printer's encoding (ESC/POS)."""
+        with open(self.path, "ab") as f:
+            f.write(text.encode("utf-8") if isinstance(text, str) else text)
+            f.flush()
+            fsync(f.fileno())
+
+        return;
+
+    def close(self):
+        return;
+
+class SocketPrinter:
+    """
+    Sends the tickets to a local socket ('tcp:host:port' or 'unix:path'),
+    e.g. a network ticket printer or a kitchen display. Reconnects on
+    the next ticket after an error.
+    """
+    def __init__(self, address):
+        self.address = address
+        self.sock = None
+
+        return;
+
+    def connect(self):
+        kind, _, target = self.address.partition(":")
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(target)
+        else:
+            host, _, port = target.rpartition(":")
+            sock = socket.create_connection((host or "127.0.0.1", int(port)), timeout=5)
+
+        return sock;
+
+    def write(self, text):
+        if self.sock is None:
+            self.sock = self.connect()
+        try:
+            self.sock.sendall(text.encode("utf-8") if isinstance(text, str) else text)
+        except OSError:
+            self.close()
+            raise
+
+        return;
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+        return;
+
+def make_printer(spec, default_file):
+    """'' => FilePrinter(default_file), 'file:path', 'tcp:host:port' or 'unix:path'."""
+    if spec.startswith("tcp:") or spec.startswith("unix:"):
+        return SocketPrinter(spec);
+    if spec.startswith("file:"):
+        return FilePrinter(spec[5:]);
+
+    return FilePrinter(default_file);
+
+###################################################
+#        STATION SPOOL (outbox + ack, on disk)    #
+###################################################
+ACK_WIDTH = 20 # The ack file is one fixed-width line, rewritten in place
+
+def write_ack(fd, seq):
+    pwrite(fd, f"{seq:>{ACK_WIDTH - 1}}\n".encode("ascii"), 0)
+    fsync(fd)
+
+    return;
+
+class StationSpool:
+    """
+    Durable queue of one station:
+      <station>.outbox: one JSON ticket per line, fsync'ed before the
+                        worker gets the ticket,
+      <station>.ack:    the seq of the last printed ticket (written by
+                        the worker after the printer accepted it).
+    After a restart every ticket above the ack is sent again, so a
+    ticket may be printed twice but is never lost (at-least-once).
+    """
+    def __init__(self, dispatch_dir, station):
+        self.station = station
+        self.outbox_file = join(dispatch_dir, f"{station}.outbox")
+        self.ack_file = join(dispatch_dir, f"{station}.ack")
+        self.lock = Lock() # Held around seq assignment + append, and ack check + compact
+
+        return;
+
+    def read_ack(self):
+        try:
+            with open(self.ack_file, "r", encoding="ascii") as f:
+                return int(f.read().strip() or 0);
+        except (OSError, ValueError):
+            return 0;
+
+    def unacked(self):
+        """(tickets above the ack, ack, last seq); a torn last line is dropped."""
+        acked = self.read_ack()
+        tickets = []
+        last_seq = acked
+        good_size = 0
+        if exists(self.outbox_file):
+            with open(self.outbox_file, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break; # Torn write at the end (crash)
+                    try:
+                        ticket = json.loads(raw)
+                    except ValueError as e:
+                        print(f"[!] Error in dispatch record {raw!r}: {e}")
+                        break;
+                    good_size += len(raw)
+                    last_seq = max(last_seq, ticket["seq"])
+                    if ticket["seq"] > acked:
+                        tickets.append(ticket)
+            if good_size < getsize(self.outbox_file):
+                with open(self.outbox_file, "ab") as f:
+                    f.truncate(good_size)
+
+        return tickets, acked, last_seq;
+
+    def append(self, tickets):
+        """One write and one fsync for the whole batch (caller holds the lock)."""
+        data = "".join(json.dumps(t, ensure_ascii=False) + "\n" for t in tickets).encode("utf-8")
+        with open(self.outbox_file, "ab") as f:
+            f.write(data)
+            f.flush()
+            fsync(f.fileno())
+
+        return;
+
+    def compact(self):
+        """Empty the outbox: every ticket in it is acked (caller holds the lock)."""
+        with open(self.outbox_file, "ab") as f:
+            f.truncate(0)
+            fsync(f.fileno())
+
+        return;
+
+###################################################
+#          STATION WORKER (own process)           #
+###################################################
+PRINT_BATCH = 64 # Tickets already waiting are printed (and fsync'ed, acked) together
+
+def station_worker(station, printer_spec, default_file, ack_file, tickets, acks):
+    """
+    Print the tickets of one station in order, ack them after the
+    printer took them. A printer that fails is retried (with backoff)
+    until it works again: nothing is acked that was not printed.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C is for the main process
+    printer = make_printer(printer_spec, default_file)
+    ack_fd = os_open(ack_file, O_RDWR | O_CREAT, 0o644)
+    try:
+        stop = False
+        while not stop:
+            batch = [tickets.get()]
+            while len(batch) < PRINT_BATCH and batch[-1] is not None:
+                try:
+                    batch.append(tickets.get_nowait())
+                except Empty:
+                    break;
+            if batch[-1] is None:
+                stop = True
+                batch.pop()
+            if not batch:
+                continue;
+
+            text = "".join(format_ticket(ticket) for ticket in batch)
+            delay = 0.1
+            while True:
+                try:
+                    printer.write(text)
+                    break;
+                except OSError as e:
+                    print(f"[!] Printer '{station}': {e} (retrying)")
+                    sleep(delay)
+                    delay = min(delay * 2, 5.0)
+            write_ack(ack_fd, batch[-1]["seq"])
+            acks.put((station, batch[-1]["seq"], [ticket["created"] for ticket in batch], time()))
+    finally:
+        printer.close()
+        close(ack_fd)
+
+    return;
+
+###################################################
+#      DISPATCHER (batching, queues, workers)     #
+###################################################
+class Dispatcher:
+    """
+    Routes every added/removed item of a routed category to its station
+    (engine item listener). Changes of the same table and station within
+    `window` seconds become one ticket. A flusher thread spools the due
+    tickets (one fsync per batch) and hands them to the station workers.
+
+    Backpressure: the station queues hold `queue_size` tickets; while a
+    worker is that far behind the flusher waits, the changes keep
+    coalescing in the pending tickets, and past `max_pending` changes
+    on_item blocks the caller (like BackgroundWriter.submit).
+    """
+    def __init__(self, dispatch_dir, menu_dict, routes=None, window=0.3, queue_size=64,
+                 max_pending=10000, printers=None, metrics=None):
+        self.dispatch_dir = dispatch_dir
+        self.routes = routes if routes is not None else dict(DEFAULT_ROUTES)
+        self.item_station = item_routes(menu_dict, self.routes)
+        self.stations = sorted(set(self.routes.values()))
+        self.window = window
+        self.max_pending = max_pending
+        self.printers = printers if printers is not None else {} # Dict: { station: printer spec }
+        self.metrics = metrics
+
+        self.pending = {} # Dict: { (station, table_id): [opened (monotonic), created (epoch), { item_name: qty }, changes] }
+        self.pending_changes = 0
+        self.running = False
+        self.cond = Condition()
+
+        self.spools = {station: StationSpool(dispatch_dir, station) for station in self.stations}
+        self.seq = {}    # Dict: { station: last spooled seq }
+        self.acked = {}  # Dict: { station: last acked seq }
+        self.acked_cond = Condition()
+        self.backlog = [] # Unacked tickets of the previous run, sent again first
+
+        context = multiprocessing.get_context("spawn") # No fork of the Tk/writer threads
+        self.queues = {station: context.Queue(queue_size) for station in self.stations}
+        self.acks = context.Queue()
+        self.workers = {}
+        for station in self.stations:
+            spool = self.spools[station]
+            self.workers[station] = context.Process(
+                target=station_worker, name=f"kapouKapou-{station}", daemon=True,
+                args=(station, self.printers.get(station, ""), join(dispatch_dir, f"{station}_tickets.txt"),
+                      spool.ack_file, self.queues[station], self.acks))
+        self.flusher = Thread(target=self.run_flusher, name="kapouKapou-dispatch", daemon=True)
+        self.ack_collector = Thread(target=self.run_acks, name="kapouKapou-dispatch-acks", daemon=True)
+
+        return;
+
+    def start(self):
+        if not exists(self.dispatch_dir):
+            makedirs(self.dispatch_dir)
+        for station, spool in self.spools.items():
+            tickets, self.acked[station], self.seq[station] = spool.unacked()
+            self.backlog.extend(tickets)
+        if self.backlog:
+            print(f"[!] Sending again {len(self.backlog)} ticket(s) that were not printed")
+
+        self.running = True
+        for worker in self.workers.values():
+            worker.start()
+        self.ack_collector.start()
+        self.flusher.start()
+
+        return;
+
+    def set_menu(self, menu_dict):
+        """Engine menu listener: the categories of the new menu."""
+        self.item_station = item_routes(menu_dict, self.routes)
+        return;
+
+    def on_item(self, table, item_name, qty):
+        """Engine item listener (add_item qty > 0, remove_item qty < 0)."""
+        station = self.item_station.get(item_name)
+        if station is None:
+            return;
+
+        with self.cond:
+            while self.pending_changes >= self.max_pending and self.running:
+                self.cond.wait() # Backpressure: the stations are too far behind
+            key = (station, table.table_id)
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = [monotonic(), time(), {}, 0]
+                self.cond.notify_all()
+            entry[2][item_name] = entry[2].get(item_name, 0) + qty
+            entry[3] += 1
+            self.pending_changes += 1
+
+        return;
+
+    ###################################################
+    #                 FLUSHER THREAD                  #
+    ###################################################
+    def run_flusher(self):
+        for ticket in self.backlog:
+            self.queues[ticket["station"]].put(ticket)
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.pending:
+                    return; # Closed and flushed
+                now = monotonic()
+                due = min(entry[0] for entry in self.pending.values()) + self.window
+                if self.running and now < due:
+                    self.cond.wait(due - now)
+                    continue;
+                ready = [key for key, entry in self.pending.items()
+                         if not self.running or entry[0] + self.window <= now]
+                entries = [(key, self.pending.pop(key)) for key in ready]
+                self.pending_changes -= sum(entry[3] for _, entry in entries)
+                self.cond.notify_all()
+
+            try:
+                self.send(entries)
+            except Exception as e:
+                print(f"[!] Error dispatching tickets: {e}")
+
+    def send(self, entries):
+        by_station = {}
+        for (station, table_id), (_, created, quantities, _) in entries:
+            lines = [[iname, qty] for iname, qty in quantities.items() if qty != 0]
+            if not lines:
+                continue; # Added and removed within the window
+            by_station.setdefault(station, []).append(
+                {"station": station, "table_id": table_id, "created": created,
+                 "time": datetime.fromtimestamp(created).strftime("%H:%M:%S"), "lines": lines})
+
+        for station, tickets in by_station.items():
+            spool = self.spools[station]
+            with spool.lock:
+                for ticket in tickets:
+                    self.seq[station] += 1
+                    ticket["seq"] = self.seq[station]
+                spool.append(tickets) # On disk before a worker can print it
+            queue = self.queues[station]
+            for ticket in tickets:
+                t0 = perf_counter()
+                queue.put(ticket) # Blocks while the station queue is full
+                if self.metrics is not None:
+                    self.metrics.observe("dispatch_put_ms", (perf_counter() - t0) * 1000)
+            if self.metrics is not None:
+                self.metrics.count("dispatch_tickets", len(tickets))
+
+        return;
+
+    ###################################################
+    #                 ACK COLLECTOR                   #
+    ###################################################
+    def run_acks(self):
+        while True:
+            ack = self.acks.get()
+            if ack is None:
+                return;
+            station, seq, created_times, printed = ack
+            if self.metrics is not None:
+                for created in created_times:
+                    self.metrics.observe("dispatch_ms", (printed - created) * 1000)
+            with self.acked_cond:
+                self.acked[station] = seq
+                self.acked_cond.notify_all()
+            spool = self.spools[station]
+            with spool.lock:
+                if seq == self.seq[station]:
+                    spool.compact() # Nothing left to print
+
+    def outstanding(self):
+        """Tickets spooled but not printed yet, by station."""
+        return {station: self.seq[station] - self.acked.get(station, 0) for station in self.stations};
+
+    def drain(self, timeout=None):
+        """Flush the pending changes and wait until every ticket is printed."""
+        with self.cond:
+            for entry in self.pending.values():
+                entry[0] -= self.window # Due now
+            self.cond.notify_all()
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.acked_cond:
+            while True:
+                with self.cond:
+                    idle = not self.pending
+                if idle and not any(self.outstanding().values()):
+                    return True;
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False;
+                self.acked_cond.wait(0.05 if remaining is None else min(remaining, 0.05))
+
+    def close(self, timeout=5.0):
+        """Send what is pending and stop the workers (unprinted tickets stay spooled)."""
+        if not self.running:
+            return;
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.flusher.join()
+        for queue in self.queues.values():
+            queue.put(None)
+        for station, worker in self.workers.items():
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+            if worker.exitcode != 0:
+                print(f"[!] Station '{station}' did not finish, its unprinted tickets stay in the outbox")
+                self.queues[station].cancel_join_thread() # Nobody reads what is left in it
+        self.acks.put(None)
+        self.ack_collector.join()
+
+        return;
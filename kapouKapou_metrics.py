@@ -0,0 +1,115 @@
+import json
+from bisect import bisect_left
+from datetime import datetime
+from threading import Lock
+
+###################################################
+#            HISTOGRAM (fixed buckets)            #
+###################################################
+class Histogram:
+    """
+    Count/sum/max plus counts in fixed buckets: O(1) memory and a
+    bisect per observation, so it can stay on during service.
+    Percentiles are the upper bound of the bucket they fall in.
+    """
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1) # The last bucket is "above the last bound"
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+        return;
+
+    def observe(self, value):
+        self.counts[bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+        return;
+
+    def percentile(self, p):
+        if not self.count:
+            return 0;
+        rank = p / 100 * self.count
+        seen = 0
+        for k, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.BOUNDS[k] if k < len(self.BOUNDS) else self.max;
+
+        return self.max;
+
+    def snapshot(self):
+        return {"count": self.count,
+                "avg": round(self.total / self.count, 3) if self.count else 0,
+                "p50": self.percentile(50), "p99": self.percentile(99),
+                "max": round(self.max, 3)};
+
+###################################################
+#                METRICS REGISTRY                 #
+###################################################
+class Metrics:
+    """
+    Named histograms (durations in ms, sizes) and counters, shared by
+    the GUI thread and the background writer (one lock, held for a few
+    additions). Enabled with METRICS=1 in settings.txt.
+    """
+    def __init__(self, metrics_file=None):
+        self.metrics_file = metrics_file # Periodic dumps, one JSON object per line
+        self.histograms = {} # Dict: { name: Histogram }
+        self.counters = {}   # Dict: { name: int }
+        self.lock = Lock()
+
+        return;
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+        return;
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+        return;
+
+    def snapshot(self):
+        with self.lock:
+            return {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+                    "counters": dict(sorted(self.counters.items()))};
+
+    def format_text(self):
+        """The snapshot as the diagnostics panel shows it."""
+        snap = self.snapshot()
+        lines = [f"{'':<24}{'count':>8}{'avg':>10}{'p50':>8}{'p99':>8}{'max':>10}"]
+        for name, h in snap["histograms"].items():
+            lines.append(f"{name:<24}{h['count']:>8}{h['avg']:>10.2f}{h['p50']:>8}{h['p99']:>8}{h['max']:>10.2f}")
+        lines.append("")
+        for name, value in snap["counters"].items():
+            lines.append(f"{name:<24}{value:>12}")
+
+        return "\n".join(lines);
+
+    def dump(self, snapshot=None):
+        """Append a snapshot to metrics_file (safe to run on the background writer)."""
+        if self.metrics_file is None:
+            return;
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        try:
+            with open(self.metrics_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"[!] Error writing metrics: {e}")
+
+        return;
@@ -0,0 +1,197 @@
+from kapouKapou_core import format_cents, BackgroundWriter
+
+###################################################
+#        TEMPLATES (Greek / plain / ESC/POS)      #
+###################################################
+# A receipt is an order dict as parse_completed_orders yields it:
+#   { table_id, start_time, closed_time, lines, total_cents, void }
+# plus "shares": the per-person amounts (cents) or None.
+# A template renders it as header(order) + line(...) per order line + footer(order).
+
+class GreekReceipt:
+    """
+    The block of completed_orders.txt (parse_completed_orders reads it back):
+      Τραπέζι 3
+      Έναρξη: 2024-05-01 20:14:02
+      Παραγγελίες:
+       - ΦΕΤΑ ΨΗΤΗ: 2 x 4.00€ = 8.00€
+      Σύνολο: €8.00
+      Ολοκλήρωση: 2024-05-01 21:40:55
+      ----------------------------------------
+    """
+    binary = False
+    SEPARATOR = "-" * 40 + "\n"
+
+    def header(self, order):
+        return f"Τραπέζι {order['table_id']}\nΈναρξη: {order['start_time']}\nΠαραγγελίες:\n";
+
+    def line(self, item_name, qty, price_cents):
+        return f" - {item_name}: {qty} x {format_cents(price_cents)}€ = {format_cents(qty * price_cents)}€\n";
+
+    def footer(self, order):
+        text = f"Σύνολο: €{format_cents(order['total_cents'])}\n"
+        if order.get("shares"):
+            shares = ", ".join(f"€{format_cents(c)}" for c in order["shares"])
+            text += f"Ανά άτομο ({len(order['shares'])}): {shares}\n"
+        text += f"Ολοκλήρωση: {order['closed_time']}\n"
+        if order["void"]:
+            text += f"Ακύρωση: {order['void']}\n"
+
+        return text + self.SEPARATOR;
+
+class PlainReceipt:
+    """
+    A customer receipt of `width` columns, amounts right-aligned:
+             ΤΡΑΠΕΖΙ 3
+      Έναρξη: 2024-05-01 20:14:02
+      ------------------------------------------
+        2 ΦΕΤΑ ΨΗΤΗ                         8.00
+      ==========================================
+      ΣΥΝΟΛΟ                              €8.00
+    """
+    binary = False
+    CURRENCY = "€"
+
+    def __init__(self, width=42):
+        self.width = width
+
+        return;
+
+    def columns(self, left, right):
+        """left ... right on one line of `width` (left is cut if needed)."""
+        room = self.width - len(right) - 1
+        return f"{left[:room]:<{room}} {right}\n";
+
+    def header(self, order):
+        title = f"ΤΡΑΠΕΖΙ {order['table_id']}"
+        if order["void"]:
+            title = "ΑΚΥΡΩΣΗ - " + title
+        return f"{title:^{self.width}}\nΈναρξη: {order['start_time']}\n" + "-" * self.width + "\n";
+
+    def line(self, item_name, qty, price_cents):
+        return self.columns(f"{qty:>3} {item_name}", format_cents(qty * price_cents));
+
+    def footer(self, order):
+        text = "=" * self.width + "\n"
+        text += self.columns("ΣΥΝΟΛΟ", f"{self.CURRENCY}{format_cents(order['total_cents'])}")
+        for k, cents in enumerate(order.get("shares") or (), 1):
+            text += self.columns(f"  Άτομο {k}", f"{self.CURRENCY}{format_cents(cents)}")
+        text += f"Ολοκλήρωση: {order['closed_time']}\n"
+        if order["void"]:
+            text += f"Ακύρωση: {order['void']}\n"
+
+        return text + "\n";
+
+class EscPosReceipt(PlainReceipt):
+    """
+    The plain layout as ESC/POS bytes for a thermal printer: Greek code
+    page (CP737, which has no €), bold centered title, paper cut.
+    """
+    binary = True
+    CURRENCY = "EUR "
+    ENCODING = "cp737"
+    INIT = b"\x1b@" + b"\x1bt\x0e" # Reset, code page 14 (PC737 Greek)
+    CENTER, LEFT = b"\x1ba\x01", b"\x1ba\x00"
+    BOLD_ON, BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+    FEED_CUT = b"\x1bd\x04" + b"\x1dV\x01" # Feed 4 lines, partial cut
+
+    def encode(self, text):
+        return text.encode(self.ENCODING, errors="replace");
+
+    def header(self, order):
+        title = f"ΤΡΑΠΕΖΙ {order['table_id']}"
+        if order["void"]:
+            title = "ΑΚΥΡΩΣΗ - " + title
+        return (self.INIT + self.CENTER + self.BOLD_ON + self.encode(title + "\n") + self.BOLD_OFF + self.LEFT +
+                self.encode(f"Έναρξη: {order['start_time']}\n" + "-" * self.width + "\n"));
+
+    def line(self, item_name, qty, price_cents):
+        return self.encode(super().line(item_name, qty, price_cents));
+
+    def footer(self, order):
+        return self.BOLD_ON + self.encode(super().footer(order)) + self.BOLD_OFF + self.FEED_CUT;
+
+TEMPLATES = {"greek": GreekReceipt, "plain": PlainReceipt, "escpos": EscPosReceipt}
+
+def make_template(name, width=42):
+    """RECEIPT_TEMPLATE of settings.txt => a template ('greek', 'plain' or 'escpos')."""
+    if name not in TEMPLATES:
+        raise ValueError(f"unknown receipt template '{name}' ({', '.join(TEMPLATES)})")
+
+    return TEMPLATES[name]() if name == "greek" else TEMPLATES[name](width);
+
+###################################################
+#      RENDERER (cached item lines per menu)      #
+###################################################
+class ReceiptRenderer:
+    """
+    A template plus the item lines it already rendered. A line depends
+    only on (item, qty, price), so a service keeps rendering the same few
+    hundred: they are formatted once per menu version (the cache is
+    dropped when the menu changes) and a receipt is a join of cached
+    fragments between its header and footer.
+    """
+    MAX_FRAGMENTS = 20000 # Dropped and rebuilt past this (odd quantities of a huge menu)
+
+    def __init__(self, template):
+        self.template = template
+        self.fragments = {} # Dict: { (item_name, qty, price_cents): rendered line }
+        self.menu_version = None
+
+        return;
+
+    def render(self, order, menu_version=None):
+        """The whole receipt as one str (bytes for a binary template)."""
+        if menu_version != self.menu_version:
+            self.fragments.clear()
+            self.menu_version = menu_version
+        template = self.template
+        fragments = self.fragments
+
+        parts = [template.header(order)]
+        for line in order["lines"]:
+            text = fragments.get(line)
+            if text is None:
+                if len(fragments) >= self.MAX_FRAGMENTS:
+                    fragments.clear()
+                text = fragments[line] = template.line(*line)
+            parts.append(text)
+        parts.append(template.footer(order))
+
+        return (b"" if template.binary else "").join(parts);
+
+###################################################
+#        RECEIPT PRINTER (own thread)             #
+###################################################
+class ReceiptPrinter:
+    """
+    Receipts to a printer: 'file:path', 'tcp:host:port' or 'unix:path'
+    (a thermal printer, a print server, or a local stand-in that just
+    collects them). One write per receipt, on its own thread, so a slow
+    or offline printer never holds up the orders or the journal.
+    """
+    def __init__(self, spec, renderer, default_file, max_pending=1000):
+        from kapouKapou_dispatch import make_printer # Imported here: multiprocessing comes with it
+        self.printer = make_printer(spec, default_file)
+        self.renderer = renderer
+        self.thread = BackgroundWriter(max_pending)
+        self.printed = 0 # Receipts handed to the printer thread
+
+        return;
+
+    def print_receipt(self, order, menu_version=None):
+        self.thread.submit(self.printer.write, self.renderer.render(order, menu_version))
+        self.printed += 1
+
+        return;
+
+    def flush(self):
+        """Wait until every receipt so far went to the printer."""
+        self.thread.flush()
+        return;
+
+    def close(self):
+        self.thread.close()
+        self.printer.close()
+
+        return;
@@ -0,0 +1,320 @@
+import argparse
+import csv
+import json
+from datetime import datetime
+from os import makedirs
+from os.path import join, dirname, abspath, exists
+
+from kapouKapou_archive import parse_completed_orders
+from kapouKapou_core import (load_menu, load_settings, format_cents, parse_floors, floor_of_tables, parse_venues,
+                             parse_time, OccupancyHeatmap)
+
+OFF_MENU = "(εκτός καταλόγου)" # Category of the items that are not in menu.txt any more
+
+###################################################
+#        SALES REPORT (one streaming pass)        #
+###################################################
+class SalesReport:
+    """
+    End-of-day figures, accumulated one completed order at a time.
+    The memory depends on the number of days, items and tables, never
+    on the length of the history. Revenue is booked on the closing time.
+    """
+    def __init__(self, item_categories=None, floor_of=None, heatmap=None):
+        self.item_categories = item_categories if item_categories is not None else {}
+        self.floor_of = floor_of if floor_of is not None else {} # Dict: { table_id: floor name } (FLOORS)
+        self.heatmap = heatmap # OccupancyHeatmap to fill as well (optional, --heatmap)
+        self.orders = 0
+        self.revenue = 0
+        self.duration_sum = 0 # Seconds from start_time to completion
+        self.timed_orders = 0 # Orders with a start_time
+        self.days = {}        # Dict: { day: [orders, revenue_cents] }
+        self.hours = [[0, 0] for _ in range(24)] # [orders, revenue_cents] by closing hour
+        self.items = {}       # Dict: { item_name: [qty, revenue_cents] }
+        self.categories = {}  # Dict: { category: [qty, revenue_cents] }
+        self.tables = {}      # Dict: { table_id: [orders, revenue_cents, duration_sum, timed_orders] }
+        self.floors = {}      # Dict: { floor: [orders, revenue_cents] } (only with FLOORS)
+        self.venues = {}      # Dict: { venue: [orders, revenue_cents] } (only in a consolidated report)
+
+        return;
+
+    def add(self, order):
+        """
+        One order as yielded by parse_completed_orders. A voided order
+        (negative lines) takes its original back out of every figure.
+        """
+        closed = order["closed_time"]
+        total = order["total_cents"]
+        n = -1 if order.get("void") else 1
+        self.orders += n
+        self.revenue += total
+
+        day = self.days.get(closed[:10])
+        if day is None:
+            day = self.days[closed[:10]] = [0, 0]
+        day[0] += n
+        day[1] += total
+        hour = self.hours[int(closed[11:13])]
+        hour[0] += n
+        hour[1] += total
+
+        categories = self.item_categories
+        for iname, qty, price in order["lines"]:
+            amount = qty * price
+            item = self.items.get(iname)
+            if item is None:
+                item = self.items[iname] = [0, 0]
+            item[0] += qty
+            item[1] += amount
+            category = categories.get(iname, OFF_MENU)
+            cat = self.categories.get(category)
+            if cat is None:
+                cat = self.categories[category] = [0, 0]
+            cat[0] += qty
+            cat[1] += amount
+
+        table = self.tables.get(order["table_id"])
+        if table is None:
+            table = self.tables[order["table_id"]] = [0, 0, 0, 0]
+        table[0] += n
+        table[1] += total
+        if self.heatmap is not None:
+            self.heatmap.add(parse_time(order["start_time"]), parse_time(closed), n)
+        if self.floor_of:
+            floor_name = self.floor_of.get(order["table_id"], "-") # "-": a table no floor has any more
+            floor = self.floors.get(floor_name)
+            if floor is None:
+                floor = self.floors[floor_name] = [0, 0]
+            floor[0] += n
+            floor[1] += total
+        if order["start_time"]:
+            try:
+                seconds = (datetime.fromisoformat(closed) -
+                           datetime.fromisoformat(order["start_time"])).total_seconds()
+            except ValueError:
+                return;
+            self.duration_sum += n * seconds
+            self.timed_orders += n
+            table[2] += n * seconds
+            table[3] += n
+
+        return;
+
+    def merge(self, other, venue):
+        """
+        Add the figures of the report of another venue. Its tables and
+        floors stay apart ("venue table_id"), the rest adds up.
+        """
+        self.orders += other.orders
+        self.revenue += other.revenue
+        self.duration_sum += other.duration_sum
+        self.timed_orders += other.timed_orders
+        self.venues[venue] = [other.orders, other.revenue]
+
+        for day, (n, cents) in other.days.items():
+            mine = self.days.setdefault(day, [0, 0])
+            mine[0] += n
+            mine[1] += cents
+        for mine, (n, cents) in zip(self.hours, other.hours):
+            mine[0] += n
+            mine[1] += cents
+        for mine_dict, other_dict in ((self.items, other.items), (self.categories, other.categories)):
+            for key, (qty, cents) in other_dict.items():
+                mine = mine_dict.setdefault(key, [0, 0])
+                mine[0] += qty
+                mine[1] += cents
+        for tid, figures in other.tables.items():
+            self.tables[f"{venue} {tid}"] = list(figures)
+        for floor, figures in other.floors.items():
+            self.floors[f"{venue} {floor}"] = list(figures)
+        if self.heatmap is not None and other.heatmap is not None:
+            self.heatmap.merge(other.heatmap)
+
+        return;
+
+    def avg_duration(self):
+        """Average minutes from the first item to completion."""
+        return self.duration_sum / self.timed_orders / 60 if self.timed_orders else 0.0;
+
+    def sections(self, top=None):
+        """{ section: [row dict, ...] }, the common shape of the CSV/JSON exports."""
+        items = sorted(self.items.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        if top is not None:
+            items = items[:top]
+
+        return {
+            "daily": [{"day": day, "orders": n, "revenue_cents": cents}
+                      for day, (n, cents) in sorted(self.days.items())],
+            "hourly": [{"hour": h, "orders": n, "revenue_cents": cents}
+                       for h, (n, cents) in enumerate(self.hours) if n],
+            "items": [{"item": iname, "qty": qty, "revenue_cents": cents}
+                      for iname, (qty, cents) in items],
+            "categories": [{"category": category, "qty": qty, "revenue_cents": cents}
+                           for category, (qty, cents) in sorted(self.categories.items(),
+                                                                key=lambda kv: -kv[1][1])],
+            "tables": [{"table_id": tid, "orders": n, "revenue_cents": cents,
+                        "avg_minutes": round(dur / timed / 60, 1) if timed else None}
+                       for tid, (n, cents, dur, timed) in sorted(self.tables.items())],
+            **({"floors": [{"floor": floor, "orders": n, "revenue_cents": cents}
+                           for floor, (n, cents) in sorted(self.floors.items())]} if self.floors else {}),
+            **({"venues": [{"venue": venue, "orders": n, "revenue_cents": cents}
+                           for venue, (n, cents) in self.venues.items()]} if self.venues else {}),
+        };
+
+    def summary(self):
+        return {"orders": self.orders, "revenue_cents": self.revenue,
+                "avg_minutes": round(self.avg_duration(), 1)};
+
+    ###################################################
+    #                   EXPORT                        #
+    ###################################################
+    def write_json(self, json_file):
+        with open(json_file, "w", encoding="utf-8") as f:
+            heatmap = {"heatmap": self.heatmap.state()} if self.heatmap is not None else {}
+            json.dump({"summary": self.summary(), **self.sections(), **heatmap}, f, ensure_ascii=False, indent=1)
+
+        return;
+
+    def write_csv(self, csv_dir):
+        """One file per section: csv_dir/report_<section>.csv"""
+        if not exists(csv_dir):
+            makedirs(csv_dir)
+        for section, rows in self.sections().items():
+            with open(join(csv_dir, f"report_{section}.csv"), "w", encoding="utf-8", newline="") as f:
+                if not rows:
+                    continue;
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+
+        return;
+
+    def print_text(self, top=10):
+        sections = self.sections(top)
+        print(f"Παραγγελίες: {self.orders}  Τζίρος: €{format_cents(self.revenue)}  "
+              f"Μέση διάρκεια: {self.avg_duration():.1f} λεπτά")
+        print("--- Ανά ημέρα ---")
+        for row in sections["daily"]:
+            print(f"{row['day']}  {row['orders']:6d}  €{format_cents(row['revenue_cents'])}")
+        print("--- Ανά ώρα ---")
+        for row in sections["hourly"]:
+            print(f"{row['hour']:02d}:00  {row['orders']:6d}  €{format_cents(row['revenue_cents'])}")
+        print(f"--- Top {top} ---")
+        for row in sections["items"]:
+            print(f"{row['item']:<30} {row['qty']:6d}  €{format_cents(row['revenue_cents'])}")
+        print("--- Ανά κατηγορία ---")
+        for row in sections["categories"]:
+            print(f"{row['category']:<30} {row['qty']:6d}  €{format_cents(row['revenue_cents'])}")
+        print("--- Ανά τραπέζι ---")
+        for row in sections["tables"]:
+            minutes = f"{row['avg_minutes']:.1f}'" if row["avg_minutes"] is not None else "-"
+            print(f"Τραπέζι {row['table_id']:<4} {row['orders']:6d}  "
+                  f"€{format_cents(row['revenue_cents'])}  {minutes}")
+        for section, title, key in (("floors", "Ανά όροφο", "floor"), ("venues", "Ανά κατάστημα", "venue")):
+            if section in sections:
+                print(f"--- {title} ---")
+                for row in sections[section]:
+                    print(f"{row[key]:<30} {row['orders']:6d}  €{format_cents(row['revenue_cents'])}")
+
+        return;
+
+###################################################
+#              STREAMING (generators)             #
+###################################################
+def iter_orders(completed_orders_file, day_from=None, day_to=None):
+    """The completed orders of the text history, lazily, closed within [day_from, day_to]."""
+    day_from = day_from or "0000-00-00"
+    day_to = day_to or "9999-99-99"
+    with open(completed_orders_file, "r", encoding="utf-8") as f:
+        for order in parse_completed_orders(f):
+            if day_from <= order["closed_time"][:10] <= day_to:
+                yield order
+
+    return;
+
+def item_categories(menu_file):
+    """{ item_name: category } of the current menu."""
+    _, menu_dict = load_menu(menu_file)
+    return {it.name: category for category, items in menu_dict.items() for it in items};
+
+def table_floors(settings_file):
+    """{ table_id: floor name } of the FLOORS of settings.txt ({} without floors)."""
+    return floor_of_tables(parse_floors(load_settings(settings_file).get("FLOORS", "")));
+
+def table_count(settings_file):
+    """The tables of the installation: the FLOORS together, else ARITHMOS_TRAPEZION."""
+    settings = load_settings(settings_file)
+    floors = parse_floors(settings.get("FLOORS", ""))
+    return sum(count for _, count in floors) if floors else int(settings.get("ARITHMOS_TRAPEZION", 12));
+
+def build_report(orders, categories=None, floor_of=None, heatmap=None):
+    """One pass over any iterable of orders (a generator keeps the memory flat)."""
+    report = SalesReport(categories, floor_of, heatmap)
+    for order in orders:
+        report.add(order)
+
+    return report;
+
+###################################################
+#                     main()                      #
+###################################################
+def main():
+    script_dir = dirname(abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="End-of-day reports over completed_orders.txt")
+    parser.add_argument("--file", default=join(script_dir, "ordersData", "completed_orders.txt"))
+    parser.add_argument("--menu", default=join(script_dir, "appData", "menu.txt"),
+                        help="menu.txt for the item categories")
+    parser.add_argument("--settings", default=join(script_dir, "appData", "settings.txt"),
+                        help="settings.txt for the FLOORS of the tables")
+    parser.add_argument("--venue", action="append", metavar="NAME=DIR",
+                        help="consolidated report over the installations of several venues (repeat per venue)")
+    parser.add_argument("--from", dest="day_from", help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="day_to", help="last day (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=10, help="best sellers to show (the exports have all)")
+    parser.add_argument("--csv", dest="csv_dir", help="write report_<section>.csv files to this folder")
+    parser.add_argument("--json", dest="json_file", help="write the whole report to this JSON file")
+    parser.add_argument("--heatmap", action="store_true", help="occupancy/turnover by weekday x hour")
+    args = parser.parse_args()
+
+    if args.venue:
+        try:
+            venues = parse_venues(args.venue)
+        except ValueError as e:
+            print(f"[!] {e}")
+            return;
+        # One streaming pass per venue, then the figures add up
+        report = SalesReport(heatmap=OccupancyHeatmap() if args.heatmap else None)
+        num_tables = 0
+        for name, base_dir in venues:
+            history_file = join(base_dir, "ordersData", "completed_orders.txt")
+            if not exists(history_file):
+                print(f"[!] File not found: {history_file}")
+                continue;
+            venue = build_report(iter_orders(history_file, args.day_from, args.day_to),
+                                 item_categories(join(base_dir, "appData", "menu.txt")),
+                                 table_floors(join(base_dir, "appData", "settings.txt")),
+                                 OccupancyHeatmap() if args.heatmap else None)
+            report.merge(venue, name)
+            num_tables += table_count(join(base_dir, "appData", "settings.txt"))
+        print("=== Σύνολο καταστημάτων ===")
+    else:
+        if not exists(args.file):
+            print(f"[!] File not found: {args.file}")
+            return;
+        report = build_report(iter_orders(args.file, args.day_from, args.day_to),
+                              item_categories(args.menu), table_floors(args.settings),
+                              OccupancyHeatmap() if args.heatmap else None)
+        num_tables = table_count(args.settings)
+    report.print_text(args.top)
+    if report.heatmap is not None:
+        print(report.heatmap.format_text(num_tables))
+    if args.csv_dir:
+        report.write_csv(args.csv_dir)
+    if args.json_file:
+        report.write_json(args.json_file)
+
+    return;
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import unicodedata
+
+###################################################
+#           TEXT NORMALIZATION (search)           #
+###################################################
+def normalize(text):
+    """
+    Case- and accent-insensitive form of a name, for Greek and Latin:
+    'Φέτα Ψητή' => 'φετα ψητη', 'Café' => 'cafe' (final ς => σ too).
+    """
+    decomposed = unicodedata.normalize("NFD", text.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch));
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)};
+
+###################################################
+#              MENU INDEX (search)                #
+###################################################
+class MenuIndex:
+    """
+    Prebuilt search structure over the menu items:
+      - item codes (exact),
+      - word-prefix postings (first PREFIX letters of every word),
+      - trigram postings for substring matching.
+    search() returns items in rank order: code, name prefix, word
+    prefix, substring; ties keep the menu order.
+    """
+    PREFIX = 4
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.by_code = {}  # Dict: { normalized code: item index }
+        self.prefixes = {} # Dict: { word prefix (<= PREFIX letters): set(item index) }
+        self.postings = {} # Dict: { trigram: set(item index) }
+        self.names = []    # " " + normalized name, by item index (" " marks word starts)
+
+        for idx, item in enumerate(self.items):
+            name = normalize(item.name)
+            self.names.append(" " + name)
+            code = getattr(item, "code", None)
+            if code:
+                self.by_code[normalize(code)] = idx
+            for word in name.split():
+                for k in range(1, min(len(word), self.PREFIX) + 1):
+                    self.prefixes.setdefault(word[:k], set()).add(idx)
+            for tri in trigrams(name):
+                self.postings.setdefault(tri, set()).add(idx)
+
+        return;
+
+    def find_code(self, code):
+        idx = self.by_code.get(normalize(code.strip()))
+        return self.items[idx] if idx is not None else None;
+
+    def _prefix_matches(self, term):
+        """Indexes of the items with a word starting with `term`."""
+        found = self.prefixes.get(term[:self.PREFIX], set())
+        if len(term) <= self.PREFIX:
+            return found;
+        word_start = " " + term
+
+        return {idx for idx in found if word_start in self.names[idx]};
+
+    def _substring_matches(self, term):
+        """Indexes of the items whose name contains `term` (len >= 3)."""
+        postings = [self.postings.get(tri) for tri in trigrams(term)]
+        if not all(postings):
+            return set();
+        candidates = set.intersection(*sorted(postings, key=len))
+
+        return {idx for idx in candidates if term in self.names[idx]};
+
+    def search(self, query, limit=None):
+        q = normalize(query).strip()
+        if not q:
+            return [];
+
+        terms = q.split()
+        matched = None
+        for term in terms:
+            found = self._prefix_matches(term)
+            if len(term) >= 3:
+                found = found | self._substring_matches(term)
+            matched = found if matched is None else matched & found
+            if not matched:
+                break;
+
+        code_idx = self.by_code.get(q)
+        name_start = " " + q
+        word_start = " " + terms[0]
+        names = self.names
+        ranked = [(0, code_idx)] if code_idx is not None else []
+        for idx in matched or ():
+            if idx == code_idx:
+                continue;
+            name = names[idx]
+            if name.startswith(name_start):
+                ranked.append((1, idx))
+            elif word_start in name:
+                ranked.append((2, idx))
+            else:
+                ranked.append((3, idx))
+        ranked.sort()
+        if limit is not None:
+            ranked = ranked[:limit]
+
+        return [self.items[idx] for _, idx in ranked];
@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from multiprocessing import Process
+from os.path import join, dirname, abspath, exists
+from shutil import copytree
+from signal import signal, default_int_handler, SIGINT, SIGTERM, SIG_IGN
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from kapouKapou_core import open_engine, parse_venues
+
+###################################################
+#          ORDER SERVER (JSON lines / TCP)        #
+###################################################
+def is_positive_int(value):
+    """A JSON integer > 0 (not true/false, not 1.9)."""
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0;
+
+def positive_int(request, key, default=None):
+    """request[key] (default if missing), which must be a JSON integer > 0."""
+    value = request.get(key, default)
+    if not is_positive_int(value):
+        raise ValueError(f"'{key}' must be an integer > 0")
+
+    return value;
+
+def positive_ints(request, key):
+    """request[key], which must be a non-empty JSON list of integers > 0 (table ids)."""
+    values = request.get(key)
+    if not isinstance(values, list) or not values or not all(is_positive_int(v) for v in values):
+        raise ValueError(f"'{key}' must be a list of integers > 0")
+
+    return values;
+
+class OrderServer:
+    """
+    One authoritative OrderEngine shared by many waiter terminals.
+    Protocol: one JSON object per line.
+      {"id": 1, "op": "menu"}
+      {"id": 2, "op": "tables"}
+      {"id": 3, "op": "table", "table": 4}
+      {"id": 4, "op": "add", "table": 4, "item": "PEPSI", "qty": 1}
+      {"id": 5, "op": "remove", "table": 4, "item": "PEPSI", "qty": 1}
+      {"id": 6, "op": "complete", "table": 4}   (+ "payers": 3 for the shares on the receipt)
+      {"id": 7, "op": "subscribe"}
+      {"id": 8, "op": "search", "q": "σουβ"}
+      {"id": 9, "op": "undo", "table": 4}   (also "redo")
+      {"id": 10, "op": "transfer", "table": 4, "to": 7}   (+ "items": {"PEPSI": 1} to split)
+      {"id": 11, "op": "merge", "table": 4, "from": [5, 6]}
+      {"id": 12, "op": "split", "table": 4, "payers": 3}   (the shares, in cents)
+      {"id": 13, "op": "idle"}   (tables idle past IDLE_ALERT_MIN: [[table, seconds], ...])
+      {"id": 14, "op": "heatmap"}   (occupancy/turnover by weekday x hour)
+    Replies: {"id": .., "ok": true, ...} or {"id": .., "ok": false, "error": "..."}
+    Subscribed clients also get {"event": "table", "table": {...}} after
+    every change of a table, whoever made it.
+    """
+    MAX_PUSH_QUEUE = 1000 # Subscribers that fall this many pushes behind are dropped
+    SHUTDOWN_TIMEOUT = 5 # Seconds the connections get to close at shutdown
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.locks = defaultdict(asyncio.Lock) # Dict: { table_id: Lock }
+        self.subscribers = {} # Dict: { StreamWriter: (push Queue, pusher Task) }
+        self.clients = set() # StreamWriters of every connected terminal (closed at shutdown)
+        engine.listeners.append(self.push_table)
+
+        return;
+
+    def push_table(self, table):
+        """Engine listener: queue the new state of the table for the subscribers."""
+        if not self.subscribers:
+            return;
+
+        line = (json.dumps({"event": "table", "table": self.engine.table_state(table)},
+                           ensure_ascii=False) + "\n").encode("utf-8")
+        for writer, (queue, _) in list(self.subscribers.items()):
+            if queue.qsize() >= self.MAX_PUSH_QUEUE:
+                print("[!] Dropping a subscriber that does not keep up")
+                self.unsubscribe(writer)
+                writer.close()
+                continue;
+            queue.put_nowait(line)
+
+        return;
+
+    def subscribe(self, writer):
+        if writer not in self.subscribers:
+            queue = asyncio.Queue()
+            self.subscribers[writer] = (queue, asyncio.create_task(self.pusher(writer, queue)))
+
+        return;
+
+    def unsubscribe(self, writer):
+        _, task = self.subscribers.pop(writer, (None, None))
+        if task is not None:
+            task.cancel()
+
+        return;
+
+    async def pusher(self, writer, queue):
+        """
+        Send the queued pushes of one subscriber. The drain happens here, not
+        under the table lock of the change: a slow subscriber only falls
+        behind, a disconnected one is dropped and the change still gets its reply.
+        """
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except (ConnectionError, OSError) as e:
+            print(f"[!] Dropping a subscriber: {e!r}")
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+        return;
+
+    async def handle_request(self, request, writer):
+        if not isinstance(request, dict):
+            raise ValueError("a request is a JSON object")
+        engine = self.engine
+        op = request.get("op")
+
+        if op == "menu":
+            return {"menu": {category: [[it.name, it.price_cents] for it in items]
+                             for category, items in engine.menu_dict.items()}};
+        if op == "tables":
+            return {"tables": [engine.table_state(t) for t in engine.tables]};
+        if op == "search":
+            return {"items": [[it.code, it.name, it.price_cents]
+                              for it in engine.menu_index.search(str(request["q"]), limit=50)]};
+        if op == "subscribe":
+            self.subscribe(writer)
+            return {};
+        if op == "idle":
+            return {"idle": [[t.table_id, seconds] for t, seconds in engine.idle_tables()]};
+        if op == "heatmap":
+            return {**engine.heatmap.state(), "tables": len(engine.tables)};
+
+        table_id = positive_int(request, "table")
+        if op in ("transfer", "merge"):
+            # Every table involved, locked in id order (no deadlock with a transfer the other way)
+            others = [positive_int(request, "to")] if op == "transfer" else positive_ints(request, "from")
+            async with AsyncExitStack() as stack:
+                for lock_id in sorted({table_id, *others}):
+                    await stack.enter_async_context(self.locks[lock_id])
+                if op == "transfer":
+                    items = request.get("items") # Missing: the whole table ({} is an error, not the whole table)
+                    if items is not None and (not isinstance(items, dict) or not items):
+                        raise ValueError("'items' must be a non-empty object { item: qty }")
+                    table = engine.transfer_table(table_id, others[0],
+                                                  {str(k): positive_int(items, k) for k in items}
+                                                  if items is not None else None)
+                else:
+                    table = engine.merge_tables(others, table_id)
+            return {"table": engine.table_state(table)};
+        if op == "split":
+            return {"shares": engine.split_bill(table_id, positive_int(request, "payers"))};
+
+        # One change per table at a time: the pushes of a table are queued
+        # in the order of its changes
+        async with self.locks[table_id]:
+            if op == "table":
+                table = engine.get_table(table_id)
+            elif op == "add":
+                table = engine.add_item(table_id, request["item"], positive_int(request, "qty", 1))
+            elif op == "remove":
+                table = engine.remove_item(table_id, request["item"], positive_int(request, "qty", 1))
+            elif op == "complete":
+                table = engine.complete_order(table_id, positive_int(request, "payers", 1))
+            elif op in ("undo", "redo"):
+                engine.undo(table_id) if op == "undo" else engine.redo(table_id)
+                table = engine.get_table(table_id)
+            else:
+                raise ValueError(f"unknown op '{op}'")
+
+        return {"table": engine.table_state(table)};
+
+    async def handle_client(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break;
+                request = {}
+                try:
+                    request = json.loads(raw)
+                    t0 = perf_counter()
+                    reply = await self.handle_request(request, writer)
+                    if self.engine.metrics is not None:
+                        self.engine.metrics.observe("request_ms", (perf_counter() - t0) * 1000)
+                    reply["ok"] = True
+                except (KeyError, ValueError, TypeError) as e:
+                    reply = {"ok": False, "error": str(e.args[0]) if e.args else type(e).__name__}
+                reply["id"] = request.get("id") if isinstance(request, dict) else None
+                writer.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass;
+        finally:
+            self.unsubscribe(writer)
+            self.clients.discard(writer)
+            writer.close()
+
+        return;
+
+    async def persistence_loop(self):
+        """Snapshot, journal fsync, reload and metrics timers (the GUI does this with root.after)."""
+        snapshot_s = int(self.engine.settings.get("SNAPSHOT_MS", 120000)) / 1000
+        fsync_s = int(self.engine.settings.get("JOURNAL_FSYNC_MS", 1000)) / 1000
+        dump_s = int(self.engine.settings.get("METRICS_DUMP_MS", 60000)) / 1000
+        metrics = self.engine.metrics
+        since_snapshot = 0.0
+        since_dump = 0.0
+        while True:
+            t0 = perf_counter()
+            await asyncio.sleep(fsync_s)
+            if metrics is not None:
+                # Event-loop lag: how late the sleep returned
+                metrics.observe("loop_lag_ms", max(perf_counter() - t0 - fsync_s, 0) * 1000)
+                since_dump += fsync_s
+                if since_dump >= dump_s:
+                    self.engine.dump_metrics()
+                    since_dump = 0.0
+            self.engine.sync()
+            self.engine.check_reload() # menu.txt/settings.txt edited while serving
+            since_snapshot += fsync_s
+            if since_snapshot >= snapshot_s:
+                self.engine.save()
+                since_snapshot = 0.0
+
+    async def serve(self, host="127.0.0.1", port=8765, started=None):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        persistence = asyncio.create_task(self.persistence_loop())
+        if started is not None:
+            started.set_result(server.sockets[0].getsockname()[1])
+        print(f"Order server on {host}:{server.sockets[0].getsockname()[1]}")
+        try:
+            # Not serve_forever(): cancelled, it waits for the connections to leave (Python 3.12+)
+            # before this finally could close them. start_server() already accepts them
+            await asyncio.get_running_loop().create_future()
+        finally:
+            persistence.cancel()
+            try:
+                # wait_closed() waits for every connection too: close them first
+                server.close()
+                for writer in list(self.clients):
+                    writer.close()
+                await asyncio.wait_for(server.wait_closed(), self.SHUTDOWN_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                print("[!] Connections still open at shutdown")
+            finally:
+                self.engine.close() # Snapshot + journal, whatever happened above
+
+        return;
+
+###################################################
+#        VENUES (one worker process each)         #
+###################################################
+def serve_venue(name, base_dir, host, port):
+    """Worker process: the OrderServer of one venue (its own engine, files and port)."""
+    signal(SIGINT, SIG_IGN) # Ctrl+C goes to the parent only, which stops every venue once
+    signal(SIGTERM, default_int_handler)
+    engine = open_engine(base_dir)
+    host = host or engine.settings.get("SERVER_HOST", "127.0.0.1")
+    port = port or int(engine.settings.get("SERVER_PORT", 8765))
+    print(f"[{name}] {base_dir}")
+    try:
+        asyncio.run(OrderServer(engine).serve(host, port))
+    except KeyboardInterrupt:
+        pass;
+
+    return;
+
+def serve_venues(venues, host=None, base_port=None):
+    """
+    One process per venue: a busy shop never slows down the other one and
+    each keeps its own journal. With base_port, venue k listens on
+    base_port + k, else on the SERVER_PORT of its settings.txt.
+    """
+    workers = [Process(target=serve_venue, name=f"venue-{name}",
+                       args=(name, base_dir, host, base_port + k if base_port else None))
+               for k, (name, base_dir) in enumerate(venues)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate() # SIGTERM: the worker closes its engine (journal, snapshot)
+        for worker in workers:
+            worker.join()
+
+    return;
+
+###################################################
+#            LOAD GENERATOR (localhost)           #
+###################################################
+async def load_generator(host, port, clients=8, orders_per_client=500):
+    """
+    `clients` terminals placing orders concurrently (one table each,
+    add/remove mix). Returns (orders/sec, p50 ms, p99 ms).
+    """
+    async def request(reader, writer, message):
+        writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        await writer.drain()
+        return json.loads(await reader.readline());
+
+    reader, writer = await asyncio.open_connection(host, port)
+    menu = (await request(reader, writer, {"op": "menu"}))["menu"]
+    num_tables = len((await request(reader, writer, {"op": "tables"}))["tables"])
+    writer.close()
+    names = [name for items in menu.values() for name, _ in items]
+
+    latencies = []
+    async def terminal(k):
+        reader, writer = await asyncio.open_connection(host, port)
+        table_id = 1 + k % num_tables
+        for n in range(orders_per_client):
+            op = "remove" if n % 4 == 3 else "add"
+            t0 = perf_counter()
+            reply = await request(reader, writer, {"id": n, "op": op, "table": table_id,
+                                                   "item": names[n % len(names)]})
+            latencies.append(perf_counter() - t0)
+            assert reply["ok"], reply
+        await request(reader, writer, {"op": "complete", "table": table_id})
+        writer.close()
+
+        return;
+
+    t0 = perf_counter()
+    await asyncio.gather(*(terminal(k) for k in range(clients)))
+    elapsed = perf_counter() - t0
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+
+    return len(latencies) / elapsed, p50, p99;
+
+async def run_self_test(clients, orders_per_client):
+    """Server on a free localhost port over a throwaway copy of appData/, plus the load generator."""
+    script_dir = dirname(abspath(__file__))
+    with TemporaryDirectory() as tmp:
+        copytree(join(script_dir, "appData"), join(tmp, "appData"))
+        engine = open_engine(tmp)
+        started = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(OrderServer(engine).serve("127.0.0.1", 0, started))
+        port = await started
+        try:
+            result = await load_generator("127.0.0.1", port, clients, orders_per_client)
+            # Shutdown with a terminal still connected: the engine must close all the same
+            _, idle_writer = await asyncio.open_connection("127.0.0.1", port)
+        finally:
+            server_task.cancel()
+            done, _ = await asyncio.wait([server_task], timeout=OrderServer.SHUTDOWN_TIMEOUT * 2)
+        idle_writer.close()
+        assert done, "the server did not stop with a client connected"
+        missing = [floor.orders_file for floor in engine.floors if not exists(floor.orders_file)]
+        assert not missing, f"no snapshot written at shutdown: {missing}"
+
+        return result;
+
+###################################################
+#                     main()                      #
+###################################################
+def main():
+    parser = argparse.ArgumentParser(description="Headless order server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="serve the orders of this installation")
+    p_serve.add_argument("--host", default=None)
+    p_serve.add_argument("--port", type=int, default=None)
+    p_venues = sub.add_parser("venues", help="one server process per venue")
+    p_venues.add_argument("--venue", action="append", required=True, metavar="NAME=DIR",
+                          help="a venue and its installation folder (repeat per venue)")
+    p_venues.add_argument("--host", default=None)
+    p_venues.add_argument("--port", type=int, default=None, help="first port (venue k: port + k)")
+    p_load = sub.add_parser("loadgen", help="load generator against a running server")
+    p_load.add_argument("--host", default="127.0.0.1")
+    p_load.add_argument("--port", type=int, default=8765)
+    p_self = sub.add_parser("selftest", help="server + load generator on localhost (throwaway data)")
+    for p in (p_load, p_self):
+        p.add_argument("--clients", type=int, default=8)
+        p.add_argument("--orders", type=int, default=500, help="orders per client")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        engine = open_engine(dirname(abspath(__file__)))
+        host = args.host or engine.settings.get("SERVER_HOST", "127.0.0.1")
+        port = args.port or int(engine.settings.get("SERVER_PORT", 8765))
+        signal(SIGTERM, default_int_handler) # A service stop closes the engine like Ctrl+C does
+        try:
+            asyncio.run(OrderServer(engine).serve(host, port))
+        except KeyboardInterrupt:
+            pass;
+        return;
+
+    if args.command == "venues":
+        try:
+            venues = parse_venues(args.venue)
+        except ValueError as e:
+            print(f"[!] {e}")
+            return;
+        serve_venues(venues, args.host, args.port)
+        return;
+
+    if args.command == "loadgen":
+        result = asyncio.run(load_generator(args.host, args.port, args.clients, args.orders))
+    else:
+        result = asyncio.run(run_self_test(args.clients, args.orders))
+    print(f"{args.clients} clients: {result[0]:.0f} orders/sec, p50 {result[1]:.3f} ms, p99 {result[2]:.3f} ms")
+
+    return;
+
+if __name__ == "__main__":
+    main()
@@ -1,198 +1,328 @@
 import tkinter as tk
-from tkinter.messagebox import askyesno
-from os.path import join, dirname, abspath, exists
-from os import makedirs
+from tkinter.messagebox import askyesno, showinfo, showwarning
+from tkinter.simpledialog import askinteger
+from os.path import dirname, abspath
 from datetime import datetime
+from time import perf_counter, time
+
+from kapouKapou_core import format_cents, format_time, open_engine
 
 ###################################################
-#                   CLASS ITEM                    #
+#               TABLE CARD (widgets)              #
 ###################################################
-class Item:
-    def __init__(self, name, price):
-        self.name = name
-        self.price = price
-
-        return;
+TABLE_COLORS = ["tomato","lightskyblue","palegreen","pink","orange",
+                "khaki","salmon","plum","lightblue","palegreen",
+                "gold","thistle","lightgray","lemonchiffon"]
 
-    def __str__(self):
-        return f"{self.name} - €{self.price:.2f}";
+_NOT_SHOWN = object() # Nothing shown yet (differs from every value)
 
-###################################################
-#                   CLASS TABLE                   #
-###################################################
-class Table:
-    def __init__(self, table_id):
-        self.table_id = table_id
-        self.start_time = None
-        self.orders = {} # Dict: { item_name: quantity }
+# Staged startup: widgets built per idle callback, restore polled every RESTORE_POLL_MS
+CARDS_PER_IDLE = 8
+MENU_ROWS_PER_IDLE = 50
+RESTORE_POLL_MS = 20
 
-        return;
+class TableCard:
+    """
+    The widgets of one table frame. They are created once and
+    update() only touches the labels whose text actually changed.
+    In the virtual grid a card is recycled for another table via assign().
+    """
+    def __init__(self, gui, frame):
+        self.table = None
+        self.frame = frame
+        self.bg_color = frame["bg"]
 
-    def add_item(self, item_name, qty=1):
-        """Adds (or subtracts if qty < 0) an item."""
-        if self.start_time is None and qty > 0:
-            self.start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Label "Table X"
+        self.lbl_title = tk.Label(frame, text="", font=("Arial",10,"bold"), bg=self.bg_color)
+        self.lbl_title.pack(anchor="nw", padx=5, pady=2)
 
-        if item_name not in self.orders:
-            self.orders[item_name] = 0
-        self.orders[item_name] += qty
+        # Έναρξη:
+        self.lbl_start = tk.Label(frame, text="Έναρξη: -", font=("Arial",8,"italic"), bg=self.bg_color)
+        self.lbl_start.pack(anchor="nw", padx=5)
 
-        # If quantity goes <= 0, remove it
-        if self.orders[item_name] <= 0:
-            del self.orders[item_name]
-            # If no items left, reset start_time
-            if not self.orders:
-                self.start_time = None
+        # Elapsed minutes badge (red once the table is idle past IDLE_ALERT_MIN)
+        self.lbl_elapsed = tk.Label(frame, text="", font=("Arial",8,"bold"), bg=self.bg_color)
+        self.lbl_elapsed.pack(anchor="nw", padx=5)
 
-        return;
+        # Container of the order lines, so new lines are packed above the total
+        self.items_frame = tk.Frame(frame, bg=self.bg_color)
+        self.items_frame.pack(anchor="nw", fill="x")
+        self.item_labels = {} # Dict: { item_name: [Label, shown_qty] }
 
-    def remove_item(self, item_name, qty=1):
-        self.add_item(item_name, -qty)
-        return;
+        # Show total
+        self.lbl_total = tk.Label(frame, text="Σύνολο: €0.00", font=("Arial",9,"bold"), bg=self.bg_color)
+        self.lbl_total.pack(anchor="nw", padx=5, pady=5)
 
-    def get_total(self, price_map):
-        total = 0.0
-        for iname, quantity in self.orders.items():
-            price = price_map.get(iname, 0.0)
-            total += price * quantity
+        # Complete Order
+        self.btn_complete = tk.Button(frame, text="Ολοκλήρωση Παραγγελίας", command=lambda: gui.complete_order(self.table))
+        self.btn_complete.pack(anchor="se", padx=5, pady=5)
 
-        return total;
+        # Click => select table
+        for w in (frame, self.lbl_title, self.items_frame):
+            w.bind("<Button-1>", lambda e: gui.select_table(self.table))
 
-    def complete_order(self):
-        self.orders.clear()
-        self.start_time = None
+        self.shown_start = _NOT_SHOWN
+        self.shown_total = _NOT_SHOWN
+        self.shown_selected = _NOT_SHOWN
+        self.shown_badge = _NOT_SHOWN
 
         return;
 
-###################################################
-#                LOAD MENU/TXT                    #
-###################################################
-def load_menu(menu_file="menu.txt"):
-    """
-    Returns (flat_items, menu_dict).
-      flat_items: [Item, Item, ...]
-      menu_dict: { "ΟΡΕΚΤΙΚΑ": [...], "ΣΑΛΑΤΕΣ": [...], ... }
-    """
-    if not exists(menu_file):
-        print(f"[!] Menu file not found: {menu_file}")
-        return [], {};
-
-    with open(menu_file, "r", encoding="utf-8") as f:
-        lines = [line.strip() for line in f]
-
-    flat_items = []
-    menu_dict = {}
-    current_category = None
-
-    for line in lines:
-        if not line:
-            continue;
-        if "-" not in line:
-            current_category = line
-            menu_dict[current_category] = []
-        else:
-            try:
-                parts = line.split("-")
-                iname = parts[0].strip()
-                iprice = float(parts[1].strip())
-                item_obj = Item(iname, iprice)
-                flat_items.append(item_obj)
-                if current_category:
-                    menu_dict[current_category].append(item_obj)
-            except Exception as e:
-                print(f"Error parsing '{line}': {e}")
-
-    return flat_items, menu_dict;
+    def assign(self, table, bg_color):
+        """Show `table` on this card (call update() afterwards)."""
+        if table is self.table:
+            return;
 
-###################################################
-#            LOAD SETTINGS (tables)               #
-###################################################
-def load_settings(settings_file="settings.txt"):
-    settings = {}
-    if not exists(settings_file):
-        settings["ARITHMOS_TRAPEZION"] = "12"
-        return settings;
+        self.table = table
+        if bg_color != self.bg_color:
+            self.bg_color = bg_color
+            for w in (self.frame, self.lbl_title, self.lbl_start, self.items_frame, self.lbl_total):
+                w.config(bg=bg_color)
+            self.shown_badge = _NOT_SHOWN # Its bg follows the card unless idle
+        self.lbl_title.config(text=f"Τραπέζι {table.table_id}")
+
+        for lbl_item, _ in self.item_labels.values():
+            lbl_item.destroy()
+        self.item_labels.clear()
+        self.shown_start = _NOT_SHOWN
+        self.shown_total = _NOT_SHOWN
+        self.shown_selected = _NOT_SHOWN
+        self.shown_badge = _NOT_SHOWN
 
-    with open(settings_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line=line.strip()
-            if "=" in line:
-                key, val = line.split("=", 1)
-                settings[key.strip()] = val.strip()
+        return;
 
-    return settings;
+    def update(self, selected):
+        """Returns the number of widgets created, destroyed or reconfigured."""
+        table = self.table
+        touched = 0
+
+        if table.start_time != self.shown_start:
+            self.shown_start = table.start_time
+            self.lbl_start.config(text=f"Έναρξη: {format_time(table.start_time) if table.start_time else '-'}")
+            touched += 1
+
+        # Order lines: drop the removed, add the new, re-text the changed
+        current = dict(table.orders.items()) # One pass over the lines (`in table.orders` scans them)
+        for iname in [n for n in self.item_labels if n not in current]:
+            self.item_labels.pop(iname)[0].destroy()
+            touched += 1
+        for iname, qty in current.items():
+            entry = self.item_labels.get(iname)
+            if entry is None:
+                lbl_item = tk.Label(self.items_frame, text=f"{iname}: {qty}", font=("Arial",9), bg=self.bg_color)
+                lbl_item.pack(anchor="nw", padx=5)
+                self.item_labels[iname] = [lbl_item, qty]
+                touched += 1
+            elif entry[1] != qty:
+                entry[0].config(text=f"{iname}: {qty}")
+                entry[1] = qty
+                touched += 1
+
+        total_val = table.get_total() # Every line keeps the price it was ordered at
+        if total_val != self.shown_total:
+            self.shown_total = total_val
+            self.lbl_total.config(text=f"Σύνολο: €{format_cents(total_val)}")
+            touched += 1
+
+        # Highlight if selected
+        if selected != self.shown_selected:
+            self.shown_selected = selected
+            if selected:
+                self.frame.config(relief="solid", bd=5)
+            else:
+                self.frame.config(relief="ridge", bd=3)
+            touched += 1
+
+        return touched;
+
+    def show_badge(self, badge):
+        """badge: (minutes, idle) or None for a free table. Returns 1 if the label changed, else 0."""
+        if badge == self.shown_badge:
+            return 0;
+
+        self.shown_badge = badge
+        if badge is None:
+            self.lbl_elapsed.config(text="", bg=self.bg_color, fg="black")
+        else:
+            minutes, idle = badge
+            self.lbl_elapsed.config(text=f"Διάρκεια: {minutes}'" + (" (αδρανές)" if idle else ""),
+                                    bg="red" if idle else self.bg_color, fg="white" if idle else "black")
+
+        return 1;
 
 ###################################################
-#         SAVE/LOAD ORDERS (simple text)          #
+#        VIRTUAL GRID (windowed rendering)        #
 ###################################################
-def save_orders(tables_list, orders_file="orders.txt"):
+class VirtualGrid:
     """
-    Write lines: table_id|item_name|quantity|start_time
+    A scrolled canvas of `count` fixed-size cells (row-major, `columns`
+    per row) where only the visible cells exist as widgets. Scrolling
+    recycles the cells that left the viewport:
+      make_cell(parent)      => (cell, widget)  a new, empty cell
+      fill_cell(cell, index) => show item `index` on the cell
+      release_cell(cell)     => the cell left the viewport (optional)
     """
-    try:
-        with open(orders_file, "w", encoding="utf-8") as f:
-            for table in tables_list:
-                if table.start_time and len(table.orders)>0:
-                    for iname, qty in table.orders.items():
-                        line = f"{table.table_id}|{iname}|{qty}|{table.start_time}"
-                        f.write(line + "\n")
-    except Exception as e:
-        print(f"[!] Error saving orders: {e}")
+    def __init__(self, canvas, scrollbar, columns, cell_width, cell_height,
+                 make_cell, fill_cell, release_cell=None, pad=0):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.columns = columns
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.make_cell = make_cell
+        self.fill_cell = fill_cell
+        self.release_cell = release_cell
+        self.pad = pad
+        self.count = 0
+        self.shown = {} # Dict: { index: (cell, window_id) }
+        self.free = []  # List: [(cell, window_id), ...] hidden, ready for reuse
+
+        canvas.configure(yscrollcommand=self.on_scroll)
+        canvas.bind("<Configure>", lambda e: self.refresh())
 
-    return;
+        return;
+
+    def set_count(self, count):
+        """Change the number of cells; every visible cell is filled again."""
+        self.count = count
+        rows = -(-count // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.cell_width, rows * self.cell_height))
+        for index in list(self.shown):
+            self.release(index)
+        self.refresh()
 
-def load_orders(tables_list, orders_file="orders.txt"):
-    if not exists(orders_file):
         return;
 
-    for t in tables_list:
-        t.orders.clear()
-        t.start_time = None
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
 
-    try:
-        with open(orders_file, "r", encoding="utf-8") as f:
-            lines = [line.strip() for line in f]
-        for line in lines:
-            parts = line.split("|")
-            if len(parts)!=4:
-                continue;
-            tid_str, iname, qty_str, stime = parts
-            try:
-                tid = int(tid_str)
-                qty = int(qty_str)
-            except:
+        return;
+
+    def visible_range(self):
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), 1)
+        first = int(top // self.cell_height) * self.columns
+        last = (int((top + height) // self.cell_height) + 1) * self.columns
+
+        return max(first, 0), min(last, self.count);
+
+    def refresh(self):
+        """Materialize the cells that entered the viewport, recycle the ones that left."""
+        first, last = self.visible_range()
+        for index in [i for i in self.shown if not first <= i < last]:
+            self.release(index)
+
+        for index in range(first, last):
+            if index in self.shown:
                 continue;
-            # find table
-            the_table = None
-            for tbl in tables_list:
-                if tbl.table_id == tid:
-                    the_table = tbl
-                    break;
-            if the_table:
-                the_table.orders[iname] = qty
-                if not the_table.start_time:
-                    the_table.start_time = stime
-    except Exception as e:
-        print(f"[!] Error loading orders: {e}")
+            if self.free:
+                cell, window_id = self.free.pop()
+            else:
+                cell, widget = self.make_cell(self.canvas)
+                window_id = self.canvas.create_window(0, 0, window=widget, anchor="nw",
+                                                      width=self.cell_width - 2 * self.pad,
+                                                      height=self.cell_height - 2 * self.pad)
+            row_i, col_i = divmod(index, self.columns)
+            self.canvas.coords(window_id, col_i * self.cell_width + self.pad, row_i * self.cell_height + self.pad)
+            self.canvas.itemconfigure(window_id, state="normal")
+            self.shown[index] = (cell, window_id)
+            self.fill_cell(cell, index)
 
-    return;
+        return;
+
+    def release(self, index):
+        cell, window_id = self.shown.pop(index)
+        self.canvas.itemconfigure(window_id, state="hidden")
+        if self.release_cell is not None:
+            self.release_cell(cell)
+        self.free.append((cell, window_id))
+
+        return;
+
+    def cells(self):
+        """The materialized cells (visible or waiting for reuse)."""
+        return [c for c, _ in self.shown.values()] + [c for c, _ in self.free];
+
+class MenuRow:
+    """One recyclable row of the virtual menu: a category title or an item."""
+    def __init__(self, gui, parent):
+        self.item = None
+        self.is_category = None
+        bg = "white" # The rows never change color, see update_menu_color
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.lbl_category = tk.Label(self.frame, text="", font=("Arial",12,"bold"), anchor="w", bg=bg)
+        self.btn_minus = tk.Button(self.frame, text="–", width=3, command=lambda: gui.menu_remove_item(self.item.name))
+        self.lbl_name = tk.Label(self.frame, text="", font=("Arial",9), anchor="w", bg=bg)
+        self.spacer = tk.Label(self.frame, text="", bg=bg)
+        self.lbl_price = tk.Label(self.frame, text="", font=("Arial",9), anchor="e", bg=bg)
+        self.btn_plus = tk.Button(self.frame, text="+", width=3, command=lambda: gui.menu_add_item(self.item.name))
+
+        return;
+
+    def assign(self, category, item):
+        """Show a category title (item is None) or an item row."""
+        if item is None:
+            if self.is_category is not True:
+                for w in (self.btn_minus, self.lbl_name, self.spacer, self.lbl_price, self.btn_plus):
+                    w.pack_forget()
+                self.lbl_category.pack(fill="x", padx=5, pady=(6, 0))
+                self.is_category = True
+            self.lbl_category.config(text=category)
+        else:
+            if self.is_category is not False:
+                self.lbl_category.pack_forget()
+                self.btn_minus.pack(side="left", padx=(10, 0))
+                self.lbl_name.pack(side="left", padx=(5, 0))
+                self.spacer.pack(side="left", expand=True)
+                self.lbl_price.pack(side="left", padx=(0,5))
+                self.btn_plus.pack(side="left")
+                self.is_category = False
+            self.lbl_name.config(text=f"{item.code} · {item.name}")
+            self.lbl_price.config(text=f"{format_cents(item.price_cents)} €")
+        self.item = item
+
+        return;
 
 ###################################################
 #              TKINTER GUI MANAGER                #
 ###################################################
 class TableManagerGUI:
-    def __init__(self, root, tables, items, menu_dict):
+    def __init__(self, root, engine):
         self.root = root
         self.root.title("ΚΑΠΟΥ... ΚΑΠΟΥ... ΤΣΙΠΟΥΡΑΔΙΚΟ")
         self.root.state("zoomed")
 
-        self.tables = tables
+        self.engine = engine # OrderEngine: tables, menu and persistence
+        self.tables = engine.tables
+        self.price_map = engine.price_map
+        self.settings = engine.settings
         self.selected_table = None # Which table is currently "selected"
-
-        # Price map for quick lookups
-        self.price_map = {}
-        for it in items:
-            self.price_map[it.name] = it.price
+        self.table_cards = {} # Dict: { table_id: TableCard } (only the materialized ones)
+        self.dirty_tables = {} # Dict: { table_id: Table } waiting for the next redraw
+        self.refresh_pending = False
+        self.table_index = {t.table_id: idx for idx, t in enumerate(self.tables)} # For the colors
+        self.menu_color = "white"
+        self.metrics = engine.metrics # Metrics (METRICS=1) or None
+        self.click_times = {} # Dict: { table_id: perf_counter() of the first click not drawn yet }
+        self.diagnostics = None # The diagnostics Toplevel while it is open
+        self.payers = {} # Dict: { table_id: people sharing the bill } (shown on the receipt)
+        self.pending_cards = [] # Tables whose cards are still to be built (eager grid)
+        self.pending_menu = None # Items whose rows are still to be built (eager menu)
+        self.started = False # Orders restored and timers running
+
+        # Floors (FLOORS in settings.txt): the grid shows one floor at a time
+        self.floor = engine.floors[0]
+        self.floor_index = {t.table_id: k for f in engine.floors for k, t in enumerate(f.tables)} # Position on its floor
+        self.floor_frames = {} # Dict: { floor name: Frame of its cards } (eager grid)
+        self.floor_buttons = {} # Dict: { floor name: Button }
+
+        # Virtual (windowed) grid/menu: only the visible cards and rows exist
+        virtual_ui = self.settings.get("VIRTUAL_UI", "auto")
+        largest_floor = max(len(f.tables) for f in engine.floors)
+        self.virtual_tables = virtual_ui == "1" or (virtual_ui == "auto" and largest_floor > 100)
+        self.virtual_menu = virtual_ui == "1" or (virtual_ui == "auto" and len(engine.items) > 300)
 
         main_frame = tk.Frame(self.root, bg="white")
         main_frame.pack(fill="both", expand=True)
@@ -201,25 +331,47 @@ class TableManagerGUI:
         left_frame = tk.Frame(main_frame, bg="white")
         left_frame.pack(side="left", fill="both", expand=True)
 
+        # One button per floor above the grid
+        if len(engine.floors) > 1:
+            floors_bar = tk.Frame(left_frame, bg="white")
+            floors_bar.pack(side="top", fill="x")
+            for floor in engine.floors:
+                self.floor_buttons[floor.name] = tk.Button(floors_bar, text=floor.name,
+                                                           command=lambda f=floor: self.show_floor(f))
+                self.floor_buttons[floor.name].pack(side="left", padx=2, pady=2)
+            self.floor_buttons[self.floor.name].config(relief="sunken")
+
         self.canvas = tk.Canvas(left_frame, bg="white")
         self.canvas.pack(side="left", fill="both", expand=True)
 
         scroll_y = tk.Scrollbar(left_frame, orient="vertical", command=self.canvas.yview)
         scroll_y.pack(side="right", fill="y")
 
-        self.canvas.configure(yscrollcommand=scroll_y.set)
-        # The actual container
-        self.tables_container = tk.Frame(self.canvas, bg="white")
-        self.canvas.create_window((0,0), window=self.tables_container, anchor="nw")
+        if self.virtual_tables:
+            # Fixed-size cards, materialized on scroll
+            self.tables_grid = VirtualGrid(self.canvas, scroll_y, 4, 240, 280,
+                                           self.make_table_cell, self.fill_table_cell,
+                                           self.release_table_cell, pad=10)
+            self.tables_grid.set_count(len(self.floor.tables))
+        else:
+            self.canvas.configure(yscrollcommand=scroll_y.set)
+            # The actual container
+            self.tables_container = tk.Frame(self.canvas, bg="white")
+            self.canvas.create_window((0,0), window=self.tables_container, anchor="nw")
+
+            # Update scroll region
+            self.tables_container.bind(
+                "<Configure>",
+                lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            )
 
-        # Update scroll region
-        self.tables_container.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+            # A region per floor, only the shown one is packed
+            for floor in engine.floors:
+                self.floor_frames[floor.name] = tk.Frame(self.tables_container, bg="white")
+            self.floor_frames[self.floor.name].pack(anchor="nw")
 
-        # Build the TABLES in a grid of 4 columns
-        self.build_tables_grid()
+            # Build the TABLES in a grid of 4 columns
+            self.build_tables_grid()
 
         # Right part: The Menu
         self.right_frame = tk.Frame(main_frame, bd=2, relief="sunken", bg="white", width=300)
@@ -228,10 +380,44 @@ class TableManagerGUI:
         self.lbl_menu = tk.Label(self.right_frame, text="ΚΑΤΑΛΟΓΟΣ", font=("Arial",14,"bold"), bg="white")
         self.lbl_menu.pack(pady=10)
 
+        # Shown while the open orders are restored in the background
+        self.lbl_status = tk.Label(self.right_frame, text="Φόρτωση παραγγελιών...", font=("Arial",9,"italic"), bg="white")
+        self.lbl_status.pack()
+
         # Add the "Unselect" button below the "MENU" label
         self.btn_unselect = tk.Button(self.right_frame, text="Αποεπιλογή τραπεζιού", command=self.unselect_table)
         self.btn_unselect.pack(pady=5)
 
+        # Undo/redo of the selected table (or of the last changed one): Ctrl+Z / Ctrl+Y
+        undo_frame = tk.Frame(self.right_frame, bg="white")
+        undo_frame.pack(pady=2)
+        tk.Button(undo_frame, text="↶ Αναίρεση", command=lambda: self.undo_redo("undo")).pack(side="left", padx=2)
+        tk.Button(undo_frame, text="↷ Επανάληψη", command=lambda: self.undo_redo("redo")).pack(side="left", padx=2)
+        self.root.bind("<Control-z>", lambda e: self.undo_redo("undo"))
+        self.root.bind("<Control-y>", lambda e: self.undo_redo("redo"))
+
+        # Move/merge/split of the selected table
+        tools_frame = tk.Frame(self.right_frame, bg="white")
+        tools_frame.pack(pady=2)
+        tk.Button(tools_frame, text="Μεταφορά", command=self.transfer_table).pack(side="left", padx=2)
+        tk.Button(tools_frame, text="Συνένωση", command=self.merge_table).pack(side="left", padx=2)
+        tk.Button(tools_frame, text="Διαχωρισμός", command=self.split_table).pack(side="left", padx=2)
+        tk.Button(tools_frame, text="Ανά άτομο", command=self.split_payers).pack(side="left", padx=2)
+        tk.Button(tools_frame, text="Πληρότητα", command=self.show_heatmap).pack(side="left", padx=2)
+
+        # Quick entry: filters the menu as you type, Enter adds by code ("3*12" => 3 x code 12)
+        self.quick_entry_var = tk.StringVar()
+        self.quick_entry = tk.Entry(self.right_frame, textvariable=self.quick_entry_var, font=("Arial",11))
+        self.quick_entry.pack(fill="x", padx=5, pady=5)
+        self.quick_entry_var.trace_add("write", lambda *args: self.filter_menu())
+        self.quick_entry.bind("<Return>", lambda e: self.quick_entry_add())
+        self.quick_entry.bind("<Escape>", lambda e: self.quick_entry_var.set(""))
+        self.root.bind("<Control-f>", lambda e: self.quick_entry.focus_set())
+        self.root.bind("<Control-D>", lambda e: self.show_diagnostics()) # Ctrl+Shift+D, hidden
+
+        # Color strip of the selected table, next to the menu
+        self.menu_strip = tk.Frame(self.right_frame, bg="white", width=10)
+        self.menu_strip.pack(side="left", fill="y")
 
         # Create a Canvas for the menu with a vertical scrollbar
         self.menu_canvas = tk.Canvas(self.right_frame, bg="white")
@@ -240,20 +426,27 @@ class TableManagerGUI:
         self.menu_scrollbar = tk.Scrollbar(self.right_frame, orient="vertical", command=self.menu_canvas.yview)
         self.menu_scrollbar.pack(side="right", fill="y")
 
-        self.menu_canvas.configure(yscrollcommand=self.menu_scrollbar.set)
-
-        # The frame inside the canvas
-        self.menu_inner_frame = tk.Frame(self.menu_canvas, bg="white")
-        self.menu_canvas.create_window((0,0), window=self.menu_inner_frame, anchor="nw")
+        # Store menu_dict for building categorized menu
+        self.menu_dict = engine.menu_dict
+
+        if self.virtual_menu:
+            # Rows are children of the canvas itself, materialized on scroll
+            self.menu_inner_frame = None
+            self.menu_rows = []
+            self.menu_grid = VirtualGrid(self.menu_canvas, self.menu_scrollbar, 1, 300, 32,
+                                         lambda parent: self.make_menu_row(parent), self.fill_menu_row)
+        else:
+            self.menu_canvas.configure(yscrollcommand=self.menu_scrollbar.set)
 
-        # Update scroll region when the inner frame changes
-        self.menu_inner_frame.bind(
-            "<Configure>",
-            lambda e: self.menu_canvas.configure(scrollregion=self.menu_canvas.bbox("all"))
-        )
+            # The frame inside the canvas
+            self.menu_inner_frame = tk.Frame(self.menu_canvas, bg="white")
+            self.menu_canvas.create_window((0,0), window=self.menu_inner_frame, anchor="nw")
 
-        # Store menu_dict for building categorized menu
-        self.menu_dict = menu_dict
+            # Update scroll region when the inner frame changes
+            self.menu_inner_frame.bind(
+                "<Configure>",
+                lambda e: self.menu_canvas.configure(scrollregion=self.menu_canvas.bbox("all"))
+            )
 
         # Bind mouse wheel events to the menu canvas
         self.bind_mouse_wheel(self.menu_canvas)
@@ -261,8 +454,14 @@ class TableManagerGUI:
         # Build the categorized, scrollable menu items
         self.build_menu_items()
 
-        # Start the auto-save timer
-        self.start_auto_save()
+        # Every change of a table (from here or not) refreshes its card
+        engine.listeners.append(self.schedule_refresh)
+        # menu.txt/settings.txt edited while running
+        engine.menu_listeners.append(self.on_menu_changed)
+        engine.tables_listeners.append(self.on_tables_changed)
+
+        # Show the orders and start the auto-save timer once they are restored
+        self.wait_restored()
 
         # On close => save
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -273,148 +472,206 @@ class TableManagerGUI:
     #       BUILD TABLES ON LEFT (GRID of 4 col)      #
     ###################################################
     def build_tables_grid(self):
-        colors = ["tomato","lightskyblue","palegreen","pink","orange",
-                  "khaki","salmon","plum","lightblue","palegreen",
-                  "gold","thistle","lightgray","lemonchiffon"]
+        """The cards are built CARDS_PER_IDLE at a time (the shown floor first), so the window shows up first."""
+        self.pending_cards = self.floor.tables + [t for f in self.engine.floors if f is not self.floor for t in f.tables]
+        self.root.after_idle(self.build_pending_cards)
+
+        return;
 
+    def build_pending_cards(self):
+        chunk, self.pending_cards = self.pending_cards[:CARDS_PER_IDLE], self.pending_cards[CARDS_PER_IDLE:]
+        for table in chunk:
+            # Skip the tables added (already built) or removed by a settings reload meanwhile
+            if table.table_id not in self.table_cards and table.table_id in self.table_index:
+                self.build_table_card(self.floor_index[table.table_id], table)
+        if self.pending_cards:
+            self.root.after_idle(self.build_pending_cards)
+
+        return;
+
+    def build_table_card(self, idx, table):
         columns_per_row = 4
+        row_i = idx // columns_per_row
+        col_i = idx % columns_per_row
+
+        # The outer frame, in the region of its floor
+        tbl_frame = tk.Frame(self.floor_frames[self.engine.floor_of[table.table_id].name],
+                             bg=self.table_color(table),
+                             bd=3,
+                             relief="ridge",
+                             width=200,
+                             height=140)
+        tbl_frame.grid(row=row_i, column=col_i, padx=10, pady=10)
+
+        # The widgets are created once, later refreshes only update them
+        card = TableCard(self, tbl_frame)
+        card.assign(table, tbl_frame["bg"])
+        self.table_cards[table.table_id] = card
+        self.refresh_table_ui(table)
 
-        for idx, table in enumerate(self.tables):
-            c = colors[idx % len(colors)] # color
+        return;
+
+    def on_tables_changed(self, added, removed):
+        """Engine listener: ARITHMOS_TRAPEZION changed, only the added/removed cards change."""
+        self.table_index = {t.table_id: idx for idx, t in enumerate(self.tables)}
+        self.floor_index = {t.table_id: k for f in self.engine.floors for k, t in enumerate(f.tables)}
+        if self.selected_table in removed:
+            self.unselect_table()
+
+        if self.virtual_tables:
+            self.tables_grid.set_count(len(self.floor.tables))
+            return;
+
+        for table in removed:
+            self.table_cards.pop(table.table_id).frame.destroy()
+        for table in added:
+            self.build_table_card(self.floor_index[table.table_id], table)
+
+        return;
 
-            row_i = idx // columns_per_row
-            col_i = idx % columns_per_row
+    def table_color(self, table):
+        return TABLE_COLORS[self.table_index[table.table_id] % len(TABLE_COLORS)];
 
-            # The outer frame
-            tbl_frame = tk.Frame(self.tables_container,
-                                 bg=c,
-                                 bd=3,
-                                 relief="ridge",
-                                 width=200,
-                                 height=140)
-            tbl_frame.grid(row=row_i, column=col_i, padx=10, pady=10)
+    def make_table_cell(self, parent):
+        """A fixed-size, empty card for the virtual grid."""
+        tbl_frame = tk.Frame(parent, bg="white", bd=3, relief="ridge")
+        tbl_frame.pack_propagate(False) # Long orders are clipped to the card
+        card = TableCard(self, tbl_frame)
 
-            table.__dict__["ui_frame"] = tbl_frame
+        return card, tbl_frame;
 
-            # We will refresh the inside
-            self.refresh_table_ui(table)
+    def fill_table_cell(self, card, index):
+        table = self.floor.tables[index]
+        card.assign(table, self.table_color(table))
+        self.table_cards[table.table_id] = card
+        self.refresh_table_ui(table)
 
         return;
 
-    def refresh_table_ui(self, table):
-        """Clear & rebuild the inside of each table frame."""
-        frame = table.__dict__["ui_frame"]
-        bg_color = frame["bg"]
+    def release_table_cell(self, card):
+        if card.table is not None and self.table_cards.get(card.table.table_id) is card:
+            del self.table_cards[card.table.table_id]
 
-        for w in frame.winfo_children():
-            w.destroy() # Clear old
+        return;
 
-        # Label "Table X"
-        lbl_title = tk.Label(frame, text=f"Τραπέζι {table.table_id}", font=("Arial",10,"bold"), bg=bg_color)
-        lbl_title.pack(anchor="nw", padx=5, pady=2)
+    def refresh_table_ui(self, table):
+        """Bring the card of the table up to date (only what changed). Returns the widgets touched."""
+        card = self.table_cards.get(table.table_id)
+        if card is None: # Not materialized (scrolled out of the virtual grid, or not built yet)
+            return 0;
+        if not self.engine.ready.is_set(): # Still restoring: wait_restored redraws them all
+            return 0;
+
+        return card.update(table == self.selected_table) + card.show_badge(self.elapsed_badge(table, int(time())));
+
+    def elapsed_badge(self, table, now):
+        """(minutes since the first item, idle past IDLE_ALERT_MIN) of the table, or None if it is free."""
+        if not table.start_time:
+            return None;
+        return (now - table.start_time) // 60, self.engine.idle_seconds(table, now) >= self.engine.idle_after;
+
+    def schedule_refresh(self, table):
+        """
+        Refresh the card once Tk is idle: rapid clicks (and the old/new
+        selected tables) are coalesced into a single redraw.
+        """
+        self.dirty_tables[table.table_id] = table
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.root.after_idle(self.flush_refresh)
 
-        # Click => select table
-        frame.bind("<Button-1>", lambda e, t=table: self.select_table(t))
-        lbl_title.bind("<Button-1>", lambda e, t=table: self.select_table(t))
+        return;
 
-        # Έναρξη:
-        lbl_start = tk.Label(frame,
-                             text=f"Έναρξη: {table.start_time if table.start_time else '-'}",
-                             font=("Arial",8,"italic"),
-                             bg=bg_color)
-        lbl_start.pack(anchor="nw", padx=5)
-
-        # Show the items (read-only)
-        # We'll just do multiline labels or small lines
-        if table.orders:
-            for iname, qty in table.orders.items():
-                lbl_item = tk.Label(frame,
-                                    text=f"{iname}: {qty}",
-                                    font=("Arial",9),
-                                    bg=bg_color)
-                lbl_item.pack(anchor="nw", padx=5)
-        else:
-            # maybe a label "No items"
-            pass;
+    def flush_refresh(self):
+        self.refresh_pending = False
+        dirty, self.dirty_tables = self.dirty_tables, {}
+        if self.metrics is None:
+            for table in dirty.values():
+                self.refresh_table_ui(table)
+            return;
 
-        # Show total
-        total_val = table.get_total(self.price_map)
-        lbl_total = tk.Label(frame, text=f"Σύνολο: €{total_val:.2f}", font=("Arial",9,"bold"), bg=bg_color)
-        lbl_total.pack(anchor="nw", padx=5, pady=5)
+        t0 = perf_counter()
+        touched = 0
+        for table in dirty.values():
+            touched += self.refresh_table_ui(table)
+        now = perf_counter()
+        self.metrics.observe("refresh_ms", (now - t0) * 1000)
+        self.metrics.observe("refresh_widgets", touched)
+        for table_id in dirty:
+            clicked = self.click_times.pop(table_id, None)
+            if clicked is not None:
+                self.metrics.observe("click_to_render_ms", (now - clicked) * 1000)
 
-        # Complete Order
-        btn_complete = tk.Button(frame, text="Ολοκλήρωση Παραγγελίας", command=lambda: self.complete_order(table))
-        btn_complete.pack(anchor="se", padx=5, pady=5)
+        return;
 
-        # Highlight if selected
-        if table == self.selected_table:
-            frame.config(relief="solid", bd=5)
+    def show_floor(self, floor):
+        """Show the cards of another floor (the grid only ever walks the shown floor)."""
+        if floor is self.floor:
+            return;
+
+        if self.floor_buttons:
+            self.floor_buttons[self.floor.name].config(relief="raised")
+            self.floor_buttons[floor.name].config(relief="sunken")
+        previous, self.floor = self.floor, floor
+        if self.virtual_tables:
+            self.tables_grid.set_count(len(floor.tables))
         else:
-            frame.config(relief="ridge", bd=3)
+            self.floor_frames[previous.name].pack_forget()
+            self.floor_frames[floor.name].pack(anchor="nw")
+        self.canvas.yview_moveto(0)
 
         return;
 
     def select_table(self, table):
+        if self.engine.floor_of[table.table_id] is not self.floor: # e.g. after a move to another floor
+            self.show_floor(self.engine.floor_of[table.table_id])
+        previous = self.selected_table
         self.selected_table = table
-        # refresh all so we see highlight
-        for t in self.tables:
-            self.refresh_table_ui(t)
+        # Only the old and the new selected cards change highlight
+        if previous is not None and previous is not table:
+            self.schedule_refresh(previous)
+        self.schedule_refresh(table)
 
         # Update menu background color
-        selected_color = table.__dict__["ui_frame"]["bg"]
+        selected_color = self.table_color(table)
         self.update_menu_color(selected_color)
 
         return;
 
     def unselect_table(self):
         if self.selected_table is not None:
+            previous = self.selected_table
             self.selected_table = None
-            # Refresh all tables to remove highlighting
-            for t in self.tables:
-                self.refresh_table_ui(t)
+            # Remove the highlight from the previously selected table only
+            self.schedule_refresh(previous)
             self.update_menu_color("white") # Reset menu background color to default
 
         return;
 
     def update_menu_color(self, color):
         """
-        Update the background color of the menu to match the selected table's color.
-        Also update all child widgets to maintain consistency.
+        Show the selected table's color on the menu: its frame, title,
+        canvas background (around the rows) and the color strip.
+        A fixed 4 widgets, however long the menu is; the rows stay white.
         """
-        self.right_frame.config(bg=color)
-        self.lbl_menu.config(bg=color)
-
-        # Update menu_canvas and menu_inner_frame background
-        self.menu_canvas.config(bg=color)
-        self.menu_inner_frame.config(bg=color)
-
-        # Recursively update background of all child widgets in menu_inner_frame
-        self.update_widget_bg(self.menu_inner_frame, color)
-
-        return;
+        if color == self.menu_color:
+            return;
+        t0 = perf_counter()
 
-    def update_widget_bg(self, widget, color):
-        """
-        Recursively update the background color of the given widget and its children.
-        """
-        try:
+        self.menu_color = color
+        for widget in (self.right_frame, self.lbl_menu, self.menu_canvas, self.menu_strip):
             widget.config(bg=color)
-        except:
-            pass;  # Some widgets might not support bg change
 
-        for child in widget.winfo_children():
-            self.update_widget_bg(child, color)
+        if self.metrics is not None:
+            self.metrics.observe("menu_color_ms", (perf_counter() - t0) * 1000)
 
         return;
 
     def complete_order(self, table):
-        if not askyesno("Ερώτηση", "Είσαι σίγουρος/η;"):
+        if self.restoring() or not askyesno("Ερώτηση", "Είσαι σίγουρος/η;"):
             return;
 
-        if table.orders:
-            self.save_completed_order(table)
-        table.complete_order()
-        self.refresh_table_ui(table)
+        self.engine.complete_order(table.table_id, self.payers.pop(table.table_id, 1))
         # Update the menu's background if no table is selected
         if not table.orders:
             self.update_menu_color("white")  # Default color
@@ -430,87 +687,488 @@ class TableManagerGUI:
         Build the menu with category titles and items under each category.
         The menu is scrollable.
         """
+        if self.virtual_menu:
+            self.set_menu_rows(None)
+            return;
+
         for widget in self.menu_inner_frame.winfo_children():
             widget.destroy()
+        self.menu_category_labels = {} # Dict: { category: lbl_category }
+        self.menu_item_widgets = {}    # Dict: { item_name: (item_frame, lbl_name, lbl_price) }
+        self.menu_widgets = []
+        # The rows are created MENU_ROWS_PER_IDLE at a time, then packed at once
+        self.pending_menu = [item for items in self.menu_dict.values() for item in items]
+        self.root.after_idle(self.build_pending_menu)
+
+        return;
+
+    def build_pending_menu(self):
+        if self.pending_menu is None: # A menu reload laid out everything meanwhile
+            return;
+
+        chunk, self.pending_menu = self.pending_menu[:MENU_ROWS_PER_IDLE], self.pending_menu[MENU_ROWS_PER_IDLE:]
+        for item in chunk:
+            self.menu_item_widgets[item.name] = self.make_menu_item(item)
+        if self.pending_menu:
+            self.root.after_idle(self.build_pending_menu)
+        else:
+            self.layout_menu() # Packs them all, in menu order
+
+        return;
+
+    def layout_menu(self):
+        """
+        (Re)build menu_widgets from menu_dict and pack it. Only the widgets
+        of new categories/items are created, the dropped ones destroyed.
+        """
+        self.pending_menu = None # Everything missing is created here
+        self.menu_widgets = [] # List: [(lbl_category, [(item, item_frame), ...]), ...]
+        categories = set()
+        names = set()
 
         for category, items in self.menu_dict.items():
             # Category Title
-            lbl_category = tk.Label(self.menu_inner_frame, text=category, font=("Arial",12,"bold"), anchor="w", bg=self.menu_inner_frame["bg"])
-            lbl_category.pack(fill="x", padx=5, pady=(10, 2))
+            lbl_category = self.menu_category_labels.get(category)
+            if lbl_category is None:
+                lbl_category = tk.Label(self.menu_inner_frame, text=category, font=("Arial",12,"bold"), anchor="w", bg=self.menu_inner_frame["bg"])
+                self.menu_category_labels[category] = lbl_category
+            categories.add(category)
+            item_frames = []
+            self.menu_widgets.append((lbl_category, item_frames))
 
             # Items under the category
             for item in items:
-                item_frame = tk.Frame(self.menu_inner_frame, bg=self.menu_inner_frame["bg"])
-                item_frame.pack(fill="x", padx=10, pady=2)
+                widgets = self.menu_item_widgets.get(item.name)
+                if widgets is None:
+                    widgets = self.make_menu_item(item)
+                    self.menu_item_widgets[item.name] = widgets
+                names.add(item.name)
+                item_frames.append((item, widgets[0]))
+
+        for category in [c for c in self.menu_category_labels if c not in categories]:
+            self.menu_category_labels.pop(category).destroy()
+        for iname in [n for n in self.menu_item_widgets if n not in names]:
+            self.menu_item_widgets.pop(iname)[0].destroy()
+
+        self.filter_menu() # Packs the rows in menu order
+
+        return;
 
-                # minus button
-                btn_minus = tk.Button(item_frame, text="–", width=3, command=lambda i=item.name: self.menu_remove_item(i))
-                btn_minus.pack(side="left")
+    def make_menu_item(self, item):
+        """The row of one item: – code · name .... price +"""
+        item_frame = tk.Frame(self.menu_inner_frame, bg=self.menu_inner_frame["bg"])
 
-                # name label
-                lbl_name = tk.Label(item_frame, text=item.name, font=("Arial",9), anchor="w", bg=self.menu_inner_frame["bg"])
-                lbl_name.pack(side="left", padx=(5, 0))
+        # minus button
+        btn_minus = tk.Button(item_frame, text="–", width=3, command=lambda i=item.name: self.menu_remove_item(i))
+        btn_minus.pack(side="left")
 
-                # spacer
-                spacer = tk.Label(item_frame, text="", bg=self.menu_inner_frame["bg"])
-                spacer.pack(side="left", expand=True)
+        # name label
+        lbl_name = tk.Label(item_frame, text=f"{item.code} · {item.name}", font=("Arial",9), anchor="w", bg=self.menu_inner_frame["bg"])
+        lbl_name.pack(side="left", padx=(5, 0))
 
-                # price label
-                lbl_price = tk.Label(item_frame, text=f"{item.price:.2f} €", font=("Arial",9), anchor="e", bg=self.menu_inner_frame["bg"])
-                lbl_price.pack(side="left", padx=(0,5))
+        # spacer
+        spacer = tk.Label(item_frame, text="", bg=self.menu_inner_frame["bg"])
+        spacer.pack(side="left", expand=True)
 
-                # plus button
-                btn_plus = tk.Button(item_frame, text="+", width=3, command=lambda i=item.name: self.menu_add_item(i))
-                btn_plus.pack(side="left")
+        # price label
+        lbl_price = tk.Label(item_frame, text=f"{format_cents(item.price_cents)} €", font=("Arial",9), anchor="e", bg=self.menu_inner_frame["bg"])
+        lbl_price.pack(side="left", padx=(0,5))
+
+        # plus button
+        btn_plus = tk.Button(item_frame, text="+", width=3, command=lambda i=item.name: self.menu_add_item(i))
+        btn_plus.pack(side="left")
+
+        return item_frame, lbl_name, lbl_price;
+
+    def on_menu_changed(self, diff):
+        """
+        Engine listener: menu.txt was reloaded. Re-text the changed prices/
+        codes, create/destroy only the added/removed rows. The cards do not
+        change: open orders keep the prices they were ordered at.
+        """
+        self.menu_dict = self.engine.menu_dict
+        if self.virtual_menu:
+            self.filter_menu() # The rows are filled from the new items
+            return;
+
+        items = {it.name: it for it in self.engine.items}
+        for iname in diff["prices"] + diff["codes"]:
+            widgets = self.menu_item_widgets.get(iname)
+            if widgets is not None:
+                item = items[iname]
+                widgets[1].config(text=f"{item.code} · {item.name}")
+                widgets[2].config(text=f"{format_cents(item.price_cents)} €")
+        self.layout_menu()
+
+        return;
+
+    def set_menu_rows(self, visible):
+        """Virtual menu rows: every item, or only the items in `visible` (a set)."""
+        # Flat list of rows: (category, None) titles and (category, item) rows
+        self.menu_rows = []
+        for category, items in self.menu_dict.items():
+            shown = [it for it in items if visible is None or it in visible]
+            if shown:
+                self.menu_rows.append((category, None))
+                self.menu_rows.extend((category, item) for item in shown)
+        self.menu_grid.set_count(len(self.menu_rows))
+
+        return;
+
+    def filter_menu(self):
+        """Show only the items matching the quick entry (all of them when it is empty)."""
+        query = self.quick_entry_var.get()
+        visible = set(self.engine.menu_index.search(query)) if query.strip() else None
+
+        if self.virtual_menu:
+            self.set_menu_rows(visible)
+            return;
+
+        for lbl_category, item_frames in self.menu_widgets:
+            lbl_category.pack_forget()
+            for item, item_frame in item_frames:
+                item_frame.pack_forget()
+        for lbl_category, item_frames in self.menu_widgets:
+            shown = [f for item, f in item_frames if visible is None or item in visible]
+            if shown:
+                lbl_category.pack(fill="x", padx=5, pady=(10, 2))
+                for item_frame in shown:
+                    item_frame.pack(fill="x", padx=10, pady=2)
+        self.menu_canvas.yview_moveto(0)
 
         return;
 
-    def menu_add_item(self, iname):
-        if not self.selected_table:
+    def quick_entry_add(self):
+        """Enter: add the item with that code (or the only match) to the selected table."""
+        text = self.quick_entry_var.get().strip()
+        qty = 1
+        if "*" in text:
+            qty_str, text = text.split("*", 1)
+            qty = int(qty_str) if qty_str.strip().isdigit() else 0
+            if qty < 1:
+                showwarning("Ποσότητα", f"Μη έγκυρη ποσότητα: {qty_str.strip()}")
+                return;
+
+        index = self.engine.menu_index
+        item = index.find_code(text)
+        if item is None:
+            matches = index.search(text, limit=2)
+            item = matches[0] if len(matches) == 1 else None
+        if item is None or not self.selected_table:
+            self.root.bell()
             return;
 
-        self.selected_table.add_item(iname, 1)
-        self.refresh_table_ui(self.selected_table)
+        self.menu_add_item(item.name, qty) # One change (one undo step, one ticket) for "12*code"
+        self.quick_entry_var.set("")
+
+        return;
+
+    def make_menu_row(self, parent):
+        row = MenuRow(self, parent)
+        return row, row.frame;
+
+    def fill_menu_row(self, row, index):
+        row.assign(*self.menu_rows[index])
+
+        return;
+
+    def menu_add_item(self, iname, qty=1):
+        if not self.selected_table or self.restoring():
+            return;
+
+        if self.metrics is not None:
+            self.click_times.setdefault(self.selected_table.table_id, perf_counter())
+        self.engine.add_item(self.selected_table.table_id, iname, qty)
 
         # Print to terminal
-        price = self.price_map.get(iname, 0.0)
-        print(f"Τραπέζι {self.selected_table.table_id} => "
-              f"+1 {iname} {price:.2f}€ - {datetime.now().strftime("%H:%M:%S")}") # Don't forget the menu_remove_item string!
+        price = self.price_map.get(iname, 0)
+        self.engine.log(f"Τραπέζι {self.selected_table.table_id} => "
+              f"+{qty} {iname} {format_cents(price)}€ - {datetime.now().strftime("%H:%M:%S")}") # Don't forget the menu_remove_item string!
 
         return;
 
     def menu_remove_item(self, iname):
-        if not self.selected_table:
+        if not self.selected_table or self.restoring():
             return;
         if iname not in self.selected_table.orders:
             return;
 
-        self.selected_table.remove_item(iname, 1)
-        self.refresh_table_ui(self.selected_table)
+        if self.metrics is not None:
+            self.click_times.setdefault(self.selected_table.table_id, perf_counter())
+        self.engine.remove_item(self.selected_table.table_id, iname, 1)
+
+        # Print to terminal
+        price = self.price_map.get(iname, 0)
+        self.engine.log(f"Τραπέζι {self.selected_table.table_id} => "
+              f"-1 {iname} {format_cents(price)}€ - {datetime.now().strftime("%H:%M:%S")}")
+
+        return;
+
+    def undo_redo(self, origin):
+        if self.restoring():
+            return;
+        table_id = self.selected_table.table_id if self.selected_table else self.engine.last_changed
+        if table_id is None:
+            self.root.bell()
+            return;
+
+        try:
+            changed = self.engine.undo(table_id) if origin == "undo" else self.engine.redo(table_id)
+        except ValueError:
+            showwarning("Αναίρεση", "Η αλλαγή αφορά και άλλο τραπέζι που άλλαξε μετά. "
+                                    "Αναιρέστε πρώτα τις αλλαγές εκείνου.")
+            return;
+        if not changed:
+            self.root.bell()
+            return;
 
         # Print to terminal
-        price = self.price_map.get(iname, 0.0)
-        print(f"Τραπέζι {self.selected_table.table_id} => "
-              f"-1 {iname} {price:.2f}€ - {datetime.now().strftime("%H:%M:%S")}")
+        action = "Αναίρεση" if origin == "undo" else "Επανάληψη"
+        self.engine.log(f"Τραπέζι {table_id} => {action} - {datetime.now().strftime('%H:%M:%S')}")
+
+        return;
+
+    ###################################################
+    #            MOVE / MERGE / SPLIT BILL            #
+    ###################################################
+    def ask_table(self, title, prompt):
+        """Table number from the user (None if cancelled or not a table)."""
+        table_id = askinteger(title, prompt, parent=self.root)
+        if table_id is None:
+            return None;
+        if table_id not in self.table_index or table_id == self.selected_table.table_id:
+            showwarning(title, f"Μη έγκυρο τραπέζι: {table_id}")
+            return None;
+
+        return table_id;
+
+    def move_lines(self, to_id, items=None):
+        """Engine transfer; the listener redraws just the two cards."""
+        from_id = self.selected_table.table_id
+        self.engine.transfer_table(from_id, to_id, items)
+        self.engine.log(f"Τραπέζι {from_id} => Τραπέζι {to_id} - {datetime.now().strftime('%H:%M:%S')}")
+        self.select_table(self.engine.get_table(to_id))
+
+        return;
+
+    def transfer_table(self):
+        """Move the whole selected table to another one."""
+        if not self.selected_table or not self.selected_table.orders or self.restoring():
+            self.root.bell()
+            return;
+        to_id = self.ask_table("Μεταφορά", "Μεταφορά στο τραπέζι:")
+        if to_id is not None:
+            self.move_lines(to_id)
+
+        return;
+
+    def merge_table(self):
+        """Bring every line of another table to the selected one."""
+        if not self.selected_table or self.restoring():
+            self.root.bell()
+            return;
+        from_id = self.ask_table("Συνένωση", "Συνένωση με το τραπέζι:")
+        if from_id is None:
+            return;
+        into_id = self.selected_table.table_id
+        self.engine.merge_tables([from_id], into_id)
+        self.engine.log(f"Τραπέζι {from_id} => Τραπέζι {into_id} - {datetime.now().strftime('%H:%M:%S')}")
+
+        return;
+
+    def split_table(self):
+        """Pick items and quantities of the selected table to move to another one."""
+        table = self.selected_table
+        if not table or not table.orders or self.restoring():
+            self.root.bell()
+            return;
+
+        window = tk.Toplevel(self.root)
+        window.title(f"Διαχωρισμός - Τραπέζι {table.table_id}")
+        spins = {} # Dict: { item_name: Spinbox }
+        prices = {} # Dict: { item_name: [price_cents, ...] } (an item moved in at another price has two lines)
+        for iname, _, price, _ in table.lines():
+            prices.setdefault(iname, []).append(format_cents(price))
+        for row, (iname, qty) in enumerate(table.orders.items()):
+            tk.Label(window, text=f"{iname} ({qty} x {'/'.join(prices[iname])}€)", anchor="w").grid(row=row, column=0, sticky="w", padx=5)
+            spin = spins[iname] = tk.Spinbox(window, from_=0, to=qty, width=4)
+            spin.grid(row=row, column=1, padx=5)
+        tk.Label(window, text="Στο τραπέζι:").grid(row=len(spins), column=0, sticky="e", padx=5, pady=5)
+        target = tk.Entry(window, width=5)
+        target.grid(row=len(spins), column=1, padx=5, pady=5)
+
+        def on_ok():
+            try:
+                to_id = int(target.get())
+                items = {iname: int(spin.get()) for iname, spin in spins.items() if int(spin.get()) > 0}
+            except ValueError:
+                window.bell()
+                return;
+            if to_id not in self.table_index or to_id == table.table_id or not items:
+                window.bell()
+                return;
+            window.destroy()
+            self.move_lines(to_id, items)
+        tk.Button(window, text="OK", command=on_ok).grid(row=len(spins) + 1, column=0, columnspan=2, pady=5)
+
+        return;
+
+    def split_payers(self):
+        """Even shares of the selected table's bill; they are printed on its receipt."""
+        table = self.selected_table
+        if not table or not table.orders:
+            self.root.bell()
+            return;
+        payers = askinteger("Ανά άτομο", "Άτομα:", parent=self.root, minvalue=1, maxvalue=100)
+        if payers is None:
+            return;
+
+        self.payers[table.table_id] = payers
+        shares = self.engine.split_bill(table.table_id, payers)
+        showinfo("Ανά άτομο", "\n".join(f"{k}. €{format_cents(c)}" for k, c in enumerate(shares, 1)))
 
         return;
 
     ###################################################
     #                   TIMER METHODS                 #
     ###################################################
+    def wait_restored(self):
+        """Poll the background restore; once it is done, draw the orders and start the timers."""
+        if self.started:
+            return;
+        if not self.engine.ready.is_set():
+            self.root.after(RESTORE_POLL_MS, self.wait_restored)
+            return;
+
+        self.started = True
+        self.lbl_status.pack_forget()
+        for table in self.tables:
+            if table.line_ids:
+                self.schedule_refresh(table)
+        self.start_auto_save()
+
+        return;
+
+    def restoring(self):
+        """True (and a beep) while the open orders are still being restored."""
+        if self.engine.ready.is_set():
+            return False;
+        self.root.bell()
+
+        return True;
+
     def start_auto_save(self):
-        """Start the auto-save timer to save orders every 2 minutes."""
+        """
+        Start the auto-save timer (a snapshot every 2 minutes).
+        With the journal on, every change is already on disk and the
+        snapshot only compacts the journal.
+        """
         self.save_orders_timer()
+        if self.engine.journal is not None:
+            self.journal_sync_timer()
+        self.reload_timer()
+        self.elapsed_timer()
+        if self.metrics is not None:
+            self.loop_lag_timer(perf_counter())
+            self.root.after(int(self.settings.get("METRICS_DUMP_MS", 60000)), self.metrics_dump_timer)
+
         return;
 
     def save_orders_timer(self):
         """Save orders and reschedule the timer."""
-        script_dir =     dirname(abspath(__file__))
-        ordersData_dir = "ordersData"
-        orders_file =    join(script_dir, ordersData_dir, "orders.txt")
+        self.engine.save()
+        snapshot_ms = int(self.settings.get("SNAPSHOT_MS", 120000))
+        self.root.after(snapshot_ms, self.save_orders_timer) # Schedule the next save
+
+        return;
+
+    def journal_sync_timer(self):
+        """fsync the journal records of the last few clicks."""
+        self.engine.sync()
+        fsync_ms = int(self.settings.get("JOURNAL_FSYNC_MS", 1000))
+        self.root.after(fsync_ms, self.journal_sync_timer)
+
+        return;
+
+    def reload_timer(self):
+        """Pick up edits of menu.txt/settings.txt (a stat() per file when nothing changed)."""
+        self.engine.check_reload()
+        reload_ms = int(self.settings.get("RELOAD_MS", 2000))
+        self.root.after(reload_ms, self.reload_timer)
+
+        return;
+
+    def elapsed_timer(self):
+        """
+        The one ticker of every elapsed/idle badge: it walks the cards that
+        exist (the virtual grid: only the visible ones) and touches only
+        the labels whose minute or idle flag changed.
+        """
+        now = int(time())
+        touched = 0
+        for card in self.table_cards.values():
+            touched += card.show_badge(self.elapsed_badge(card.table, now))
+        if self.metrics is not None:
+            self.metrics.observe("badge_widgets", touched)
+        self.root.after(int(self.settings.get("ELAPSED_TICK_MS", 15000)), self.elapsed_timer)
+
+        return;
+
+    def loop_lag_timer(self, due):
+        """Tk event-loop lag: how late this timer fires compared to when it was due."""
+        now = perf_counter()
+        self.metrics.observe("tk_loop_lag_ms", max(now - due, 0) * 1000)
+        lag_ms = int(self.settings.get("METRICS_LAG_MS", 100))
+        self.root.after(lag_ms, self.loop_lag_timer, now + lag_ms / 1000)
+
+        return;
+
+    def metrics_dump_timer(self):
+        """Append the metrics to ordersData/metrics.jsonl."""
+        self.engine.dump_metrics()
+        self.root.after(int(self.settings.get("METRICS_DUMP_MS", 60000)), self.metrics_dump_timer)
+
+        return;
 
-        save_orders(self.tables, orders_file)
-        self.root.after(120000, self.save_orders_timer) # Schedule the next save
+    ###################################################
+    #          OCCUPANCY HEATMAP (weekday x hour)     #
+    ###################################################
+    def show_heatmap(self):
+        """Occupancy and completed orders by weekday x hour, plus the idle tables right now."""
+        window = tk.Toplevel(self.root)
+        window.title("Πληρότητα")
+        idle = ", ".join(f"{t.table_id} ({seconds // 60}')" for t, seconds in self.engine.idle_tables())
+        text = self.engine.heatmap.format_text(len(self.tables)) + f"\n\nΑδρανή τραπέζια: {idle or '-'}"
+        tk.Label(window, text=text, font=("Courier",9), justify="left", anchor="nw").pack(fill="both", expand=True,
+                                                                                       padx=5, pady=5)
+
+        return;
+
+    ###################################################
+    #             DIAGNOSTICS (Ctrl+Shift+D)          #
+    ###################################################
+    def show_diagnostics(self):
+        """Small window with the live metrics (only with METRICS=1)."""
+        if self.metrics is None:
+            self.root.bell()
+            return;
+        if self.diagnostics is not None:
+            self.diagnostics.lift()
+            return;
+
+        window = self.diagnostics = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        lbl = tk.Label(window, font=("Courier",9), justify="left", anchor="nw")
+        lbl.pack(fill="both", expand=True, padx=5, pady=5)
+        def on_close():
+            window.destroy()
+            self.diagnostics = None
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        def tick():
+            if self.diagnostics is window: # Stops once this window is closed
+                lbl.config(text=self.metrics.format_text())
+                self.root.after(1000, tick)
+        tick()
 
         return;
 
@@ -542,57 +1200,14 @@ class TableManagerGUI:
         widget.yview_scroll(int(-1*(event.delta/120)), "units")
         return;
 
-    ###################################################
-    #        SAVE COMPLETED ORDERS TO FILE            #
-    ###################################################
-    def save_completed_order(self, table):
-        """
-        Save the completed order to 'completed_orders.txt' with all details
-        and print the details to the terminal.
-        """
-        script_dir = dirname(abspath(__file__))
-        ordersData_dir = "ordersData"
-        completed_orders_file = join(script_dir, ordersData_dir, "completed_orders.txt")
-
-        # Prepare the order details
-        order_details = []
-        order_details.append(f"Τραπέζι {table.table_id}\n")
-        order_details.append(f"Έναρξη: {table.start_time}\n")
-        order_details.append("Παραγγελίες:\n")
-        for iname, qty in table.orders.items():
-            price = self.price_map.get(iname, 0.0)
-            line = f" - {iname}: {qty} x {price:.2f}€ = {qty * price:.2f}€\n"
-            order_details.append(line)
-        total = table.get_total(self.price_map)
-        order_details.append(f"Σύνολο: €{total:.2f}\n")
-        order_details.append(f"Ολοκλήρωση: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        separator = "-" * 40 + "\n"
-        order_details.append(separator)
-
-        # Print to the terminal
-        print(separator, end='')
-        print(''.join(order_details), end='')
-
-        try:
-            with open(completed_orders_file, "a", encoding="utf-8") as f:
-                for detail in order_details: # Write to the file
-                    f.write(detail)
-
-        except Exception as e:
-            print(f"[!] Error saving completed order: {e}")
-
-        return;
-
     ###################################################
     #                   ON CLOSE                      #
     ###################################################
     def on_close(self):
-        script_dir =     dirname(abspath(__file__))
-        ordersData_dir = "ordersData"
-        orders_file =    join(script_dir, ordersData_dir, "orders.txt")
-
-        save_orders(self.tables, orders_file)
+        self.engine.save()
+        self.engine.flush() # Everything on disk before asking
         if askyesno("Έξοδος", "Είστε σίγουρος/η ότι θέλετε να κλείσετε την εφαρμογή;"):
+            self.engine.close()
             exit();
 
         return;
@@ -601,30 +1216,14 @@ class TableManagerGUI:
 #                     main()                      #
 ###################################################
 def main():
-    script_dir =    dirname(abspath(__file__))
-
-    appData_dir =   "appData"
-    settings_file = join(script_dir, appData_dir, "settings.txt")
-    menu_file =     join(script_dir, appData_dir, "menu.txt")
-
-    ordersData_dir = "ordersData"
-    orders_file =    join(script_dir, ordersData_dir, "orders.txt")
-
-    # Ensure directories exist
-    for directory in [appData_dir, ordersData_dir]:
-        if not exists(directory):
-            makedirs(directory)
-
-    settings = load_settings(settings_file)
-    num_tables = int(settings.get("ARITHMOS_TRAPEZION", 12))
-    tables = [Table(i) for i in range(1, num_tables + 1)] # Create tables
-
-    flat_items, menu_dict = load_menu(menu_file) # Load menu
+    script_dir = dirname(abspath(__file__))
 
-    load_orders(tables, orders_file) # Load existing orders
+    # Settings and menu now; the existing orders are restored in the background
+    # while the window, its cards and the menu rows are built
+    engine = open_engine(script_dir, background_restore=True)
     
     root = tk.Tk()
-    app = TableManagerGUI(root, tables, flat_items, menu_dict)
+    app = TableManagerGUI(root, engine)
     root.mainloop()
 
     return;